@@ -0,0 +1,297 @@
+"""
+Benchmarks for encoding and decoding Chip's Challenge (CC) data
+Created for the class Programming for Game Designers
+
+Times DAT reading, writing and re-saving of unchanged levels, layer RLE decoding and encoding, field decoding and encoding and JSON export and import
+on synthetic level packs, as well as loading them from the decoded pack cache of cc_dat_cache, and writes the results as JSON so runs from different commits can be compared
+Usage:
+    python cc_benchmark.py [--levels 1 100 10000] [--rle-density 0.9] [--traps 4] [--machines 4] [--monsters 16]
+                           [--repeat 5] [--min-time 0.2] [--only NAME ...] [-o results.json] [--compare baseline.json]
+    python cc_benchmark.py --profile pack.dat [pack2.dat ...]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import cc_dat_cache
+import cc_dat_utils
+import cc_json_utils
+import cc_level_generator
+
+
+def make_synthetic_cc_data(level_count, rle_density=0.9, trap_count=4, machine_count=4, monster_count=16, seed=0):
+    """Returns a CCDataFile of level_count random levels, see cc_level_generator.make_random_cc_data
+    Args:
+        rle_density (float) : optional, the fraction of floor tiles in each upper layer, from 0 to 1
+    The same arguments always produce the same pack
+    """
+    return cc_level_generator.make_random_cc_data(level_count, seed, unique_levels=256, tile_entropy=1 - rle_density,
+                                                  trap_count=trap_count, machine_count=machine_count,
+                                                  monster_count=monster_count)
+
+
+def time_benchmark(func, repeat=5, min_time=0.2):
+    """Times func with timeit, running it enough times per sample to take at least min_time seconds
+    Returns:
+        A dictionary of the loop count and the min, median, mean and standard deviation of the seconds per call
+    """
+    timer = timeit.Timer(func)
+    loops = 1
+    while True:
+        if timer.timeit(loops) >= min_time:
+            break
+        loops *= 2
+    samples = [t / loops for t in timer.repeat(repeat, loops)]
+    return {
+        "loops": loops,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.mean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def make_synthetic_dat_parts(level_count, work_dir, rle_density=0.9, trap_count=4, machine_count=4, monster_count=16,
+                             seed=0):
+    """Returns the levels of make_synthetic_cc_data as CCDataFiles of at most MAX_LEVEL_COUNT levels each
+    Packs too big for one DAT file are written with cc_level_generator.write_random_dat_files and read back, part by part
+    Args:
+        level_count (int) : the total number of levels
+        work_dir (string) : a directory for the part files
+        See make_synthetic_cc_data for the other arguments
+    Returns:
+        A list of CCDataFile objects whose levels all need encoding when written
+    """
+    if level_count <= cc_dat_utils.MAX_LEVEL_COUNT:
+        return [make_synthetic_cc_data(level_count, rle_density, trap_count, machine_count, monster_count, seed)]
+    dat_files = cc_level_generator.write_random_dat_files(
+        os.path.join(work_dir, "synthetic.dat"), level_count, cc_dat_utils.MAX_LEVEL_COUNT, seed, unique_levels=256,
+        tile_entropy=1 - rle_density, trap_count=trap_count, machine_count=machine_count, monster_count=monster_count)
+    cc_dats = []
+    for dat_file in dat_files:
+        cc_dat = cc_dat_utils.make_cc_data_from_dat(dat_file)
+        os.remove(dat_file)
+        # Forget the records the levels were read from, like levels built in memory
+        for level in cc_dat.levels:
+            level.raw_record = None
+        cc_dats.append(cc_dat)
+    return cc_dats
+
+
+def make_benchmarks(cc_dats, work_dir):
+    """Builds the benchmark functions for a pack
+    Args:
+        cc_dats (list of CCDataFiles) : the pack to benchmark with, as parts of at most MAX_LEVEL_COUNT levels
+            each so every part fits in a DAT file. Each benchmark runs over all the parts
+        work_dir (string) : a directory for the benchmark files
+    Returns:
+        A list of (benchmark name, function) tuples
+    """
+    dat_files = []
+    json_files = []
+    dat_bytes = []
+    for part, cc_dat in enumerate(cc_dats):
+        dat_file = os.path.join(work_dir, "bench_{0:04d}.dat".format(part))
+        json_file = os.path.join(work_dir, "bench_{0:04d}.json".format(part))
+        cc_dat_utils.write_cc_data_to_dat(cc_dat, dat_file)
+        cc_json_utils.write_cc_data_to_json(cc_dat, json_file)
+        with open(dat_file, "rb") as reader:
+            dat_bytes.append(reader.read())
+        dat_files.append(dat_file)
+        json_files.append(json_file)
+    levels = [level for cc_dat in cc_dats for level in cc_dat.levels]
+
+    layer_bytes = []
+    field_bytes = []
+    for level in levels:
+        layer_bytes.append(cc_dat_utils.make_bytes_from_layer(level.upper_layer))
+        layer_bytes.append(cc_dat_utils.make_bytes_from_layer(level.lower_layer))
+        for field in level.optional_fields:
+            field_bytes.append((field.type_val, field.byte_data))
+    layers = [cc_dat_utils.make_layer_from_bytes(b) for b in layer_bytes]
+    # Levels decoded from a DAT file are clean and are saved by copying their raw records
+    loaded_cc_dats = [cc_dat_utils.make_cc_data_from_buffer(b) for b in dat_bytes]
+    fields = [field for level in levels for field in level.optional_fields]
+    # Fill the cache so dat_read_cache measures hits
+    cache = cc_dat_cache.CCDatCache(os.path.join(work_dir, "cache"))
+    for dat_file in dat_files:
+        cache.load(dat_file)
+
+    def dat_read_file():
+        for dat_file in dat_files:
+            cc_dat_utils.make_cc_data_from_dat(dat_file)
+
+    def dat_read_mmap():
+        for dat_file in dat_files:
+            cc_dat_utils.make_cc_data_from_dat(dat_file, use_mmap=True)
+
+    def dat_read_buffer():
+        for b in dat_bytes:
+            cc_dat_utils.make_cc_data_from_buffer(b)
+
+    def dat_read_cache():
+        for dat_file in dat_files:
+            cache.load(dat_file)
+
+    def dat_write():
+        for cc_dat, dat_file in zip(cc_dats, dat_files):
+            cc_dat_utils.write_cc_data_to_dat(cc_dat, dat_file)
+
+    def dat_write_unchanged():
+        for cc_dat, dat_file in zip(loaded_cc_dats, dat_files):
+            cc_dat_utils.write_cc_data_to_dat(cc_dat, dat_file)
+
+    def layer_decode():
+        for b in layer_bytes:
+            cc_dat_utils.make_layer_from_bytes(b)
+
+    def layer_encode():
+        for layer in layers:
+            cc_dat_utils.make_bytes_from_layer(layer)
+
+    def field_decode():
+        for field_type, b in field_bytes:
+            cc_dat_utils.make_field_from_bytes(field_type, b)
+
+    def field_encode():
+        for field in fields:
+            field.make_byte_data()
+
+    def json_export():
+        cc_json_utils.write_levels_to_json(levels, io.StringIO())
+
+    def json_export_compact():
+        cc_json_utils.write_levels_to_json(levels, io.StringIO(), compact=True)
+
+    def json_import():
+        for json_file in json_files:
+            cc_json_utils.make_cc_data_from_json(json_file)
+
+    return [("dat_read_file", dat_read_file), ("dat_read_mmap", dat_read_mmap), ("dat_read_buffer", dat_read_buffer),
+            ("dat_read_cache", dat_read_cache), ("dat_write", dat_write), ("dat_write_unchanged", dat_write_unchanged),
+            ("layer_decode", layer_decode), ("layer_encode", layer_encode),
+            ("field_decode", field_decode), ("field_encode", field_encode), ("json_export", json_export),
+            ("json_export_compact", json_export_compact), ("json_import", json_import)]
+
+
+def get_git_commit():
+    """Returns the current git commit hash, or None outside of a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(level_counts, rle_density=0.9, trap_count=4, machine_count=4, monster_count=16,
+                   repeat=5, min_time=0.2, only=None, verbose=True):
+    """Runs every benchmark for each pack size
+    Args:
+        level_counts (list of ints) : the pack sizes to benchmark. Packs over MAX_LEVEL_COUNT levels are benchmarked
+            as several DAT files
+        only (list of strings) : optional, the names of the benchmarks to run. Defaults to all of them
+        verbose (bool) : optional, print each result as it is measured
+        See make_synthetic_cc_data and time_benchmark for the other arguments
+    Returns:
+        A dictionary of the run metadata and the list of results
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for level_count in level_counts:
+            cc_dats = make_synthetic_dat_parts(level_count, work_dir, rle_density, trap_count, machine_count,
+                                               monster_count)
+            for name, func in make_benchmarks(cc_dats, work_dir):
+                if only and name not in only:
+                    continue
+                result = {"name": name, "levels": level_count}
+                result.update(time_benchmark(func, repeat, min_time))
+                results.append(result)
+                if verbose:
+                    print("{0:<20} {1:>7} levels  {2:12.6f} s  {3:12.0f} levels/s".format(
+                        name, level_count, result["median"], level_count / result["median"]))
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": get_git_commit(),
+            "python": sys.version,
+            "platform": platform.platform(),
+            "rle_density": rle_density,
+            "traps": trap_count,
+            "machines": machine_count,
+            "monsters": monster_count,
+            "repeat": repeat,
+            "min_time": min_time,
+        },
+        "results": results,
+    }
+
+
+def compare_results(baseline, current):
+    """Prints the change in median time of every benchmark found in both result sets"""
+    baseline_times = {(r["name"], r["levels"]): r["median"] for r in baseline["results"]}
+    print("Compared with " + str(baseline["meta"].get("commit")))
+    for result in current["results"]:
+        key = (result["name"], result["levels"])
+        if key in baseline_times:
+            ratio = result["median"] / baseline_times[key]
+            print("{0:<20} {1:>7} levels  {2:6.2f}x {3}".format(
+                result["name"], result["levels"], ratio, "slower" if ratio > 1 else "faster"))
+
+
+def profile_dat_files(dat_files, use_mmap=False):
+    """Parses each DAT file with a CCParseStats attached and prints where the parse time went
+    Returns:
+        A dictionary of filename to the json data of its stats
+    """
+    profiles = {}
+    for dat_file in dat_files:
+        stats = cc_dat_utils.CCParseStats()
+        cc_dat_utils.make_cc_data_from_dat(dat_file, use_mmap, stats)
+        print(dat_file)
+        print(stats)
+        profiles[dat_file] = stats.json_data
+    return profiles
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CC DAT and JSON encoding and decoding")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 100, 10000], help="pack sizes to benchmark")
+    parser.add_argument("--rle-density", type=float, default=0.9, help="fraction of floor tiles in each layer")
+    parser.add_argument("--traps", type=int, default=4, help="traps per level (max 25)")
+    parser.add_argument("--machines", type=int, default=4, help="cloning machines per level (max 31)")
+    parser.add_argument("--monsters", type=int, default=16, help="monsters per level (max 127)")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed samples per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per timed sample")
+    parser.add_argument("--only", nargs="+", help="names of the benchmarks to run")
+    parser.add_argument("-o", "--output", help="file to write the JSON results to")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--profile", nargs="+", metavar="DAT_FILE", help="print the parse phase stats of DAT files instead")
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        profiles = profile_dat_files(args.profile, use_mmap=True)
+        if args.output:
+            with open(args.output, "w") as writer:
+                json.dump(profiles, writer, indent=2)
+        return 0
+
+    results = run_benchmarks(args.levels, args.rle_density, args.traps, args.machines, args.monsters,
+                             args.repeat, args.min_time, args.only)
+    if args.output:
+        with open(args.output, "w") as writer:
+            json.dump(results, writer, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as reader:
+            compare_results(json.load(reader), results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
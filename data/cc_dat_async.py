@@ -0,0 +1,116 @@
+"""
+asyncio methods for loading and saving Chip's Challenge (CC) DAT files
+Created for the class Programming for Game Designers
+
+Blocking file I/O runs in the event loop's default executor, one chunk at a time, and the DAT data is parsed from the
+in-memory buffer. Packs can also be loaded from bytes-like objects or asyncio stream readers, and saved to stream
+writers, so uploads can be parsed without touching disk
+Usage:
+    cc_dat = await cc_dat_async.load_cc_data("pack.dat")
+    cc_dat = await cc_dat_async.load_cc_data(request_reader)
+    await cc_dat_async.save_cc_data(cc_dat, "copy.dat")
+"""
+import asyncio
+import functools
+import cc_dat_utils
+
+ASYNC_CHUNK_SIZE = 1 << 20
+# Packs smaller than this are parsed and serialized on the event loop thread instead of in the executor
+MIN_EXECUTOR_BYTES = 1 << 16
+
+
+async def read_file_async(filename, chunk_size=ASYNC_CHUNK_SIZE):
+    """Reads a whole file in the default executor, one chunk at a time so other tasks run in between
+    Returns:
+        A bytearray of the file data
+    """
+    loop = asyncio.get_running_loop()
+    reader = await loop.run_in_executor(None, open, filename, 'rb')
+    try:
+        buffer = bytearray()
+        while True:
+            chunk = await loop.run_in_executor(None, reader.read, chunk_size)
+            if not chunk:
+                return buffer
+            buffer += chunk
+    finally:
+        await loop.run_in_executor(None, reader.close)
+
+
+async def write_file_async(filename, data, chunk_size=ASYNC_CHUNK_SIZE):
+    """Writes data to a file in the default executor, one chunk at a time"""
+    loop = asyncio.get_running_loop()
+    writer = await loop.run_in_executor(None, open, filename, 'wb')
+    try:
+        with memoryview(data) as view:
+            for start in range(0, len(view), chunk_size):
+                await loop.run_in_executor(None, writer.write, view[start:(start + chunk_size)])
+    finally:
+        await loop.run_in_executor(None, writer.close)
+
+
+async def read_stream_async(reader, chunk_size=ASYNC_CHUNK_SIZE):
+    """Reads an asyncio stream reader (or any object with an async read method) until EOF
+    Returns:
+        A bytearray of the stream data
+    """
+    buffer = bytearray()
+    while True:
+        chunk = await reader.read(chunk_size)
+        if not chunk:
+            return buffer
+        buffer += chunk
+
+
+async def run_blocking(func, *args, byte_count=0):
+    """Runs func in the default executor if byte_count is large enough to block the event loop, otherwise calls it"""
+    if byte_count < MIN_EXECUTOR_BYTES:
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+
+async def load_cc_data(source, chunk_size=ASYNC_CHUNK_SIZE):
+    """Loads a CCDataFile without blocking the event loop
+    Args:
+        source : a DAT filename, a bytes-like object holding the DAT data, or an asyncio stream reader
+        chunk_size (int) : optional, the number of bytes read at a time from files and streams
+    Returns:
+        A CCDataFile object constructed with the data, or None if the DAT header is invalid
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        buffer = source
+    elif hasattr(source, "read"):
+        buffer = await read_stream_async(source, chunk_size)
+    else:
+        buffer = await read_file_async(source, chunk_size)
+    return await run_blocking(cc_dat_utils.make_cc_data_from_buffer, buffer, byte_count=len(buffer))
+
+
+async def dump_cc_data(cc_dat, use_rle=True):
+    """Serializes a CCDataFile without blocking the event loop
+    Returns:
+        A bytearray holding the DAT file data
+    """
+    # Levels are at most a few kilobytes each, so the level count is a cheap estimate of the work
+    return await run_blocking(cc_dat_utils.make_bytes_from_cc_data, cc_dat, use_rle, byte_count=cc_dat.level_count << 10)
+
+
+async def save_cc_data(cc_dat, destination, use_rle=True, chunk_size=ASYNC_CHUNK_SIZE):
+    """Saves a CCDataFile without blocking the event loop
+    Args:
+        cc_dat (CCDataFile) : the cc data to save
+        destination : a DAT filename or an asyncio stream writer. Stream writers are drained but not closed
+        use_rle (bool) : optional, set to False to skip Run Length Encoding of the layers
+        chunk_size (int) : optional, the number of bytes written at a time
+    Returns:
+        The number of bytes written
+    """
+    dat_bytes = await dump_cc_data(cc_dat, use_rle)
+    if hasattr(destination, "write"):
+        with memoryview(dat_bytes) as view:
+            for start in range(0, len(view), chunk_size):
+                destination.write(view[start:(start + chunk_size)])
+                await destination.drain()
+    else:
+        await write_file_async(destination, dat_bytes, chunk_size)
+    return len(dat_bytes)
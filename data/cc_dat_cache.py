@@ -0,0 +1,213 @@
+"""
+An on-disk cache of decoded Chip's Challenge (CC) DAT files
+Created for the class Programming for Game Designers
+
+Decoded CCDataFiles are pickled with protocol 5. Layer tiles and level records are written out-of-band after the
+pickle stream, so a cache hit restores them from slices of the cache file data with no RLE decoding.
+The optional fields of unchanged levels are left out since they are part of the level records, and are only decoded
+if they are used (see cc_data.CCLevel.__reduce_ex__), so a cache hit constructs no field objects at all.
+Fields of changed levels pickle as the values of their slots, see cc_data.CCField.__reduce_ex__.
+Entries are keyed by the path, modification time and size of a DAT file, or by a hash of its contents, and the
+least recently used entries are evicted once the cache grows past its size or entry limit
+Usage:
+    cache = cc_dat_cache.CCDatCache("cache_dir")
+    cc_dat = cache.load("pack.dat")
+"""
+import hashlib
+import os
+import pickle
+import struct
+import tempfile
+import cc_dat_utils
+
+# Bump when the cached form of the cc_data classes changes, so entries written by older code are not loaded
+CACHE_FORMAT_VERSION = 3
+CACHE_MAGIC = b"CCDC"
+CACHE_EXTENSION = ".ccdc"
+# Entry header: magic, format version, pickle byte count, out-of-band buffer count
+CACHE_HEADER_STRUCT = struct.Struct("<4sIQQ")
+BUFFER_SIZE_STRUCT = struct.Struct("<Q")
+HASH_CHUNK_SIZE = 1 << 20
+KEY_MODES = ("stat", "hash")
+
+
+def make_cache_entry_bytes(cc_dat):
+    """Returns the cache entry form of a CCDataFile as a list of byte pieces to write one after another"""
+    buffers = []
+    pickle_bytes = pickle.dumps(cc_dat, protocol=5, buffer_callback=buffers.append)
+    raw_buffers = [buffer.raw() for buffer in buffers]
+    pieces = [CACHE_HEADER_STRUCT.pack(CACHE_MAGIC, CACHE_FORMAT_VERSION, len(pickle_bytes), len(raw_buffers))]
+    pieces.append(b"".join(BUFFER_SIZE_STRUCT.pack(buffer.nbytes) for buffer in raw_buffers))
+    pieces.append(pickle_bytes)
+    pieces.extend(raw_buffers)
+    return pieces
+
+
+def make_cc_data_from_cache_entry(entry_bytes):
+    """Restores a CCDataFile from the data of a cache entry
+    The out-of-band buffers are memoryview slices of entry_bytes, which stays referenced by the restored levels
+    Returns:
+        The CCDataFile, or None if the entry was written by another format version
+    """
+    view = memoryview(entry_bytes)
+    magic, version, pickle_size, buffer_count = CACHE_HEADER_STRUCT.unpack_from(view, 0)
+    if magic != CACHE_MAGIC or version != CACHE_FORMAT_VERSION:
+        return None
+    offset = CACHE_HEADER_STRUCT.size
+    buffer_sizes = [size for (size,) in BUFFER_SIZE_STRUCT.iter_unpack(view[offset:(offset + buffer_count * 8)])]
+    offset += buffer_count * 8
+    pickle_view = view[offset:(offset + pickle_size)]
+    offset += pickle_size
+    buffers = []
+    for size in buffer_sizes:
+        buffers.append(view[offset:(offset + size)])
+        offset += size
+    return pickle.loads(pickle_view, buffers=buffers)
+
+
+class CCDatCache:
+    """A directory of decoded DAT files, with least recently used eviction
+    Member vars:
+        cache_dir (string): the directory holding the cache entries
+        key_mode (string): "stat" keys entries by DAT file path, modification time and size,
+            "hash" by a SHA-256 hash of the DAT file contents, which survives copies and touches but reads every file
+        max_bytes (int): the max total size of the cache entries, or None for no limit
+        max_entries (int): the max number of cache entries, or None for no limit
+        hits (int): the number of loads served from the cache
+        misses (int): the number of loads that decoded the DAT file
+    Entries are written to a temporary file and renamed into place, so several processes can share a cache directory
+    """
+
+    def __init__(self, cache_dir, key_mode="stat", max_bytes=1 << 30, max_entries=None):
+        if key_mode not in KEY_MODES:
+            raise ValueError("key_mode must be one of " + str(KEY_MODES) + ", not " + repr(key_mode))
+        self.cache_dir = cache_dir
+        self.key_mode = key_mode
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_key(self, dat_file):
+        """Returns the cache key of a DAT file as a hex string"""
+        key_hash = hashlib.sha256(b"%d\0" % CACHE_FORMAT_VERSION)
+        if self.key_mode == "stat":
+            stat = os.stat(dat_file)
+            key_hash.update(os.path.abspath(dat_file).encode("utf-8", "surrogateescape"))
+            key_hash.update(b"\0%d\0%d" % (stat.st_mtime_ns, stat.st_size))
+        else:
+            with open(dat_file, 'rb') as reader:
+                while True:
+                    chunk = reader.read(HASH_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    key_hash.update(chunk)
+        return key_hash.hexdigest()
+
+    def get_entry_filename(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_EXTENSION)
+
+    def get(self, key):
+        """Returns the cached CCDataFile for a key, or None if it is not cached
+        Unreadable entries are removed and count as not cached
+        """
+        entry_file = self.get_entry_filename(key)
+        try:
+            with open(entry_file, 'rb') as reader:
+                entry_bytes = reader.read()
+        except FileNotFoundError:
+            return None
+        try:
+            cc_dat = make_cc_data_from_cache_entry(entry_bytes)
+        except Exception:
+            cc_dat = None
+        if cc_dat is None:
+            self.remove(key)
+            return None
+        try:
+            # The modification time of an entry is its last use, for least recently used eviction
+            os.utime(entry_file)
+        except OSError:
+            pass
+        return cc_dat
+
+    def put(self, key, cc_dat):
+        """Stores a CCDataFile under a key, then evicts entries if the cache is over its limits"""
+        fd, temp_file = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as writer:
+                writer.writelines(make_cache_entry_bytes(cc_dat))
+            os.replace(temp_file, self.get_entry_filename(key))
+        except BaseException:
+            os.unlink(temp_file)
+            raise
+        self.evict()
+
+    def remove(self, key):
+        try:
+            os.unlink(self.get_entry_filename(key))
+        except FileNotFoundError:
+            pass
+
+    def get_entries(self):
+        """Returns a list of (last use time, byte count, filename) tuples of the cache entries, least recently used first"""
+        entries = []
+        with os.scandir(self.cache_dir) as scanner:
+            for entry in scanner:
+                if entry.name.endswith(CACHE_EXTENSION):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        entries.sort()
+        return entries
+
+    def evict(self):
+        """Removes least recently used entries until the cache is within max_bytes and max_entries
+        Returns:
+            The number of entries removed
+        """
+        entries = self.get_entries()
+        total_bytes = sum(size for last_use, size, filename in entries)
+        removed = 0
+        for last_use, size, filename in entries:
+            over_bytes = self.max_bytes is not None and total_bytes > self.max_bytes
+            over_entries = self.max_entries is not None and len(entries) - removed > self.max_entries
+            if not over_bytes and not over_entries:
+                break
+            try:
+                os.unlink(filename)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """Removes every cache entry"""
+        for last_use, size, filename in self.get_entries():
+            try:
+                os.unlink(filename)
+            except FileNotFoundError:
+                pass
+
+    def load(self, dat_file, use_mmap=False):
+        """Returns the CCDataFile of a DAT file, from the cache if possible, see cc_dat_utils.make_cc_data_from_dat
+        Args:
+            dat_file (string) : the filename of the DAT file to read in
+            use_mmap (bool) : optional, memory-map the DAT file when it has to be decoded
+        Returns:
+            A CCDataFile object, or None if the DAT header is invalid
+        """
+        key = self.get_key(dat_file)
+        cc_dat = self.get(key)
+        if cc_dat is not None:
+            self.hits += 1
+            return cc_dat
+        self.misses += 1
+        cc_dat = cc_dat_utils.make_cc_data_from_dat(dat_file, use_mmap)
+        if cc_dat is not None:
+            self.put(key, cc_dat)
+        return cc_dat
@@ -0,0 +1,575 @@
+"""
+Level by level diffs of Chip's Challenge (CC) DAT files, and a compact binary patch format to ship them
+Created for the class Programming for Game Designers
+
+Each level of the new pack is described relative to the old pack as one of:
+    a copy of an old level record, for unchanged levels, including levels that moved to another position
+    a level diff of an old level: the changed header fields, the changed tiles as rectangles covering bands of
+    changed rows, and the removed, added and changed optional fields
+    a whole level record, for new levels and for the rare level whose diff would not re-encode to the exact same bytes
+Levels are compared by their DAT records first, so unchanged levels cost a single bytes comparison.
+A patch file holds a header with hashes of the old and new DAT data, followed by the zlib compressed level
+operations. Applying a patch checks the old hash, copies the unchanged records from the old data without decoding
+them, and checks the new hash, so the result is byte for byte the new DAT file
+Usage:
+    python cc_dat_diff.py diff old.dat new.dat -o update.ccpatch
+    python cc_dat_diff.py apply old.dat update.ccpatch -o new.dat
+    python cc_dat_diff.py show old.dat new.dat
+"""
+import argparse
+import hashlib
+import struct
+import sys
+import zlib
+import cc_data
+import cc_dat_utils
+
+PATCH_MAGIC = b"CCDP"
+PATCH_FORMAT_VERSION = 1
+# Patch header: magic, format version, old DAT hash, new DAT hash, new level count
+PATCH_HEADER_STRUCT = struct.Struct("<4sH16s16sH")
+DAT_HASH_SIZE = 16
+OP_COPY = 0
+OP_PATCH = 1
+OP_RECORD = 2
+# Copy: old level index, number of consecutive levels
+COPY_STRUCT = struct.Struct("<HH")
+# Level diff: old level index, flags, then a word for each changed header attribute and the tile rectangle count
+LEVEL_DIFF_STRUCT = struct.Struct("<HB")
+# Tile rectangle: layer, x, y, width, height, then width * height tile deltas row by row
+RECTANGLE_STRUCT = struct.Struct("<5B")
+HEADER_ATTRIBUTES = ("level_number", "time", "num_chips")
+FIELD_ORDER_FLAG = 1 << len(HEADER_ATTRIBUTES)
+UPPER_LAYER = 0
+LOWER_LAYER = 1
+
+
+class CCLevelDiff:
+    """The changes from an old level to a new one
+    Member vars:
+        old_index (int): the index of the old level in the old pack
+        header_changes (dictionary): the new value of each changed attribute of HEADER_ATTRIBUTES
+        tile_changes (list of tuples): (layer, x, y, width, height, tile_deltas) rectangles of changed tiles, layer
+            is UPPER_LAYER or LOWER_LAYER and tile_deltas is the bytes of the rectangle row by row, each new tile XOR
+            the old tile. Unchanged tiles inside a rectangle are then 0, which zlib compresses to almost nothing
+        removed_field_types (list of ints): the type_val of each optional field of the old level missing from the new
+        changed_fields (list of tuples): (type_val, byte_data) of each new or changed optional field
+        field_order (list of ints): the type_val of every optional field of the new level in order, or None if the
+            fields are in the old order with new fields at the end
+    """
+
+    def __init__(self, old_index):
+        self.old_index = old_index
+        self.header_changes = {}
+        self.tile_changes = []
+        self.removed_field_types = []
+        self.changed_fields = []
+        self.field_order = None
+
+    def __str__(self):
+        return_str = "level " + str(self.old_index + 1) + ":"
+        for name, value in self.header_changes.items():
+            return_str += " " + name + "=" + str(value)
+        for layer, x, y, width, height, tile_deltas in self.tile_changes:
+            return_str += " " + ("upper" if layer == UPPER_LAYER else "lower") + "[{0},{1} {2}x{3}]".format(
+                x, y, width, height)
+        if self.removed_field_types:
+            return_str += " removed fields " + str(self.removed_field_types)
+        if self.changed_fields:
+            return_str += " changed fields " + str([field_type for field_type, byte_data in self.changed_fields])
+        if self.field_order is not None:
+            return_str += " field order " + str(self.field_order)
+        return return_str
+
+    def apply_to(self, level):
+        """Makes the given copy of the old level into the new level"""
+        for name, value in self.header_changes.items():
+            setattr(level, name, value)
+        for layer_id, x, y, width, height, tile_deltas in self.tile_changes:
+            layer = level.upper_layer if layer_id == UPPER_LAYER else level.lower_layer
+            for row in range(height):
+                start = (y + row) * cc_data.CCLayer.WIDTH + x
+                layer[start:(start + width)] = xor_bytes(layer[start:(start + width)],
+                                                         tile_deltas[(row * width):((row + 1) * width)])
+        if self.removed_field_types or self.changed_fields or self.field_order is not None:
+            removed_types = set(self.removed_field_types)
+            fields = {field.type_val: field for field in level.optional_fields if field.type_val not in removed_types}
+            field_order = self.field_order if self.field_order is not None else list(fields)
+            for field_type, byte_data in self.changed_fields:
+                if field_type not in fields and self.field_order is None:
+                    field_order.append(field_type)
+                fields[field_type] = cc_dat_utils.make_field_from_bytes(field_type, byte_data)
+            level.optional_fields = cc_data.CCTrackedList(fields[field_type] for field_type in field_order)
+
+    def serialize_into(self, buffer):
+        """Appends the patch form of the level diff to a buffer"""
+        flags = 0
+        for bit, name in enumerate(HEADER_ATTRIBUTES):
+            if name in self.header_changes:
+                flags |= 1 << bit
+        if self.field_order is not None:
+            flags |= FIELD_ORDER_FLAG
+        buffer += LEVEL_DIFF_STRUCT.pack(self.old_index, flags)
+        for name in HEADER_ATTRIBUTES:
+            if name in self.header_changes:
+                buffer += cc_dat_utils.WORD_STRUCT.pack(self.header_changes[name])
+        buffer += cc_dat_utils.WORD_STRUCT.pack(len(self.tile_changes))
+        for layer, x, y, width, height, tile_deltas in self.tile_changes:
+            buffer += RECTANGLE_STRUCT.pack(layer, x, y, width, height)
+            buffer += tile_deltas
+        buffer.append(len(self.removed_field_types))
+        buffer += bytes(self.removed_field_types)
+        buffer.append(len(self.changed_fields))
+        for field_type, byte_data in self.changed_fields:
+            buffer += cc_dat_utils.FIELD_HEADER_STRUCT.pack(field_type, len(byte_data))
+            buffer += byte_data
+        if self.field_order is not None:
+            buffer.append(len(self.field_order))
+            buffer += bytes(self.field_order)
+
+
+def make_level_diff_from_buffer(view, offset):
+    """Reads a level diff written by CCLevelDiff.serialize_into
+    Returns:
+        A tuple of (CCLevelDiff, offset of the data after it)
+    """
+    old_index, flags = LEVEL_DIFF_STRUCT.unpack_from(view, offset)
+    offset += LEVEL_DIFF_STRUCT.size
+    level_diff = CCLevelDiff(old_index)
+    for bit, name in enumerate(HEADER_ATTRIBUTES):
+        if flags & (1 << bit):
+            level_diff.header_changes[name] = cc_dat_utils.WORD_STRUCT.unpack_from(view, offset)[0]
+            offset += 2
+    rectangle_count = cc_dat_utils.WORD_STRUCT.unpack_from(view, offset)[0]
+    offset += 2
+    for i in range(rectangle_count):
+        layer, x, y, width, height = RECTANGLE_STRUCT.unpack_from(view, offset)
+        offset += RECTANGLE_STRUCT.size
+        tile_deltas = bytes(view[offset:(offset + width * height)])
+        level_diff.tile_changes.append((layer, x, y, width, height, tile_deltas))
+        offset += width * height
+    removed_count = view[offset]
+    level_diff.removed_field_types = list(view[(offset + 1):(offset + 1 + removed_count)])
+    offset += 1 + removed_count
+    changed_count = view[offset]
+    offset += 1
+    for i in range(changed_count):
+        field_type, field_size = cc_dat_utils.FIELD_HEADER_STRUCT.unpack_from(view, offset)
+        offset += 2
+        level_diff.changed_fields.append((field_type, bytes(view[offset:(offset + field_size)])))
+        offset += field_size
+    if flags & FIELD_ORDER_FLAG:
+        order_count = view[offset]
+        level_diff.field_order = list(view[(offset + 1):(offset + 1 + order_count)])
+        offset += 1 + order_count
+    return level_diff, offset
+
+
+def xor_bytes(byte_data, other_byte_data):
+    """Returns the bytes of two equal length bytes-like objects XORed together"""
+    return (int.from_bytes(byte_data, "little") ^ int.from_bytes(other_byte_data, "little")).to_bytes(
+        len(byte_data), "little")
+
+
+def make_tile_changes(old_layer, new_layer, layer_id):
+    """Returns the rectangles of changed tiles between two layers
+    Consecutive changed rows form a band, and each band is covered by one rectangle spanning its changed columns
+    Returns:
+        A list of (layer, x, y, width, height, tile_deltas) tuples, see CCLevelDiff
+    """
+    old_bytes = cc_dat_utils.get_layer_bytes(old_layer)
+    new_bytes = cc_dat_utils.get_layer_bytes(new_layer)
+    if old_bytes == new_bytes:
+        return []
+    width = cc_data.CCLayer.WIDTH
+    bands = []
+    band = None
+    for y in range(cc_data.CCLayer.HEIGHT):
+        start = y * width
+        old_row = old_bytes[start:(start + width)]
+        new_row = new_bytes[start:(start + width)]
+        if old_row == new_row:
+            band = None
+            continue
+        changed_columns = [x for x in range(width) if old_row[x] != new_row[x]]
+        if band is None:
+            band = [y, y, changed_columns[0], changed_columns[-1]]
+            bands.append(band)
+        else:
+            band[1] = y
+            band[2] = min(band[2], changed_columns[0])
+            band[3] = max(band[3], changed_columns[-1])
+    tile_changes = []
+    for top, bottom, left, right in bands:
+        tile_deltas = b"".join(xor_bytes(old_bytes[(y * width + left):(y * width + right + 1)],
+                                         new_bytes[(y * width + left):(y * width + right + 1)])
+                               for y in range(top, bottom + 1))
+        tile_changes.append((layer_id, left, top, right - left + 1, bottom - top + 1, tile_deltas))
+    return tile_changes
+
+
+def make_level_diff(old_level, new_level, old_index):
+    """Compares two levels
+    Args:
+        old_level (CCLevel) : the level in the old pack
+        new_level (CCLevel) : the level in the new pack
+        old_index (int) : the index of old_level in the old pack
+    Returns:
+        A CCLevelDiff of the changes
+    """
+    level_diff = CCLevelDiff(old_index)
+    for name in HEADER_ATTRIBUTES:
+        if getattr(old_level, name) != getattr(new_level, name):
+            level_diff.header_changes[name] = getattr(new_level, name)
+    level_diff.tile_changes = (make_tile_changes(old_level.upper_layer, new_level.upper_layer, UPPER_LAYER) +
+                               make_tile_changes(old_level.lower_layer, new_level.lower_layer, LOWER_LAYER))
+    old_fields = {field.type_val: field.byte_data for field in old_level.optional_fields}
+    new_types = [field.type_val for field in new_level.optional_fields]
+    level_diff.removed_field_types = [field_type for field_type in old_fields if field_type not in new_types]
+    level_diff.changed_fields = [(field.type_val, bytes(field.byte_data)) for field in new_level.optional_fields
+                                 if old_fields.get(field.type_val) != field.byte_data]
+    default_order = [field_type for field_type in old_fields if field_type in new_types]
+    default_order += [field_type for field_type in new_types if field_type not in old_fields]
+    if new_types != default_order:
+        level_diff.field_order = new_types
+    return level_diff
+
+
+def make_level_records_from_buffer(buffer):
+    """Returns a list of memoryview slices of every level record in DAT file data, or None if the header is invalid
+    Each record starts with its 2 byte size, nothing is decoded
+    """
+    view = memoryview(buffer)
+    offsets = cc_dat_utils.make_level_offsets_from_buffer(view)
+    if offsets is None:
+        return None
+    return [view[offset:(offset + 2 + cc_dat_utils.WORD_STRUCT.unpack_from(view, offset)[0])] for offset in offsets]
+
+
+def make_level_from_record(record):
+    """Decodes a single DAT level record"""
+    return cc_dat_utils.make_level_from_buffer(memoryview(record), 0)[0]
+
+
+def make_patched_record(old_record, level_diff):
+    """Applies a level diff to an old DAT level record
+    Returns:
+        A bytearray of the new level record
+    """
+    level = make_level_from_record(old_record)
+    level_diff.apply_to(level)
+    return cc_dat_utils.make_bytes_from_level(level)
+
+
+def get_level_record(level):
+    """Returns the DAT record of a level, its raw_record if it is unchanged"""
+    if level.dirty:
+        return cc_dat_utils.make_bytes_from_level(level)
+    return level.raw_record
+
+
+def make_dat_hash(level_records):
+    """Returns the hash of the DAT file made of the given level records"""
+    dat_hash = hashlib.blake2b(digest_size=DAT_HASH_SIZE)
+    dat_hash.update(cc_dat_utils.CC_DAT_HEADER_CODE)
+    dat_hash.update(len(level_records).to_bytes(2, cc_data.BYTE_ORDER))
+    for record in level_records:
+        dat_hash.update(record)
+    return dat_hash.digest()
+
+
+class CCDatDiff:
+    """The changes from an old pack to a new one
+    Member vars:
+        old_hash (bytes): the hash of the old DAT data
+        new_hash (bytes): the hash of the new DAT data
+        level_ops (list of tuples): one (op, value) tuple per run of new levels, in order:
+            (OP_COPY, (old index, count)) for count unchanged levels copied from consecutive old levels
+            (OP_PATCH, CCLevelDiff) for a changed level
+            (OP_RECORD, level record bytes) for a level stored whole
+    """
+
+    def __init__(self, old_hash, new_hash):
+        self.old_hash = old_hash
+        self.new_hash = new_hash
+        self.level_ops = []
+
+    def __str__(self):
+        copied = sum(value[1] for op, value in self.level_ops if op == OP_COPY)
+        return_str = "{0} levels: {1} unchanged, {2} changed, {3} stored whole\n".format(
+            self.level_count, copied, self.op_count(OP_PATCH), self.op_count(OP_RECORD))
+        for op, value in self.level_ops:
+            if op == OP_PATCH:
+                return_str += "  " + str(value) + "\n"
+        return return_str
+
+    @property
+    def level_count(self):
+        return sum(value[1] if op == OP_COPY else 1 for op, value in self.level_ops)
+
+    def op_count(self, op):
+        return sum(1 for level_op, value in self.level_ops if level_op == op)
+
+    def add_copy(self, old_index):
+        if self.level_ops and self.level_ops[-1][0] == OP_COPY:
+            start, count = self.level_ops[-1][1]
+            if start + count == old_index and count < 0xFFFF:
+                self.level_ops[-1] = (OP_COPY, (start, count + 1))
+                return
+        self.level_ops.append((OP_COPY, (old_index, 1)))
+
+    def make_patch_bytes(self, compress_level=9):
+        """Returns the patch file data of the diff"""
+        body = bytearray()
+        for op, value in self.level_ops:
+            body.append(op)
+            if op == OP_COPY:
+                body += COPY_STRUCT.pack(*value)
+            elif op == OP_PATCH:
+                value.serialize_into(body)
+            else:
+                body += value
+        header = PATCH_HEADER_STRUCT.pack(PATCH_MAGIC, PATCH_FORMAT_VERSION, self.old_hash, self.new_hash,
+                                          self.level_count)
+        return header + zlib.compress(body, compress_level)
+
+
+def make_dat_diff_from_records(old_records, new_records, old_levels=None, new_levels=None):
+    """Compares two packs level by level, given the DAT records of their levels
+    Each new level is compared with the old level at the same index, and with the old level holding the same record
+    if it moved. Only the levels whose records differ are decoded, and are diffed with the old level at the same index,
+    the old level with the same level number and the old levels following the last old level used. The smallest diff is kept if applying it re-encodes to the
+    exact new record and it is smaller than the record, otherwise the record is stored whole
+    Args:
+        old_records (list of bytes-like objects) : the level records of the old pack
+        new_records (list of bytes-like objects) : the level records of the new pack
+        old_levels (list of CCLevels) : optional, the decoded old levels. Levels are decoded from their records if not given
+        new_levels (list of CCLevels) : optional, the decoded new levels
+    Returns:
+        A CCDatDiff
+    """
+    dat_diff = CCDatDiff(make_dat_hash(old_records), make_dat_hash(new_records))
+    old_indices = None
+    # The old level after the last one used in order, so levels after an insertion or removal are diffed with their
+    # old selves. Levels copied from elsewhere in the old pack and diffs much larger than an edit do not move it
+    next_old_index = 0
+    for index, new_record in enumerate(new_records):
+        if index < len(old_records) and old_records[index] == new_record:
+            dat_diff.add_copy(index)
+            next_old_index = index + 1
+            continue
+        if old_indices is None:
+            # Only built once a level differs, to find levels that moved
+            old_indices = {}
+            old_number_indices = {}
+            for old_index, old_record in enumerate(old_records):
+                old_indices.setdefault(bytes(old_record), old_index)
+                old_number_indices.setdefault(cc_dat_utils.WORD_STRUCT.unpack_from(old_record, 2)[0], old_index)
+        old_index = old_indices.get(bytes(new_record))
+        if old_index is not None:
+            dat_diff.add_copy(old_index)
+            if old_index == next_old_index:
+                next_old_index += 1
+            continue
+        new_level = new_levels[index] if new_levels is not None else make_level_from_record(new_record)
+        best_diff = None
+        best_size = len(new_record)
+        new_number = cc_dat_utils.WORD_STRUCT.unpack_from(new_record, 2)[0]
+        candidates = {index, next_old_index, next_old_index + 1, old_number_indices.get(new_number, index)}
+        for old_index in sorted(candidates):
+            if old_index >= len(old_records):
+                continue
+            old_level = old_levels[old_index] if old_levels is not None else make_level_from_record(old_records[old_index])
+            level_diff = make_level_diff(old_level, new_level, old_index)
+            diff_bytes = bytearray()
+            level_diff.serialize_into(diff_bytes)
+            # zlib compresses the zero tile deltas to almost nothing, so a diff costs about its non-zero bytes
+            diff_size = len(diff_bytes) - diff_bytes.count(0)
+            if diff_size < best_size:
+                best_diff = level_diff
+                best_size = diff_size
+        if best_diff is not None and make_patched_record(old_records[best_diff.old_index], best_diff) == new_record:
+            dat_diff.level_ops.append((OP_PATCH, best_diff))
+            if best_size * 4 < len(new_record):
+                next_old_index = best_diff.old_index + 1
+        else:
+            dat_diff.level_ops.append((OP_RECORD, bytes(new_record)))
+    return dat_diff
+
+
+def make_dat_diff(old_cc_dat, new_cc_dat):
+    """Compares two packs level by level, see make_dat_diff_from_records
+    Args:
+        old_cc_dat (CCDataFile) : the old pack
+        new_cc_dat (CCDataFile) : the new pack
+    Returns:
+        A CCDatDiff
+    """
+    old_records = [get_level_record(level) for level in old_cc_dat.levels]
+    new_records = [get_level_record(level) for level in new_cc_dat.levels]
+    return make_dat_diff_from_records(old_records, new_records, old_cc_dat.levels, new_cc_dat.levels)
+
+
+def make_dat_diff_from_buffer(old_buffer, new_buffer):
+    """Compares the data of two DAT files, decoding only the levels that changed, see make_dat_diff_from_records
+    Args:
+        old_buffer (bytes-like object) : the complete contents of the old DAT file
+        new_buffer (bytes-like object) : the complete contents of the new DAT file
+    Returns:
+        A CCDatDiff, or None if either DAT header is invalid
+    """
+    old_records = make_level_records_from_buffer(old_buffer)
+    new_records = make_level_records_from_buffer(new_buffer)
+    if old_records is None or new_records is None:
+        return None
+    return make_dat_diff_from_records(old_records, new_records)
+
+
+def make_dat_diff_from_dat(old_dat_file, new_dat_file):
+    """Reads two DAT files and compares them, see make_dat_diff_from_buffer"""
+    with open(old_dat_file, 'rb') as reader:
+        old_buffer = reader.read()
+    with open(new_dat_file, 'rb') as reader:
+        new_buffer = reader.read()
+    return make_dat_diff_from_buffer(old_buffer, new_buffer)
+
+
+def make_dat_diff_from_patch(patch_bytes):
+    """Reads the data of a patch file
+    Returns:
+        A CCDatDiff
+    Raises:
+        ValueError: if the data is not a patch of this format version
+    """
+    with memoryview(patch_bytes) as view:
+        if len(view) < PATCH_HEADER_STRUCT.size:
+            raise ValueError("patch data is too short")
+        magic, version, old_hash, new_hash, level_count = PATCH_HEADER_STRUCT.unpack_from(view, 0)
+        if magic != PATCH_MAGIC or version != PATCH_FORMAT_VERSION:
+            raise ValueError("not a version " + str(PATCH_FORMAT_VERSION) + " CC DAT patch")
+        body = zlib.decompress(view[PATCH_HEADER_STRUCT.size:])
+    dat_diff = CCDatDiff(old_hash, new_hash)
+    with memoryview(body) as body_view:
+        offset = 0
+        while offset < len(body_view):
+            op = body_view[offset]
+            offset += 1
+            if op == OP_COPY:
+                dat_diff.level_ops.append((OP_COPY, COPY_STRUCT.unpack_from(body_view, offset)))
+                offset += COPY_STRUCT.size
+            elif op == OP_PATCH:
+                level_diff, offset = make_level_diff_from_buffer(body_view, offset)
+                dat_diff.level_ops.append((OP_PATCH, level_diff))
+            elif op == OP_RECORD:
+                record_end = offset + 2 + cc_dat_utils.WORD_STRUCT.unpack_from(body_view, offset)[0]
+                dat_diff.level_ops.append((OP_RECORD, bytes(body_view[offset:record_end])))
+                offset = record_end
+            else:
+                raise ValueError("unknown patch operation " + str(op))
+    if dat_diff.level_count != level_count:
+        raise ValueError("patch holds " + str(dat_diff.level_count) + " levels, expected " + str(level_count))
+    return dat_diff
+
+
+def apply_patch_to_buffer(old_buffer, patch_bytes):
+    """Applies a patch to old DAT file data
+    Unchanged level records are copied from the old data without decoding them
+    Args:
+        old_buffer (bytes-like object) : the complete contents of the old DAT file
+        patch_bytes (bytes-like object) : the patch file data
+    Returns:
+        A bytearray of the new DAT file data
+    Raises:
+        ValueError: if the patch is invalid, was made from other old data or does not produce the expected data
+    """
+    dat_diff = make_dat_diff_from_patch(patch_bytes)
+    old_records = make_level_records_from_buffer(old_buffer)
+    if old_records is None:
+        raise ValueError("the old DAT header is invalid")
+    if make_dat_hash(old_records) != dat_diff.old_hash:
+        raise ValueError("the patch was made from a different old DAT file")
+    new_records = []
+    for op, value in dat_diff.level_ops:
+        if op == OP_COPY:
+            start, count = value
+            new_records += old_records[start:(start + count)]
+        elif op == OP_PATCH:
+            new_records.append(make_patched_record(old_records[value.old_index], value))
+        else:
+            new_records.append(value)
+    if make_dat_hash(new_records) != dat_diff.new_hash:
+        raise ValueError("the patched DAT data does not match the patch")
+    new_buffer = bytearray(cc_dat_utils.CC_DAT_HEADER_CODE)
+    new_buffer += len(new_records).to_bytes(2, cc_data.BYTE_ORDER)
+    for record in new_records:
+        new_buffer += record
+    return new_buffer
+
+
+def apply_patch(old_cc_dat, patch_bytes):
+    """Applies a patch to a pack, see apply_patch_to_buffer
+    Returns:
+        A CCDataFile of the new pack
+    """
+    new_buffer = apply_patch_to_buffer(cc_dat_utils.make_bytes_from_cc_data(old_cc_dat), patch_bytes)
+    return cc_dat_utils.make_cc_data_from_buffer(bytes(new_buffer))
+
+
+def write_patch(old_dat_file, new_dat_file, patch_file):
+    """Writes the patch from one DAT file to another
+    Returns:
+        The CCDatDiff of the patch, or None if either DAT header is invalid
+    """
+    dat_diff = make_dat_diff_from_dat(old_dat_file, new_dat_file)
+    if dat_diff is not None:
+        with open(patch_file, 'wb') as writer:
+            writer.write(dat_diff.make_patch_bytes())
+    return dat_diff
+
+
+def apply_patch_to_dat(old_dat_file, patch_file, new_dat_file):
+    """Applies a patch file to a DAT file and writes the new DAT file, see apply_patch_to_buffer"""
+    with open(old_dat_file, 'rb') as reader:
+        old_buffer = reader.read()
+    with open(patch_file, 'rb') as reader:
+        patch_bytes = reader.read()
+    new_buffer = apply_patch_to_buffer(old_buffer, patch_bytes)
+    with open(new_dat_file, 'wb') as writer:
+        writer.write(new_buffer)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff and patch Chip's Challenge DAT files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    diff_parser = commands.add_parser("diff", help="write the patch from OLD to NEW")
+    diff_parser.add_argument("old", help="the old DAT file")
+    diff_parser.add_argument("new", help="the new DAT file")
+    diff_parser.add_argument("-o", "--output", required=True, help="the patch file to write")
+    apply_parser = commands.add_parser("apply", help="apply PATCH to OLD")
+    apply_parser.add_argument("old", help="the old DAT file")
+    apply_parser.add_argument("patch", help="the patch file")
+    apply_parser.add_argument("-o", "--output", required=True, help="the new DAT file to write")
+    show_parser = commands.add_parser("show", help="print the changes from OLD to NEW")
+    show_parser.add_argument("old", help="the old DAT file")
+    show_parser.add_argument("new", help="the new DAT file")
+    args = parser.parse_args(argv)
+
+    if args.command == "apply":
+        try:
+            apply_patch_to_dat(args.old, args.patch, args.output)
+        except ValueError as e:
+            print("ERROR: " + str(e))
+            return 1
+        return 0
+    if args.command == "diff":
+        dat_diff = write_patch(args.old, args.new, args.output)
+    else:
+        dat_diff = make_dat_diff_from_dat(args.old, args.new)
+    if dat_diff is None:
+        return 1
+    print(dat_diff, end="")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
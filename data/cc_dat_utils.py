@@ -2,198 +2,882 @@
 Methods for encoding and decoding Chip's Challenge (CC) data to and from binary DAT files
 Created for the class Programming for Game Designers
 """
+import collections
+import collections.abc
+import concurrent.futures
+import itertools
+import mmap
+import os
+import struct
+import threading
+import time
 import cc_data
 
 CC_DAT_HEADER_CODE = b'\xAC\xAA\x02\x00'
 RLE_CODE_INT = 255
+RLE_MAX_COPIES = 255  # the copy count of a run is stored in a single byte
+SINGLE_BYTES = [bytes((i,)) for i in range(256)]
+# Translates XORed tile pairs to 1 where the tiles are equal and 0 where they differ
+EQUAL_TABLE = bytes((1,)) + bytes(255)
+MAX_LEVEL_COUNT = 65535  # the level count of a DAT file is stored in 2 bytes
 
-READ_ADDRESS = 0
+# Precompiled layouts used when parsing directly from a buffer. All DAT words are little endian (see cc_data.BYTE_ORDER)
+# Level header: size, level number, time, chip count, map detail, upper layer byte count
+LEVEL_HEADER_STRUCT = struct.Struct("<6H")
+WORD_STRUCT = struct.Struct("<H")
+FIELD_HEADER_STRUCT = struct.Struct("<2B")
 
-def do_read(reader, byte_count):
+
+class CCParseStats:
+    """Collects instrumentation while DAT data is parsed. Pass one to the make_* functions through their stats argument
+    Counters accumulate over every parse the object is used for, except read_address which restarts with each file
+    Member vars:
+        read_address (int): the byte offset of the next read in the data being parsed
+        bytes_read (int): the total number of bytes parsed
+        level_count (int): the number of levels parsed
+        header_bytes, layer_bytes, field_bytes (int): the bytes parsed in the header, layer and optional field phases
+        header_time, layer_time, field_time (float): the seconds spent in each phase
+        rle_runs (int): the number of Run Length Encoded runs decoded
+        rle_tiles (int): the number of tiles produced by those runs
+        field_counts (dict of int to int): the number of fields parsed for each field type
+        field_type_bytes (dict of int to int): the bytes parsed for each field type, including the type and size bytes
+        on_read (function): optional callback(offset, byte_count, data) made for every do_read call, and for the same
+            pieces of data when they are parsed in place from a buffer, where data is a memoryview slice of it
+        on_level (function): optional callback(level, offset, byte_count) made after each level is parsed
+    """
+
+    def __init__(self, on_read=None, on_level=None):
+        self.read_address = 0
+        self.bytes_read = 0
+        self.level_count = 0
+        self.header_bytes = 0
+        self.layer_bytes = 0
+        self.field_bytes = 0
+        self.header_time = 0.0
+        self.layer_time = 0.0
+        self.field_time = 0.0
+        self.rle_runs = 0
+        self.rle_tiles = 0
+        self.field_counts = {}
+        self.field_type_bytes = {}
+        self.on_read = on_read
+        self.on_level = on_level
+
+    def add_level(self, level, offset, byte_count):
+        """Records a parsed level record of byte_count bytes starting at offset"""
+        self.level_count += 1
+        if self.on_level is not None:
+            self.on_level(level, offset, byte_count)
+
+    def add_field(self, field_type, byte_count):
+        """Records a parsed optional field of byte_count bytes (including its 2 byte type and size)"""
+        self.field_counts[field_type] = self.field_counts.get(field_type, 0) + 1
+        self.field_type_bytes[field_type] = self.field_type_bytes.get(field_type, 0) + byte_count
+
+    def merge(self, other):
+        """Adds the counters of another CCParseStats to this one, such as the stats of a parse run on another thread"""
+        for name in ("bytes_read", "level_count", "header_bytes", "layer_bytes", "field_bytes",
+                     "header_time", "layer_time", "field_time", "rle_runs", "rle_tiles"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for field_type, count in other.field_counts.items():
+            self.field_counts[field_type] = self.field_counts.get(field_type, 0) + count
+        for field_type, byte_count in other.field_type_bytes.items():
+            self.field_type_bytes[field_type] = self.field_type_bytes.get(field_type, 0) + byte_count
+
+    @property
+    def json_data(self):
+        json_stats = {}
+        for name in ("bytes_read", "level_count", "header_bytes", "layer_bytes", "field_bytes",
+                     "header_time", "layer_time", "field_time", "rle_runs", "rle_tiles"):
+            json_stats[name] = getattr(self, name)
+        json_stats["field_counts"] = {str(field_type): count for field_type, count in self.field_counts.items()}
+        json_stats["field_type_bytes"] = {str(field_type): byte_count
+                                          for field_type, byte_count in self.field_type_bytes.items()}
+        return json_stats
+
+    def __str__(self):
+        total_time = self.header_time + self.layer_time + self.field_time
+        return_str = "Parse Stats:\n"
+        return_str += "  " + str(self.level_count) + " levels, " + str(self.bytes_read) + " bytes\n"
+        for phase in ("header", "layer", "field"):
+            phase_time = getattr(self, phase + "_time")
+            return_str += "  {0:<7} {1:>10} bytes {2:10.6f} s ({3:5.1f}%)\n".format(
+                phase, getattr(self, phase + "_bytes"), phase_time, 100 * phase_time / total_time if total_time else 0)
+        return_str += "  RLE runs = " + str(self.rle_runs) + " (" + str(self.rle_tiles) + " tiles)\n"
+        return_str += "  Field counts = " + str(dict(sorted(self.field_counts.items()))) + "\n"
+        return_str += "  Field bytes = " + str(dict(sorted(self.field_type_bytes.items())))
+        return return_str
+
+
+def do_read(reader, byte_count, stats=None):
     """Utility read function to enable address tracking and other debugging when reading binary files
-    Currently keeps track of the current byte address in the file in the global variable TEMP_ADDRESS
     Args:
         reader (BufferedReader) : reader to read from
         byte_count (int) : number of bytes to read
+        stats (CCParseStats) : optional, keeps track of the current byte address and is told about each read
     """
-    global READ_ADDRESS
     to_return = reader.read(byte_count)
-    # print("x"+format(TEMP_ADDRESS, '02x')+": "+str(to_return)+" ("+str(int.from_bytes(to_return, cc_data.BYTE_ORDER))+")")
-    READ_ADDRESS += byte_count
+    if stats is not None:
+        if stats.on_read is not None:
+            stats.on_read(stats.read_address, byte_count, to_return)
+        stats.read_address += byte_count
+        stats.bytes_read += byte_count
     return to_return
 
 
+def report_read(stats, offset, data):
+    """Makes the on_read callback of stats for data parsed in place at offset in a buffer, see do_read
+    Args:
+        stats (CCParseStats) : the stats with the on_read callback, which may be None
+        offset (int) : the byte offset of data in the buffer
+        data (memoryview) : the bytes parsed
+    """
+    if stats.on_read is not None:
+        stats.on_read(offset, len(data), data)
+
+
 def get_string_from_bytes(byte_data, encoding="ascii"):
     """Decodes a string from DAT file byte data.
     Note that in byte form these strings are 0 terminated and this 0 is removed
     Args:
-        byte_data (bytes) : the binary data to convert to a string
+        byte_data (bytes or memoryview) : the binary data to convert to a string
         encoding (string) : optional, the encoding type to use when converting
     """
     string_bytes = byte_data[0:(len(byte_data) - 1)]  # strip off the 0 at the end of the string
-    string = string_bytes.decode(encoding)
+    string = str(string_bytes, encoding)  # str() accepts bytes and memoryviews alike
     return string
 
 
+def get_whole_records(field_bytes, record_struct):
+    """Returns field_bytes trimmed to a whole number of record_struct records"""
+    return field_bytes[0:(len(field_bytes) - len(field_bytes) % record_struct.size)]
+
+
+def make_map_title_field_from_bytes(field_bytes):
+    """Decodes a CCMapTitleField from its 0 terminated string data"""
+    return cc_data.CCMapTitleField(get_string_from_bytes(field_bytes))
+
+
+def make_trap_controls_field_from_bytes(field_bytes):
+    """Decodes a CCTrapControlsField from its 10 byte trap records"""
+    record_bytes = get_whole_records(field_bytes, cc_data.TRAP_CONTROL_STRUCT)
+    traps = [cc_data.CCTrapControl(bx, by, tx, ty) for bx, by, tx, ty in cc_data.TRAP_CONTROL_STRUCT.iter_unpack(record_bytes)]
+    return cc_data.CCTrapControlsField(traps)
+
+
+def make_cloning_machine_controls_field_from_bytes(field_bytes):
+    """Decodes a CCCloningMachineControlsField from its 8 byte machine records"""
+    record_bytes = get_whole_records(field_bytes, cc_data.CLONING_MACHINE_CONTROL_STRUCT)
+    machines = [cc_data.CCCloningMachineControl(bx, by, tx, ty)
+                for bx, by, tx, ty in cc_data.CLONING_MACHINE_CONTROL_STRUCT.iter_unpack(record_bytes)]
+    return cc_data.CCCloningMachineControlsField(machines)
+
+
+def make_encoded_password_field_from_bytes(field_bytes):
+    """Decodes a CCEncodedPasswordField from its 0 terminated password bytes"""
+    # passwords are encoded as a list of ints
+    # password data is terminated with a zero, so the last byte is left out
+    return cc_data.CCEncodedPasswordField(list(field_bytes[0:(len(field_bytes) - 1)]))
+
+
+def make_map_hint_field_from_bytes(field_bytes):
+    """Decodes a CCMapHintField from its 0 terminated string data"""
+    return cc_data.CCMapHintField(get_string_from_bytes(field_bytes))
+
+
+def make_password_field_from_bytes(field_bytes):
+    """Decodes a CCPasswordField from its 0 terminated string data"""
+    return cc_data.CCPasswordField(get_string_from_bytes(field_bytes))
+
+
+def make_monster_movement_field_from_bytes(field_bytes):
+    """Decodes a CCMonsterMovementField from its 2 byte monster coordinates"""
+    record_bytes = get_whole_records(field_bytes, cc_data.MONSTER_COORDINATE_STRUCT)
+    monsters = [cc_data.CCCoordinate(x, y) for x, y in cc_data.MONSTER_COORDINATE_STRUCT.iter_unpack(record_bytes)]
+    return cc_data.CCMonsterMovementField(monsters)
+
+
+# The field decoders, keyed by field TYPE. Each decoder takes the field's byte data and returns the constructed field.
+# Encoding is the other half of each codec and is done by the make_byte_data method of the field classes
+FIELD_DECODERS = {
+    cc_data.CCMapTitleField.TYPE: make_map_title_field_from_bytes,
+    cc_data.CCTrapControlsField.TYPE: make_trap_controls_field_from_bytes,
+    cc_data.CCCloningMachineControlsField.TYPE: make_cloning_machine_controls_field_from_bytes,
+    cc_data.CCEncodedPasswordField.TYPE: make_encoded_password_field_from_bytes,
+    cc_data.CCMapHintField.TYPE: make_map_hint_field_from_bytes,
+    cc_data.CCPasswordField.TYPE: make_password_field_from_bytes,
+    cc_data.CCMonsterMovementField.TYPE: make_monster_movement_field_from_bytes,
+}
+
+
+def register_field_decoder(field_type, decoder):
+    """Adds or replaces the decoder used for a field type
+    Args:
+        field_type (int) : the field type identifier
+        decoder (function) : takes the field bytes (bytes or memoryview) and returns a CCField
+    """
+    FIELD_DECODERS[field_type] = decoder
+
+
 def make_field_from_bytes(field_type, field_bytes):
-    """Constructs and returns the appropriate cc field
+    """Constructs and returns the appropriate cc field using the decoder registered in FIELD_DECODERS
     Args:
         field_type (int) : what type of field to construct
-        field_bytes (bytes) : the binary data to be used to create the field
-    """
-    if field_type == cc_data.CCMapTitleField.TYPE:
-        return cc_data.CCMapTitleField(get_string_from_bytes(field_bytes))
-    elif field_type == cc_data.CCTrapControlsField.TYPE:
-        trap_count = int(len(field_bytes) / 10)
-        traps = []
-        for t_index in range(trap_count):
-            i = t_index * 10
-            bx = int.from_bytes(field_bytes[i:(i + 2)], byteorder=cc_data.BYTE_ORDER)
-            by = int.from_bytes(field_bytes[i + 2:(i + 4)], byteorder=cc_data.BYTE_ORDER)
-            tx = int.from_bytes(field_bytes[i + 4:(i + 6)], byteorder=cc_data.BYTE_ORDER)
-            ty = int.from_bytes(field_bytes[i + 6:(i + 8)], byteorder=cc_data.BYTE_ORDER)
-            traps.append(cc_data.CCTrapControl(bx, by, tx, ty))
-        return cc_data.CCTrapControlsField(traps)
-    elif field_type == cc_data.CCCloningMachineControlsField.TYPE:
-        machine_count = int(len(field_bytes) / 8)
-        machines = []
-        for m_index in range(machine_count):
-            i = m_index * 8
-            bx = int.from_bytes(field_bytes[i:(i + 2)], byteorder=cc_data.BYTE_ORDER)
-            by = int.from_bytes(field_bytes[i + 2:(i + 4)], byteorder=cc_data.BYTE_ORDER)
-            tx = int.from_bytes(field_bytes[i + 4:(i + 6)], byteorder=cc_data.BYTE_ORDER)
-            ty = int.from_bytes(field_bytes[i + 6:(i + 8)], byteorder=cc_data.BYTE_ORDER)
-            machines.append(cc_data.CCCloningMachineControl(bx, by, tx, ty))
-        return cc_data.CCCloningMachineControlsField(machines)
-    elif field_type == cc_data.CCEncodedPasswordField.TYPE:
-        # passwords are encoded as a list of ints
-        password = []
-        # A bytes object behaves as a list of integers
-        # password data is terminated with a zero, iterate to one short of the end of the array
-        for b in field_bytes[0:(len(field_bytes)-1)]:
-            password.append(b)
-        return cc_data.CCEncodedPasswordField(password)
-    elif field_type == cc_data.CCMapHintField.TYPE:
-        return cc_data.CCMapHintField(get_string_from_bytes(field_bytes))
-    elif field_type == cc_data.CCPasswordField.TYPE:
-        return cc_data.CCPasswordField(get_string_from_bytes(field_bytes))
-    elif field_type == cc_data.CCMonsterMovementField.TYPE:
-        monster_count = int(len(field_bytes) / 2)
-        monsters = []
-        for m_index in range(monster_count):
-            i = m_index * 2
-            x = int.from_bytes(field_bytes[i:(i + 1)], byteorder=cc_data.BYTE_ORDER)
-            y = int.from_bytes(field_bytes[i + 1:(i + 2)], byteorder=cc_data.BYTE_ORDER)
-            monsters.append(cc_data.CCCoordinate(x, y))
-        return cc_data.CCMonsterMovementField(monsters)
-    else:
+        field_bytes (bytes or memoryview) : the binary data to be used to create the field
+    """
+    decoder = FIELD_DECODERS.get(field_type)
+    if decoder is None:
         if __debug__:
             raise AssertionError("Unsupported field type: " + str(field_type))
-        return cc_data.CCField(field_type, field_bytes)
+        return cc_data.CCField(field_type, bytes(field_bytes))
+    field = decoder(field_bytes)
+    # Keep the data the field was decoded from as its encoding, until the field is changed
+    field.cache_byte_data(bytes(field_bytes))
+    return field
 
 
-def make_optional_fields_from_dat(reader):
+def make_optional_fields_from_dat(reader, stats=None):
     """Reads all the optional fields in from the active reader
     Note that this assumes the reader is at the optional fields section in the file.
     This code does not error check for invalid data
     Args:
         reader (BufferedReader) : active reader reading a DAT file
+        stats (CCParseStats) : optional, collects parse instrumentation
     Returns:
         A list of all the constructed optional fields
     """
     fields = []
-    total_optional_field_bytes = int.from_bytes(do_read(reader, 2), byteorder=cc_data.BYTE_ORDER)
+    total_optional_field_bytes = int.from_bytes(do_read(reader, 2, stats), byteorder=cc_data.BYTE_ORDER)
+    if stats is not None:
+        stats.header_bytes += 2
+        stats.field_bytes += total_optional_field_bytes
     while total_optional_field_bytes > 0:
-        field_type = int.from_bytes(do_read(reader, 1), byteorder=cc_data.BYTE_ORDER)
-        byte_count = int.from_bytes(do_read(reader, 1), byteorder=cc_data.BYTE_ORDER)
-        byte_vals = do_read(reader, byte_count)
+        field_type = int.from_bytes(do_read(reader, 1, stats), byteorder=cc_data.BYTE_ORDER)
+        byte_count = int.from_bytes(do_read(reader, 1, stats), byteorder=cc_data.BYTE_ORDER)
+        byte_vals = do_read(reader, byte_count, stats)
         fields.append(make_field_from_bytes(field_type, byte_vals))
+        if stats is not None:
+            stats.add_field(field_type, byte_count + 2)
         total_optional_field_bytes -= (byte_count + 2)
     return fields
 
 
-def make_layer_from_bytes(layer_bytes):
-    """Constructs layer data (a 1024 list of ints) from the given layer_bytes data
-    Note: DAT files employ Run Length Encoding which this function is designed to decode
+def make_layer_from_bytes(layer_bytes, stats=None):
+    """Constructs layer data (a CCLayer of 1024 tiles) from the given layer_bytes data
+    Note: DAT files employ Run Length Encoding which this function is designed to decode.
+    Runs are located with bytes.find and expanded with bytes multiplication, plain stretches are copied as slices
     Args:
-        layer_bytes (bytes) : The binary data of a layer read in from the DAT file
+        layer_bytes (bytes or memoryview) : The binary data of a layer read in from the DAT file
+        stats (CCParseStats) : optional, counts the decoded runs
     Returns:
-        A list of ints initialized with the layer data
+        A CCLayer initialized with the layer data
     """
-    layer_data = []
+    if not isinstance(layer_bytes, (bytes, bytearray)):
+        layer_bytes = bytes(layer_bytes)
+    find = layer_bytes.find
+    layer_data = bytearray()
     index = 0
+    run_count = 0
     while index < len(layer_bytes):
-        val = layer_bytes[index]
-        index += 1
         # Check for the Run Length Encoding value
-        if val == RLE_CODE_INT:
-            # If using RLE, the next byte is the number of copies to make
-            # and the 2nd byte is the value to repeat
-            copies = layer_bytes[index]
-            code = layer_bytes[index + 1]
-            index += 2
-            for i in range(copies):
-                layer_data.append(code)
-        else:
-            layer_data.append(val)
-    return layer_data
+        run_index = find(RLE_CODE_INT, index)
+        if run_index < 0:
+            layer_data += layer_bytes[index:]
+            break
+        layer_data += layer_bytes[index:run_index]
+        # If using RLE, the next byte is the number of copies to make
+        # and the 2nd byte is the value to repeat
+        copies = layer_bytes[run_index + 1]
+        code = layer_bytes[run_index + 2]
+        layer_data += SINGLE_BYTES[code] * copies
+        index = run_index + 3
+        run_count += 1
+    if stats is not None:
+        stats.rle_runs += run_count
+        stats.rle_tiles += len(layer_data) - len(layer_bytes) + 3 * run_count
+    return cc_data.CCLayer(layer_data)
 
 
-def make_level_from_dat(reader):
+def make_layers_from_bytes(layer_bytes_list):
+    """Constructs the layer data for many layers at once
+    The layers are joined into one bytes object and decoded in a single pass into one output buffer, recording where
+    each layer ends, so the per-layer work is one slice copy into its CCLayer. This assumes valid RLE data, where no
+    run is cut off at the end of a layer
+    Args:
+        layer_bytes_list (iterable of bytes or memoryviews) : the binary data of each layer
+    Returns:
+        A list of CCLayers, one for each item of layer_bytes_list
+    """
+    layer_bytes_list = list(layer_bytes_list)
+    joined = b"".join(layer_bytes_list)
+    find = joined.find
+    layer_ends = itertools.accumulate(map(len, layer_bytes_list))
+    next_end = next(layer_ends, None)
+    layer_data = bytearray()
+    tile_ends = []
+    index = 0
+    while next_end is not None:
+        run_index = find(RLE_CODE_INT, index)
+        plain_end = run_index if run_index >= 0 else len(joined)
+        # Layers ending in the plain stretch before the run, the stretch is copied as is
+        while next_end is not None and next_end <= plain_end:
+            tile_ends.append(len(layer_data) + next_end - index)
+            next_end = next(layer_ends, None)
+        layer_data += joined[index:plain_end]
+        if run_index < 0:
+            break
+        layer_data += SINGLE_BYTES[joined[run_index + 2]] * joined[run_index + 1]
+        index = run_index + 3
+    layers = []
+    start = 0
+    with memoryview(layer_data) as view:
+        for end in tile_ends:
+            layers.append(cc_data.CCLayer(view[start:end]))
+            start = end
+    return layers
+
+
+def make_layers_from_buffer(buffer, offsets=None):
+    """Decodes only the upper and lower layers of every level in DAT file data held in memory
+    Level headers are unpacked with struct and the optional fields are skipped entirely
+    Args:
+        buffer (bytes-like object) : the complete contents of a DAT file
+        offsets (list of ints) : optional, the byte offset of each level record to decode.
+            Defaults to every level, see make_level_offsets_from_buffer
+    Returns:
+        A list of (upper layer, lower layer) CCLayer tuples in level order, or None if the DAT header is invalid
+    """
+    with memoryview(buffer) as view:
+        if offsets is None:
+            offsets = make_level_offsets_from_buffer(view)
+            if offsets is None:
+                return
+        layer_bytes_list = []
+        for offset in offsets:
+            upper_layer_byte_count = LEVEL_HEADER_STRUCT.unpack_from(view, offset)[5]
+            offset += LEVEL_HEADER_STRUCT.size
+            layer_bytes_list.append(view[offset:(offset + upper_layer_byte_count)])
+            offset += upper_layer_byte_count
+            lower_layer_byte_count = WORD_STRUCT.unpack_from(view, offset)[0]
+            offset += 2
+            layer_bytes_list.append(view[offset:(offset + lower_layer_byte_count)])
+        layers = make_layers_from_bytes(layer_bytes_list)
+        del layer_bytes_list  # release the slices before the view
+    return list(zip(layers[0::2], layers[1::2]))
+
+
+def make_level_from_dat(reader, stats=None):
     """Reads all the data to construct a single level from the active reader
     Note that this assumes the reader is at new level section in the file.
+    The bytes read are kept as the raw_record of the level, so an unchanged level is saved without encoding it again.
     This code does not error check for invalid data
     Args:
         reader (BufferedReader) : active reader reading a DAT file
+        stats (CCParseStats) : optional, collects parse instrumentation
     Returns:
         A CCLevel object constructed with the read data
     """
+    if stats is not None:
+        start_address = stats.read_address
+        start_time = time.perf_counter()
     level = cc_data.CCLevel()
-    level.num_bytes = int.from_bytes(do_read(reader, 2), byteorder=cc_data.BYTE_ORDER)
-    level.level_number = int.from_bytes(do_read(reader, 2), byteorder=cc_data.BYTE_ORDER)
-    level.time = int.from_bytes(do_read(reader, 2), byteorder=cc_data.BYTE_ORDER)
-    level.num_chips = int.from_bytes(do_read(reader, 2), byteorder=cc_data.BYTE_ORDER)
     # Note: Map Detail is not used and is expected to always be 1
-    map_detail = int.from_bytes(do_read(reader, 2), byteorder=cc_data.BYTE_ORDER)
-    upper_layer_byte_count = int.from_bytes(do_read(reader, 2), byteorder=cc_data.BYTE_ORDER)
-    upper_layer_bytes = do_read(reader, upper_layer_byte_count)
-    lower_layer_byte_count = int.from_bytes(do_read(reader, 2), byteorder=cc_data.BYTE_ORDER)
-    lower_layer_bytes = do_read(reader, lower_layer_byte_count)
-    level.upper_layer = make_layer_from_bytes(upper_layer_bytes)
-    level.lower_layer = make_layer_from_bytes(lower_layer_bytes)
-    level.optional_fields = make_optional_fields_from_dat(reader)
+    header_bytes = do_read(reader, LEVEL_HEADER_STRUCT.size, stats)
+    (level.num_bytes, level.level_number, level.time, level.num_chips,
+     map_detail, upper_layer_byte_count) = LEVEL_HEADER_STRUCT.unpack(header_bytes)
+    if stats is not None:
+        layer_start_time = time.perf_counter()
+        stats.header_time += layer_start_time - start_time
+    upper_layer_bytes = do_read(reader, upper_layer_byte_count, stats)
+    lower_layer_size_bytes = do_read(reader, 2, stats)
+    lower_layer_byte_count = WORD_STRUCT.unpack(lower_layer_size_bytes)[0]
+    lower_layer_bytes = do_read(reader, lower_layer_byte_count, stats)
+    level.upper_layer = make_layer_from_bytes(upper_layer_bytes, stats)
+    level.lower_layer = make_layer_from_bytes(lower_layer_bytes, stats)
+    if stats is not None:
+        field_start_time = time.perf_counter()
+        stats.layer_time += field_start_time - layer_start_time
+        stats.header_bytes += 14
+        stats.layer_bytes += upper_layer_byte_count + lower_layer_byte_count
+    field_size_bytes = do_read(reader, 2, stats)
+    field_bytes = do_read(reader, WORD_STRUCT.unpack(field_size_bytes)[0], stats)
+    raw_record = b"".join((header_bytes, upper_layer_bytes, lower_layer_size_bytes, lower_layer_bytes,
+                           field_size_bytes, field_bytes))
+    level.optional_fields = make_optional_fields_from_buffer(memoryview(raw_record), len(raw_record) - len(field_bytes) - 2,
+                                                             stats, report_reads=False)[0]
+    level.mark_clean(raw_record)
+    if stats is not None:
+        stats.field_time += time.perf_counter() - field_start_time
+        stats.add_level(level, start_address, stats.read_address - start_address)
     return level
 
 
-def make_cc_data_from_dat(dat_file):
+def make_optional_fields_from_buffer(view, offset, stats=None, report_reads=True):
+    """Reads all the optional fields from a buffer starting at the given offset
+    Note that this assumes the offset points at the optional fields section of a level.
+    This code does not error check for invalid data
+    Args:
+        view (memoryview) : view over the DAT file data
+        offset (int) : byte offset of the optional fields section
+        stats (CCParseStats) : optional, collects parse instrumentation
+        report_reads (bool) : optional, set to False when the section was already reported to on_read by do_read
+    Returns:
+        A tuple of (list of the constructed optional fields, offset just past the optional fields)
+    """
+    fields = []
+    total_optional_field_bytes = WORD_STRUCT.unpack_from(view, offset)[0]
+    offset += 2
+    end = offset + total_optional_field_bytes
+    if stats is not None and report_reads:
+        report_read(stats, offset - 2, view[(offset - 2):offset])
+        report_read(stats, offset, view[offset:end])
+    while offset < end:
+        field_type, byte_count = FIELD_HEADER_STRUCT.unpack_from(view, offset)
+        offset += 2
+        fields.append(make_field_from_bytes(field_type, view[offset:(offset + byte_count)]))
+        offset += byte_count
+        if stats is not None:
+            stats.add_field(field_type, byte_count + 2)
+    if stats is not None:
+        stats.header_bytes += 2
+        stats.field_bytes += total_optional_field_bytes
+    return fields, end
+
+
+def make_optional_fields_from_record(record):
+    """Decodes the optional fields of a complete DAT level record, skipping its header and layers
+    Args:
+        record (bytes-like object) : a level record, starting with its size word
+    Returns:
+        The list of the constructed optional fields
+    """
+    view = memoryview(record)
+    upper_layer_byte_count = LEVEL_HEADER_STRUCT.unpack_from(view, 0)[5]
+    offset = LEVEL_HEADER_STRUCT.size + upper_layer_byte_count
+    offset += 2 + WORD_STRUCT.unpack_from(view, offset)[0]
+    return make_optional_fields_from_buffer(view, offset)[0]
+
+
+def make_level_from_buffer(view, offset, stats=None, copy_record=False):
+    """Constructs a single level from a buffer starting at the given offset
+    Slices of the view are handed to the layer and field decoders so no intermediate bytes objects are made.
+    The level record is kept as the raw_record of the level, so an unchanged level is saved without encoding it again.
+    This code does not error check for invalid data
+    Args:
+        view (memoryview) : view over the DAT file data
+        offset (int) : byte offset of the level record
+        stats (CCParseStats) : optional, collects parse instrumentation
+        copy_record (bool) : optional, keep a bytes copy of the record instead of a slice of the view.
+            Needed when the buffer can change or be closed, such as a bytearray or an mmap
+    Returns:
+        A tuple of (CCLevel constructed with the data, offset of the next level record)
+    """
+    start_offset = offset
+    if stats is not None:
+        start_time = time.perf_counter()
+    level = cc_data.CCLevel()
+    (level.num_bytes, level.level_number, level.time, level.num_chips,
+     map_detail, upper_layer_byte_count) = LEVEL_HEADER_STRUCT.unpack_from(view, offset)
+    # Note: Map Detail is not used and is expected to always be 1
+    offset += LEVEL_HEADER_STRUCT.size
+    if stats is not None:
+        report_read(stats, start_offset, view[start_offset:offset])
+        layer_start_time = time.perf_counter()
+        stats.header_time += layer_start_time - start_time
+    level.upper_layer = make_layer_from_bytes(view[offset:(offset + upper_layer_byte_count)], stats)
+    offset += upper_layer_byte_count
+    lower_layer_byte_count = WORD_STRUCT.unpack_from(view, offset)[0]
+    offset += 2
+    level.lower_layer = make_layer_from_bytes(view[offset:(offset + lower_layer_byte_count)], stats)
+    offset += lower_layer_byte_count
+    if stats is not None:
+        upper_layer_offset = start_offset + LEVEL_HEADER_STRUCT.size
+        lower_layer_offset = upper_layer_offset + upper_layer_byte_count + 2
+        report_read(stats, upper_layer_offset, view[upper_layer_offset:(lower_layer_offset - 2)])
+        report_read(stats, lower_layer_offset - 2, view[(lower_layer_offset - 2):lower_layer_offset])
+        report_read(stats, lower_layer_offset, view[lower_layer_offset:offset])
+        field_start_time = time.perf_counter()
+        stats.layer_time += field_start_time - layer_start_time
+        stats.header_bytes += 14
+        stats.layer_bytes += upper_layer_byte_count + lower_layer_byte_count
+    level.optional_fields, end = make_optional_fields_from_buffer(view, offset, stats)
+    raw_record = view[start_offset:end]
+    level.mark_clean(bytes(raw_record) if copy_record else raw_record)
+    offset = end
+    if stats is not None:
+        stats.field_time += time.perf_counter() - field_start_time
+        stats.read_address = offset
+        stats.bytes_read += offset - start_offset
+        stats.add_level(level, start_offset, offset - start_offset)
+    return level, offset
+
+
+def make_cc_data_from_buffer(buffer, stats=None, copy_records=None):
+    """Constructs a CCDataFile object from DAT file data held in memory
+    The data is parsed in place using struct offsets over a memoryview, so any buffer-protocol object works
+    (bytes, bytearray, memoryview, mmap, ...). This code assumes valid DAT data and does not error check for invalid data
+    Args:
+        buffer (bytes-like object) : the complete contents of a DAT file
+        stats (CCParseStats) : optional, collects parse instrumentation
+        copy_records (bool) : optional, whether the levels keep bytes copies of their records instead of slices of
+            the buffer, see make_level_from_buffer. Defaults to copying unless the buffer is read-only and not an mmap
+    Returns:
+        A CCDataFile object constructed with the data from the given buffer
+    """
+    data = cc_data.CCDataFile()
+    with memoryview(buffer) as view:
+        if copy_records is None:
+            copy_records = not view.readonly or isinstance(buffer, mmap.mmap)
+        header_bytes = view[0:4]
+        if header_bytes != CC_DAT_HEADER_CODE:
+            print("ERROR: Invalid header found. Expected " + str(CC_DAT_HEADER_CODE) + ", but found " + str(bytes(header_bytes)))
+            return
+        num_levels = WORD_STRUCT.unpack_from(view, 4)[0]
+        offset = 6
+        if stats is not None:
+            report_read(stats, 0, header_bytes)
+            report_read(stats, 4, view[4:6])
+            stats.read_address = offset
+            stats.bytes_read += offset
+            stats.header_bytes += offset
+        for i in range(num_levels):
+            level, offset = make_level_from_buffer(view, offset, stats, copy_records)
+            data.levels.append(level)
+    return data
+
+
+def make_cc_data_from_dat(dat_file, use_mmap=False, stats=None):
     """Reads a DAT file and constructs a CCDataFile object out of it
     This code assumes a valid DAT file and does not error check for invalid data
     Args:
-        dat_file (string) : the filename of the DAT file to read in
+        dat_file (string or binary file object) : the filename of the DAT file to read in, or an open binary file
+        use_mmap (bool) : optional, if True the file is memory-mapped and parsed in place with make_cc_data_from_buffer
+            instead of being read field by field
+        stats (CCParseStats) : optional, collects parse instrumentation
     Returns:
         A CCDataFile object constructed with the data from the given file
     """
+    if hasattr(dat_file, "read"):
+        return load(dat_file, stats)
+    if use_mmap:
+        with open(dat_file, 'rb') as reader:
+            with mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ) as dat_map:
+                return make_cc_data_from_buffer(dat_map, stats, copy_records=True)
     data = cc_data.CCDataFile()
     with open(dat_file, 'rb') as reader:
-        header_bytes = do_read(reader, 4)
+        if stats is not None:
+            stats.read_address = 0
+            stats.header_bytes += 6
+        header_bytes = do_read(reader, 4, stats)
         if header_bytes != CC_DAT_HEADER_CODE:
-            print("ERROR: Invalid header found. Expected " + str(CC_DAT_HEADER_CODE) + ", but found " + header_bytes)
+            print("ERROR: Invalid header found. Expected " + str(CC_DAT_HEADER_CODE) + ", but found " + str(header_bytes))
             return
-        num_levels = int.from_bytes(do_read(reader, 2), byteorder=cc_data.BYTE_ORDER)
+        num_levels = int.from_bytes(do_read(reader, 2, stats), byteorder=cc_data.BYTE_ORDER)
         for i in range(num_levels):
-            level = make_level_from_dat(reader)
+            level = make_level_from_dat(reader, stats)
             data.levels.append(level)
     return data
 
 
+def iter_levels(source, stats=None):
+    """Yields the levels of a DAT file one at a time, without collecting them into a CCDataFile
+    Files are read level by level with make_level_from_dat, so only the current level is held in memory
+    This code assumes valid DAT data and does not error check for invalid data
+    Args:
+        source (string, binary file object or bytes-like object) : the filename of the DAT file to read in,
+            an open binary file positioned at the DAT header, or the complete contents of a DAT file
+        stats (CCParseStats) : optional, collects parse instrumentation
+    Returns:
+        A generator of CCLevel objects. Nothing is yielded if the DAT header is invalid
+    """
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        with memoryview(source) as view:
+            offsets = make_level_offsets_from_buffer(view)
+            if offsets is None:
+                return
+            copy_records = not view.readonly or isinstance(source, mmap.mmap)
+            if stats is not None:
+                stats.read_address = 6
+                stats.bytes_read += 6
+                stats.header_bytes += 6
+            for offset in offsets:
+                yield make_level_from_buffer(view, offset, stats, copy_records)[0]
+        return
+    if not hasattr(source, "read"):
+        with open(source, 'rb') as reader:
+            yield from iter_levels(reader, stats)
+        return
+    if stats is not None:
+        stats.read_address = 0
+        stats.header_bytes += 6
+    header_bytes = do_read(source, 4, stats)
+    if header_bytes != CC_DAT_HEADER_CODE:
+        print("ERROR: Invalid header found. Expected " + str(CC_DAT_HEADER_CODE) + ", but found " + str(header_bytes))
+        return
+    num_levels = int.from_bytes(do_read(source, 2, stats), byteorder=cc_data.BYTE_ORDER)
+    for i in range(num_levels):
+        yield make_level_from_dat(source, stats)
+
+
+def make_level_offsets_from_buffer(view):
+    """Builds an index of where each level record starts in DAT file data held in memory
+    Only the 2 byte size at the start of each level record is read, nothing is decoded
+    Args:
+        view (memoryview) : view over the complete contents of a DAT file
+    Returns:
+        A list of the byte offsets of each level record, or None if the DAT header is invalid
+    """
+    if view[0:4] != CC_DAT_HEADER_CODE:
+        print("ERROR: Invalid header found. Expected " + str(CC_DAT_HEADER_CODE) + ", but found " + str(bytes(view[0:4])))
+        return None
+    num_levels = WORD_STRUCT.unpack_from(view, 4)[0]
+    offsets = []
+    offset = 6
+    for i in range(num_levels):
+        offsets.append(offset)
+        # The level size does not include the 2 bytes used to store the size itself
+        offset += WORD_STRUCT.unpack_from(view, offset)[0] + 2
+    return offsets
+
+
+class CCLazyLevelList(collections.abc.Sequence):
+    """A read-only list of levels that are only decoded when they are indexed or iterated
+    Member vars:
+        view (memoryview): view over the complete contents of the DAT file
+        offsets (list of ints): the byte offset of each level record in view
+        cache_size (int): max number of decoded levels kept in the LRU cache. None means unbounded, 0 disables caching
+        copy_records (bool): whether decoded levels keep bytes copies of their records, see make_level_from_buffer
+    Note: without caching, each access decodes a new CCLevel so changes made to a previously returned level are not kept
+    """
+
+    def __init__(self, view, offsets, cache_size=128, copy_records=False):
+        self.view = view
+        self.offsets = offsets
+        self.cache_size = cache_size
+        self.copy_records = copy_records
+        self.cache = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.offsets)))]
+        if index < 0:
+            index += len(self.offsets)
+        if index < 0 or index >= len(self.offsets):
+            raise IndexError("level index out of range")
+        level = self.cache.get(index)
+        if level is not None:
+            self.cache.move_to_end(index)
+            return level
+        level = make_level_from_buffer(self.view, self.offsets[index], copy_record=self.copy_records)[0]
+        if self.cache_size is None or self.cache_size > 0:
+            self.cache[index] = level
+            if self.cache_size is not None and len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return level
+
+    def __iter__(self):
+        for i in range(len(self.offsets)):
+            yield self[i]
+
+
+class CCLazyDataFile(cc_data.CCDataFile):
+    """A CCDataFile whose levels are decoded on demand from the DAT file data
+    Use make_lazy_cc_data_from_buffer or make_lazy_cc_data_from_dat to construct one
+    Member vars:
+        levels (CCLazyLevelList): the levels of this dat file.
+            Adding a level decodes all the levels into a regular list
+    """
+
+    def __init__(self, buffer, offsets, cache_size=128):
+        """Args:
+            buffer (bytes-like object) : the complete contents of a DAT file
+            offsets (list of ints) : the byte offset of each level record, see make_level_offsets_from_buffer
+            cache_size (int) : optional, max number of decoded levels to keep. None means unbounded, 0 disables caching
+        """
+        super().__init__()
+        self.buffer = buffer
+        view = memoryview(buffer)
+        # Records of levels decoded from an mmap or a mutable buffer are copied, so they outlive close()
+        self.levels = CCLazyLevelList(view, offsets, cache_size, not view.readonly or isinstance(buffer, mmap.mmap))
+
+    def add_level(self, level):
+        if not isinstance(self.levels, list):
+            self.levels = list(self.levels)
+        self.levels.append(level)
+
+    def close(self):
+        """Releases the DAT file data. Levels that have not been decoded can no longer be accessed"""
+        if isinstance(self.levels, CCLazyLevelList):
+            self.levels.view.release()
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def make_lazy_cc_data_from_buffer(buffer, cache_size=128):
+    """Indexes DAT file data held in memory without decoding any of its levels
+    Args:
+        buffer (bytes-like object) : the complete contents of a DAT file
+        cache_size (int) : optional, max number of decoded levels to keep. None means unbounded, 0 disables caching
+    Returns:
+        A CCLazyDataFile object indexing the levels in the given buffer
+    """
+    with memoryview(buffer) as view:
+        offsets = make_level_offsets_from_buffer(view)
+    if offsets is None:
+        return
+    return CCLazyDataFile(buffer, offsets, cache_size)
+
+
+def make_lazy_cc_data_from_dat(dat_file, cache_size=128, use_mmap=False):
+    """Indexes a DAT file without decoding any of its levels
+    Args:
+        dat_file (string) : the filename of the DAT file to read in
+        cache_size (int) : optional, max number of decoded levels to keep. None means unbounded, 0 disables caching
+        use_mmap (bool) : optional, if True the file is memory-mapped instead of read into memory.
+            The map stays open until the returned object is closed
+    Returns:
+        A CCLazyDataFile object indexing the levels in the given file
+    """
+    with open(dat_file, 'rb') as reader:
+        if use_mmap:
+            buffer = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = reader.read()
+    data = make_lazy_cc_data_from_buffer(buffer, cache_size)
+    if data is None and use_mmap:
+        buffer.close()
+    return data
+
+
+class CCDatParser:
+    """Parses DAT data with all of its state held on the instance, so parses can run concurrently
+    The make_* functions keep no module state, and each parse run by a CCDatParser collects its stats in its own
+    CCParseStats which is merged into the parser's stats under a lock when the parse finishes.
+    A single parser can be shared by several threads or asyncio executors.
+    Note: on_read and on_level callbacks of the parser's stats are called from the worker threads
+    Member vars:
+        workers (int): the max number of threads used by parse_many and to decode the levels of one pack.
+            1 decodes everything in the calling thread
+        min_levels_per_task (int): packs with fewer levels than this per worker are decoded in the calling thread
+        use_mmap (bool): if True files are memory-mapped instead of read into memory
+        stats (CCParseStats): the accumulated stats of every parse, or None to not collect stats
+    """
+
+    def __init__(self, workers=None, min_levels_per_task=64, use_mmap=False, stats=None):
+        """Args:
+            workers (int) : optional, the max number of threads. Defaults to the CPU count
+            min_levels_per_task (int) : optional, the smallest number of levels handed to a thread at a time
+            use_mmap (bool) : optional, memory-map files instead of reading them into memory
+            stats (CCParseStats) : optional, collects the stats of every parse run by this parser
+        """
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.min_levels_per_task = min_levels_per_task
+        self.use_mmap = use_mmap
+        self.stats = stats
+        self.stats_lock = threading.Lock()
+
+    def make_parse_stats(self):
+        """Returns a new CCParseStats for a single parse, or None if this parser does not collect stats"""
+        if self.stats is None:
+            return None
+        return CCParseStats(self.stats.on_read, self.stats.on_level)
+
+    def add_parse_stats(self, parse_stats):
+        """Merges the stats of a finished parse into the parser's stats"""
+        if parse_stats is not None:
+            with self.stats_lock:
+                self.stats.merge(parse_stats)
+
+    def parse_levels(self, view, offsets, copy_records=False):
+        """Decodes the level records at the given offsets, in the calling thread
+        Returns:
+            A list of the decoded CCLevels
+        """
+        parse_stats = self.make_parse_stats()
+        levels = [make_level_from_buffer(view, offset, parse_stats, copy_records)[0] for offset in offsets]
+        self.add_parse_stats(parse_stats)
+        return levels
+
+    def parse_buffer(self, buffer, workers=None):
+        """Constructs a CCDataFile from DAT file data held in memory
+        Once the level offsets are indexed, the levels are decoded in slices across a thread pool.
+        Threads only run the decoding in parallel on a free-threaded Python build, elsewhere they share the GIL
+        Args:
+            buffer (bytes-like object) : the complete contents of a DAT file
+            workers (int) : optional, overrides the number of threads of this parser
+        Returns:
+            A CCDataFile object constructed with the data from the given buffer, or None if the DAT header is invalid
+        """
+        if workers is None:
+            workers = self.workers
+        data = cc_data.CCDataFile()
+        with memoryview(buffer) as view:
+            offsets = make_level_offsets_from_buffer(view)
+            if offsets is None:
+                return
+            copy_records = not view.readonly or isinstance(buffer, mmap.mmap)
+            if self.stats is not None:
+                with self.stats_lock:
+                    self.stats.bytes_read += 6
+                    self.stats.header_bytes += 6
+            task_count = min(workers, len(offsets) // max(self.min_levels_per_task, 1))
+            if task_count <= 1:
+                data.levels = self.parse_levels(view, offsets, copy_records)
+                return data
+            slice_size = -(-len(offsets) // task_count)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=task_count) as executor:
+                tasks = [executor.submit(self.parse_levels, view, offsets[start:(start + slice_size)], copy_records)
+                         for start in range(0, len(offsets), slice_size)]
+                for task in tasks:
+                    data.levels.extend(task.result())
+        return data
+
+    def parse_file(self, dat_file, workers=None):
+        """Reads a DAT file and constructs a CCDataFile object out of it, see parse_buffer
+        Args:
+            dat_file (string) : the filename of the DAT file to read in
+            workers (int) : optional, overrides the number of threads used to decode the levels
+        """
+        with open(dat_file, 'rb') as reader:
+            if not self.use_mmap:
+                return self.parse_buffer(reader.read(), workers)
+            with mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ) as dat_map:
+                return self.parse_buffer(dat_map, workers)
+
+    def parse_many(self, dat_files):
+        """Parses many DAT files concurrently on a thread pool, which overlaps their I/O on slow or network filesystems
+        The levels of each file are decoded in the thread that read it
+        Args:
+            dat_files (list of strings) : the filenames of the DAT files to read in
+        Returns:
+            A generator of CCDataFile objects (None for files with an invalid header), in the order of dat_files
+        """
+        if self.workers <= 1:
+            for dat_file in dat_files:
+                yield self.parse_file(dat_file, 1)
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for data in executor.map(self.parse_file, dat_files, itertools.repeat(1)):
+                yield data
+
+
 def calculate_option_field_byte_size(field):
     """Returns the size of a given field if converted to binary form
     Note: The total byte count of field entry is the type (1 byte) + size (1 byte) and size of the data in byte form
+    The encoding is cached on the field, so only a field changed since it was last sized is encoded again
     Args:
         field (CCField)
     """
-    byte_data = field.byte_data
-    return len(byte_data) + 2
+    return field.encoded_size
 
 
 def calculate_total_optional_field_byte_size(optional_fields):
@@ -204,11 +888,91 @@ def calculate_total_optional_field_byte_size(optional_fields):
     """
     optional_fields_size = 0
     for field in optional_fields:
-        optional_fields_size += calculate_option_field_byte_size(field)
+        optional_fields_size += field.encoded_size
     return optional_fields_size
 
 
-def calculate_level_byte_size(level):
+def get_layer_bytes(layer):
+    """Returns the tile values of a layer as a bytes-like object
+    Note: CCLayer objects are bytearrays and are returned as is, without conversion
+    Args:
+        layer (CCLayer, list of ints or bytes-like object): the layer data. list items may also be single byte bytes objects
+    """
+    if isinstance(layer, (bytes, bytearray, memoryview)):
+        return layer
+    try:
+        return bytes(layer)
+    except TypeError:
+        return b"".join(val.to_bytes(1, cc_data.BYTE_ORDER) if type(val) is int else val for val in layer)
+
+
+def find_long_runs(layer_bytes):
+    """Returns a bytes object with a 1 at every index where 4 equal tiles start and a 0 everywhere else
+    The comparisons are made on the whole layer at once as big ints, so no Python code runs per tile
+    """
+    tile_count = len(layer_bytes)
+    tiles = int.from_bytes(layer_bytes, "little")
+    # Byte i of the XOR is 0 where tile i equals tile i + 1
+    equal_next = bytearray((tiles ^ (tiles >> 8)).to_bytes(tile_count, "little").translate(EQUAL_TABLE))
+    equal_next[-1] = 0  # the last tile has no next tile
+    equal = int.from_bytes(equal_next, "little")
+    return (equal & (equal >> 8) & (equal >> 16)).to_bytes(tile_count, "little")
+
+
+def make_bytes_from_layer(layer, use_rle=True):
+    """Constructs the binary form of the given layer data
+    Note: with Run Length Encoding each maximal run of a tile value is written as RLE_CODE_INT, copies, value chunks
+    (3 bytes for up to 255 copies) or as plain bytes, whichever is smaller, which gives the smallest possible encoding.
+    The value RLE_CODE_INT itself can only be stored as a run.
+    Only the runs worth encoding (4 or more tiles, or any RLE_CODE_INT tiles) are located, with bytes.find over the
+    layer and over find_long_runs, and the plain stretches between them are copied as slices
+    Args:
+        layer (CCLayer, list of ints or bytes-like object): the layer data
+        use_rle (bool): optional, set to False to write every tile as a single byte like older versions did
+    Returns:
+        The layer data as a bytes-like object
+    """
+    layer_bytes = get_layer_bytes(layer)
+    if not use_rle:
+        return layer_bytes
+    if not isinstance(layer_bytes, (bytes, bytearray)):
+        layer_bytes = bytes(layer_bytes)
+    tile_count = len(layer_bytes)
+    if not tile_count:
+        return b""
+    long_runs = find_long_runs(layer_bytes)
+    encoded = bytearray()
+    index = 0
+    while index < tile_count:
+        long_start = long_runs.find(1, index)
+        code_start = layer_bytes.find(RLE_CODE_INT, index)
+        if long_start < 0 and code_start < 0:
+            break
+        if code_start < 0 or 0 <= long_start <= code_start:
+            start = long_start
+            # 4 equal tiles start at every index of the run but its last 3
+            end = long_runs.find(0, start)
+            end = tile_count if end < 0 else end + 3
+        else:
+            # A run of RLE_CODE_INT shorter than 4 tiles
+            start = end = code_start
+            while end < tile_count and layer_bytes[end] == RLE_CODE_INT:
+                end += 1
+        encoded += layer_bytes[index:start]
+        index = end
+        val = layer_bytes[start]
+        full_runs, remainder = divmod(end - start, RLE_MAX_COPIES)
+        if full_runs:
+            encoded += bytes((RLE_CODE_INT, RLE_MAX_COPIES, val)) * full_runs
+        if remainder > 3 or (remainder and val == RLE_CODE_INT):
+            encoded += bytes((RLE_CODE_INT, remainder, val))
+        elif remainder:
+            encoded += SINGLE_BYTES[val] * remainder
+    encoded += layer_bytes[index:]
+    return bytes(encoded)
+
+
+def calculate_level_byte_size(level, use_rle=True):
     """Returns the total size of the given level if converted to binary form
     The total byte count of level entry is:
     size (2) + level number (2) + time (2) + chip count (2) +
@@ -216,13 +980,34 @@ def calculate_level_byte_size(level):
     size of optional fields
     Args:
         level (CCLevel)
+        use_rle (bool): optional, whether the layers are sized with Run Length Encoding
     """
+    if use_rle and not level.dirty:
+        return len(level.raw_record) - 2
     optional_fields_size = calculate_total_optional_field_byte_size(level.optional_fields)
-    upper_layer_size = len(level.upper_layer)
-    lower_layer_size = len(level.lower_layer)
+    if use_rle:
+        upper_layer_size = len(make_bytes_from_layer(level.upper_layer))
+        lower_layer_size = len(make_bytes_from_layer(level.lower_layer))
+    else:
+        upper_layer_size = len(level.upper_layer)
+        lower_layer_size = len(level.lower_layer)
     return 14 + upper_layer_size + lower_layer_size + optional_fields_size
 
 
+def calculate_cc_data_byte_size(cc_dat, use_rle=True):
+    """Returns the size of the DAT file of the given CC dat without building it
+    Clean levels are sized from their raw records and fields from their cached encoding,
+    so only changed layers and fields are encoded
+    Args:
+        cc_dat (CCDataFile)
+        use_rle (bool): optional, whether the layers are sized with Run Length Encoding
+    """
+    total_size = len(CC_DAT_HEADER_CODE) + 2
+    for level in cc_dat.levels:
+        total_size += calculate_level_byte_size(level, use_rle) + 2  # the level size word is not part of the level size
+    return total_size
+
+
 def write_field_to_dat(field, writer):
     """Writes the given field in binary form to the given writer
     Args:
@@ -235,53 +1020,231 @@ def write_field_to_dat(field, writer):
     writer.write(byte_data)
 
 
-def write_layer_to_dat(layer, writer):
+def serialize_level_into(level, buffer, use_rle=True):
+    """Appends the binary form of the given level to a buffer
+    A level that is not dirty has its raw_record copied as is. Otherwise every layer and field is encoded exactly once,
+    the level record is then filled in with struct packing into space preallocated at the end of the buffer
+    Args:
+        level (CCLevel): the level to serialize
+        buffer (bytearray): the buffer to append to
+        use_rle (bool): optional, set to False to skip Run Length Encoding of the layers.
+            Levels are always encoded again when it is False, since their raw record may use Run Length Encoding
+    Returns:
+        The number of bytes appended to the buffer
+    """
+    if use_rle and not level.dirty:
+        buffer += level.raw_record
+        return len(level.raw_record)
+    upper_layer_bytes = make_bytes_from_layer(level.upper_layer, use_rle)
+    lower_layer_bytes = make_bytes_from_layer(level.lower_layer, use_rle)
+    field_entries = [(field.type_val, field.byte_data) for field in level.optional_fields]
+    total_field_byte_size = 0
+    for field_type, field_bytes in field_entries:
+        total_field_byte_size += len(field_bytes) + 2
+    level_byte_size = 14 + len(upper_layer_bytes) + len(lower_layer_bytes) + total_field_byte_size
+
+    offset = len(buffer)
+    buffer += bytes(level_byte_size + 2)  # the level size does not include the 2 bytes used to store it
+    # Note: the "map detail" is always a 2 byte number set to 1
+    LEVEL_HEADER_STRUCT.pack_into(buffer, offset, level_byte_size, level.level_number, level.time, level.num_chips,
+                                  1, len(upper_layer_bytes))
+    offset += LEVEL_HEADER_STRUCT.size
+    buffer[offset:(offset + len(upper_layer_bytes))] = upper_layer_bytes
+    offset += len(upper_layer_bytes)
+    WORD_STRUCT.pack_into(buffer, offset, len(lower_layer_bytes))
+    offset += 2
+    buffer[offset:(offset + len(lower_layer_bytes))] = lower_layer_bytes
+    offset += len(lower_layer_bytes)
+    WORD_STRUCT.pack_into(buffer, offset, total_field_byte_size)
+    offset += 2
+    for field_type, field_bytes in field_entries:
+        FIELD_HEADER_STRUCT.pack_into(buffer, offset, field_type, len(field_bytes))
+        offset += 2
+        buffer[offset:(offset + len(field_bytes))] = field_bytes
+        offset += len(field_bytes)
+    return level_byte_size + 2
+
+
+def make_bytes_from_level(level, use_rle=True):
+    """Constructs the binary form of the given level
+    Args:
+        level (CCLevel): the level to serialize
+        use_rle (bool): optional, set to False to skip Run Length Encoding of the layers
+    Returns:
+        A bytearray holding the complete level record
+    """
+    buffer = bytearray()
+    serialize_level_into(level, buffer, use_rle)
+    return buffer
+
+
+def serialize_cc_data_into(cc_dat, buffer, use_rle=True):
+    """Appends the binary form of the given CC dat (header, level count and every level) to a buffer
+    Raises ValueError for more than MAX_LEVEL_COUNT levels, see write_levels_to_dat
+    Args:
+        cc_dat (CCDataFile): the cc data to serialize
+        buffer (bytearray): the buffer to append to
+        use_rle (bool): optional, set to False to skip Run Length Encoding of the layers
+    Returns:
+        The number of bytes appended to the buffer
+    """
+    if cc_dat.level_count > MAX_LEVEL_COUNT:
+        raise ValueError("A DAT file holds at most " + str(MAX_LEVEL_COUNT) + " levels")
+    start = len(buffer)
+    # Basic DAT file format is: DAT header, total number of levels, level 1, level 2, etc.
+    buffer += CC_DAT_HEADER_CODE
+    buffer += cc_dat.level_count.to_bytes(2, cc_data.BYTE_ORDER)
+    for level in cc_dat.levels:
+        serialize_level_into(level, buffer, use_rle)
+    return len(buffer) - start
+
+
+def make_bytes_from_cc_data(cc_dat, use_rle=True):
+    """Constructs the complete binary form of the given CC dat
+    Args:
+        cc_dat (CCDataFile): the cc data to serialize
+        use_rle (bool): optional, set to False to skip Run Length Encoding of the layers
+    Returns:
+        A bytearray holding the DAT file data
+    """
+    buffer = bytearray()
+    serialize_cc_data_into(cc_dat, buffer, use_rle)
+    return buffer
+
+
+def write_layer_to_dat(layer, writer, use_rle=True):
     """Writes the given layer in binary form to the given writer
-    Note: while the DAT file format supports run length encoding, this function does not implement it
     Args:
-        layer (list of ints): the layer to write
+        layer (CCLayer or list of ints): the layer to write
         writer (BufferedWriter): the active writer in binary write mode
+        use_rle (bool): optional, set to False to skip Run Length Encoding and write every tile as a single byte
     """
-    byte_size = len(layer)
-    writer.write(byte_size.to_bytes(2, cc_data.BYTE_ORDER))
-    for val in layer:
-        if type(val) is int:
-            byte_val = val.to_bytes(1, cc_data.BYTE_ORDER)
-        else:
-            byte_val = val
-        writer.write(byte_val)
+    layer_bytes = make_bytes_from_layer(layer, use_rle)
+    writer.write(len(layer_bytes).to_bytes(2, cc_data.BYTE_ORDER))
+    writer.write(layer_bytes)
 
 
-def write_level_to_dat(level, writer):
+def write_level_to_dat(level, writer, use_rle=True):
     """Writes the given level in binary form to the given writer
+    The level record is built in a single buffer and written with one call
     Args:
         level (CCLevel): the level to write
         writer (BufferedWriter): the active writer in binary write mode
+        use_rle (bool): optional, set to False to skip Run Length Encoding of the layers
     """
-    level_bytes = calculate_level_byte_size(level)
-    writer.write(level_bytes.to_bytes(2, cc_data.BYTE_ORDER))
-    writer.write(level.level_number.to_bytes(2, cc_data.BYTE_ORDER))
-    writer.write(level.time.to_bytes(2, cc_data.BYTE_ORDER))
-    writer.write(level.num_chips.to_bytes(2, cc_data.BYTE_ORDER))
-    writer.write(b'\x01\x00')  # Write the "map detail" which is always a 2 byte number set to 1
-    write_layer_to_dat(level.upper_layer, writer)
-    write_layer_to_dat(level.lower_layer, writer)
-    total_field_byte_size = calculate_total_optional_field_byte_size(level.optional_fields)
-    writer.write(total_field_byte_size.to_bytes(2, cc_data.BYTE_ORDER))
-    for field in level.optional_fields:
-        write_field_to_dat(field, writer)
-
-
-def write_cc_data_to_dat(cc_dat, dat_file):
+    writer.write(make_bytes_from_level(level, use_rle))
+
+
+def write_cc_data_to_dat(cc_dat, dat_file, use_rle=True):
     """Writes the given CC dat in binary form to the file
+    The whole file is built in memory and written with one call. More than MAX_LEVEL_COUNT levels raise a ValueError
     Args:
         cc_dat (CCData): the cc data to write
-        dat_file (string): the filename of the output file
+        dat_file (string or binary file object): the filename of the output file, or an open binary file or socket
+        use_rle (bool): optional, set to False to skip Run Length Encoding of the layers
     """
+    if hasattr(dat_file, "write") or hasattr(dat_file, "sendall"):
+        dump(cc_dat, dat_file, use_rle)
+        return
+    dat_bytes = make_bytes_from_cc_data(cc_dat, use_rle)
     with open(dat_file, 'wb') as writer: # Note: DAT files are opened in binary mode
-        # Basic DAT file format is: DAT header, total number of levels, level 1, level 2, etc.
-        writer.write(CC_DAT_HEADER_CODE)
-        writer.write(cc_dat.level_count.to_bytes(2, cc_data.BYTE_ORDER))
-        for level in cc_dat.levels:
-            write_level_to_dat(level, writer)
+        writer.write(dat_bytes)
+
 
+def loads(dat_bytes, stats=None):
+    """Constructs a CCDataFile object from DAT file data, such as a pack received over the network
+    Args:
+        dat_bytes (bytes-like object) : the complete contents of a DAT file (bytes, bytearray, memoryview, mmap, ...)
+        stats (CCParseStats) : optional, collects parse instrumentation
+    Returns:
+        A CCDataFile object, or None if the DAT header is invalid
+    """
+    return make_cc_data_from_buffer(dat_bytes, stats)
+
+
+def load(reader, stats=None):
+    """Reads DAT file data from an open binary file object and constructs a CCDataFile object out of it
+    The reader is read to the end from its current position and is not closed
+    Args:
+        reader (binary file object) : an object with a read method, such as an open file, BytesIO or HTTP response
+        stats (CCParseStats) : optional, collects parse instrumentation
+    Returns:
+        A CCDataFile object, or None if the DAT header is invalid
+    """
+    return make_cc_data_from_buffer(reader.read(), stats)
+
+
+def dumps(cc_dat, use_rle=True):
+    """Returns the complete DAT file data of the given CC dat as a bytearray, see make_bytes_from_cc_data"""
+    return make_bytes_from_cc_data(cc_dat, use_rle)
+
+
+def dump(cc_dat, writer, use_rle=True):
+    """Writes the given CC dat in binary form to an open binary file object or socket
+    The DAT data is serialized into a single buffer which is handed over without further copies,
+    to socket.sendall for sockets and to write otherwise. The writer is not closed
+    Args:
+        cc_dat (CCDataFile): the cc data to write
+        writer : a binary file object such as an open file or BytesIO, or a connected socket
+        use_rle (bool): optional, set to False to skip Run Length Encoding of the layers
+    Returns:
+        The number of bytes written
+    """
+    dat_bytes = make_bytes_from_cc_data(cc_dat, use_rle)
+    if hasattr(writer, "sendall"):
+        writer.sendall(dat_bytes)
+    else:
+        write_all(writer, dat_bytes)
+    return len(dat_bytes)
+
+
+def write_all(writer, data):
+    """Writes all of data to a binary file object, calling write again for the rest after a short write
+    Args:
+        writer : a binary file object, buffered or raw (unbuffered)
+        data (bytes-like object): the data to write
+    """
+    with memoryview(data) as view:
+        written = 0
+        while written < len(view):
+            # Raw (unbuffered) files may write less than they are given. Writers that return None wrote it all
+            count = writer.write(view[written:])
+            if count is None:
+                break
+            written += count
+
+
+def write_levels_to_dat(levels, dat_file, use_rle=True):
+    """Writes levels to a DAT file one at a time, so a pack of any length is written with constant memory
+    A level count of 0 is written with the header and is patched with the real count once every level is written
+    Args:
+        levels (iterable of CCLevels): the levels to write, such as a generator from iter_levels
+        dat_file (string or binary file object): the filename of the output file, or a seekable binary file, which
+            may be raw (unbuffered). The DAT data is written from the current position of a file object, which is left
+            at the end of the data
+        use_rle (bool): optional, set to False to skip Run Length Encoding of the layers
+    Returns:
+        The number of levels written
+    """
+    if not hasattr(dat_file, "write"):
+        with open(dat_file, 'wb') as writer:
+            return write_levels_to_dat(levels, writer, use_rle)
+    if not dat_file.seekable():
+        raise ValueError("write_levels_to_dat needs a seekable file to patch the level count")
+    start = dat_file.tell()
+    write_all(dat_file, CC_DAT_HEADER_CODE + bytes(2))
+    level_count = 0
+    buffer = bytearray()
+    for level in levels:
+        if level_count == MAX_LEVEL_COUNT:
+            raise ValueError("A DAT file holds at most " + str(MAX_LEVEL_COUNT) + " levels")
+        # The buffer is reused for every level, so no per-level allocation is made once it has grown
+        del buffer[:]
+        serialize_level_into(level, buffer, use_rle)
+        write_all(dat_file, buffer)
+        level_count += 1
+    end = dat_file.tell()
+    dat_file.seek(start + len(CC_DAT_HEADER_CODE))
+    write_all(dat_file, level_count.to_bytes(2, cc_data.BYTE_ORDER))
+    dat_file.seek(end)
+    return level_count
@@ -2,22 +2,168 @@
 Data structures for manipulating Chip's Challenge (CC) data
 Created for the class Programming for Game Designers
 """
+import copyreg
+import pickle
+import struct
+
 BYTE_ORDER = "little"
 
+# Binary record layouts of the list based fields. "<" matches the little endian BYTE_ORDER
+# Trap: button x, button y, trap x, trap y as 2 byte words followed by 2 zero bytes
+TRAP_CONTROL_STRUCT = struct.Struct("<4H2x")
+# Cloning machine: button x, button y, machine x, machine y as 2 byte words
+CLONING_MACHINE_CONTROL_STRUCT = struct.Struct("<4H")
+# Monster: x, y as single bytes
+MONSTER_COORDINATE_STRUCT = struct.Struct("<2B")
+
+
+class CCTrackedList(list):
+    """A list that records when it is changed
+    Member vars:
+        dirty (bool): True if the list was changed since it was last marked clean. New lists are dirty
+    Owners poll dirty rather than being called back, so a list holds no reference to its owner
+    """
+    dirty = True
+
+    def changed(self):
+        self.dirty = True
+
+    def __reduce__(self):
+        return (CCTrackedList, (list(self),), {"dirty": self.dirty})
+
+    def __setitem__(self, key, value):
+        list.__setitem__(self, key, value)
+        self.changed()
+
+    def __delitem__(self, key):
+        list.__delitem__(self, key)
+        self.changed()
+
+    def __iadd__(self, other):
+        list.extend(self, other)
+        self.changed()
+        return self
+
+    def __imul__(self, count):
+        list.__imul__(self, count)
+        self.changed()
+        return self
+
+    def append(self, value):
+        list.append(self, value)
+        self.changed()
+
+    def extend(self, values):
+        list.extend(self, values)
+        self.changed()
+
+    def insert(self, index, value):
+        list.insert(self, index, value)
+        self.changed()
+
+    def pop(self, index=-1):
+        value = list.pop(self, index)
+        self.changed()
+        return value
+
+    def remove(self, value):
+        list.remove(self, value)
+        self.changed()
+
+    def clear(self):
+        list.clear(self)
+        self.changed()
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self.changed()
+
+    def reverse(self):
+        list.reverse(self)
+        self.changed()
+
 
 class CCField:
     """The base field class
     Member vars:
         type_val (int): the type identifier of this class (set to 3)
         byte_val (bytes): the byte data of the field
+        dirty (bool): True if the field was changed since it was last marked clean. New fields are dirty
+        changed (bool): the stored dirty flag, which does not yet include changes to the field's lists
+        byte_cache (bytes): the cached byte_data, or None until it is next encoded
+    Note: fields use __slots__ so they carry no per-instance __dict__
+    Setting any member var marks the field dirty and clears byte_cache. Lists assigned to a field are copied into
+    a CCTrackedList, which dirty and byte_data poll so that changing their items does the same.
+    Since the field holds a copy, later changes to the list that was passed in do not reach the field: change the
+    field's own list (field.monsters.append(...)) or assign the list again. Assigning a field's own list back to it,
+    as += does, keeps the list without copying it
+    Subclasses encode their data in make_byte_data, byte_data caches the result
     """
+    __slots__ = ("type_val", "byte_val", "changed", "byte_cache")
 
     def __init__(self, type_val, byte_val):
-        self.type_val = type
+        self.type_val = type_val
         self.byte_val = byte_val
 
+    def __setattr__(self, name, value):
+        if isinstance(value, list):
+            if type(value) is not CCTrackedList or getattr(self, name, None) is not value:
+                value = CCTrackedList(value)
+            value.dirty = False
+        object.__setattr__(self, name, value)
+        if name != "changed" and name != "byte_cache":
+            self.mark_dirty()
+
+    def __reduce_ex__(self, protocol):
+        # Fields are pickled as the values of their slots so loading them sets the decoded state without decoding again
+        # or going through __setattr__. A byte_cache slice of the data the field was decoded from is pickled as bytes
+        self.poll_lists()
+        values = [getattr(self, name, None) for name in get_field_slots(type(self))]
+        if isinstance(self.byte_cache, memoryview):
+            values[FIELD_BYTE_CACHE_INDEX] = bytes(self.byte_cache)
+        return (make_field_from_pickle, (type(self), tuple(values)))
+
+    def mark_dirty(self):
+        object.__setattr__(self, "changed", True)
+        object.__setattr__(self, "byte_cache", None)
+
+    def poll_lists(self):
+        """Marks the field dirty if one of its CCTrackedLists was changed since the last poll"""
+        # Only the slots of the subclass can hold lists, the CCField slots are set by the subclass itself
+        for name in type(self).__slots__:
+            value = getattr(self, name, None)
+            if isinstance(value, CCTrackedList) and value.dirty:
+                value.dirty = False
+                self.mark_dirty()
+
+    @property
+    def dirty(self):
+        self.poll_lists()
+        return self.changed
+
+    def cache_byte_data(self, byte_data):
+        """Sets the byte_data of the field to already encoded data, such as the data the field was decoded from"""
+        object.__setattr__(self, "byte_cache", byte_data)
+
+    def mark_clean(self):
+        self.poll_lists()
+        object.__setattr__(self, "changed", False)
+
     @property
     def byte_data(self):
+        """The DAT binary data of the field. It is encoded once and cached until the field is changed"""
+        self.poll_lists()
+        if self.byte_cache is None:
+            object.__setattr__(self, "byte_cache", self.make_byte_data())
+        return self.byte_cache
+
+    @property
+    def encoded_size(self):
+        """The number of bytes the field takes in a DAT file: type (1 byte) + size (1 byte) + byte_data"""
+        return len(self.byte_data) + 2
+
+    def make_byte_data(self):
+        """Encodes the DAT binary data of the field, see byte_data"""
         return self.byte_val
 
     def __str__(self):
@@ -28,11 +174,34 @@ class CCField:
     @property
     def json_data(self):
         json_field = {}
-        json_field["type"] = self.int_type
+        json_field["type"] = self.type_val
         json_field["value"] = self.byte_val.decode()
         return json_field
 
 
+FIELD_SLOT_CACHE = {}
+FIELD_BYTE_CACHE_INDEX = CCField.__slots__.index("byte_cache")
+
+
+def get_field_slots(field_class):
+    """Returns the names of every slot of a field class, the CCField slots first"""
+    slots = FIELD_SLOT_CACHE.get(field_class)
+    if slots is None:
+        slots = CCField.__slots__
+        if field_class is not CCField:
+            slots += field_class.__slots__
+        FIELD_SLOT_CACHE[field_class] = slots
+    return slots
+
+
+def make_field_from_pickle(field_class, values):
+    """Reconstructs a pickled field from the values of its slots, see CCField.__reduce_ex__"""
+    field = object.__new__(field_class)
+    for name, value in zip(get_field_slots(field_class), values):
+        object.__setattr__(field, name, value)
+    return field
+
+
 class CCMapTitleField(CCField):
     """A class defining the map title field
     Member vars:
@@ -40,6 +209,7 @@ class CCMapTitleField(CCField):
         title (string): the title, max length 63 characters
     """
     TYPE = 3
+    __slots__ = ("title",)
 
     def __init__(self, title):
         if __debug__:
@@ -59,8 +229,7 @@ class CCMapTitleField(CCField):
         json_field["title"] = self.title
         return json_field
 
-    @property
-    def byte_data(self):
+    def make_byte_data(self):
         title_bytes = b""
         title_bytes += self.title.encode("ascii")
         title_bytes += b'\x00'
@@ -69,17 +238,28 @@ class CCMapTitleField(CCField):
 
 class CCCoordinate:
     """A class defining a single coordinate
+    Coordinates are immutable. There are only 1024 of them, so CCCoordinate(x, y) returns
+    a shared instance from a precomputed table instead of constructing a new object
     Member vars:
         x (int): x position, a value from 0 to 31
         y (int): y position, a value from 0 to 31
+    Out of range values raise ValueError even under python -O, since they would otherwise index another coordinate
     """
+    __slots__ = ("x", "y")
 
-    def __init__(self, x, y):
-        if __debug__:
-            if (x<0 or x>31) or (y<0 or y>31):
-                raise AssertionError("Coordinates: ("+str(x)+", "+str(y)+") out of range. Coordinates must be from 0 to 31")
-        self.x = x
-        self.y = y
+    def __new__(cls, x, y):
+        if not (0 <= x <= 31 and 0 <= y <= 31):
+            raise ValueError("Coordinates: ("+str(x)+", "+str(y)+") out of range. Coordinates must be from 0 to 31")
+        return COORDINATE_TABLE[y * 32 + x]
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CCCoordinate objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("CCCoordinate objects are immutable")
+
+    def __reduce__(self):
+        return (CCCoordinate, (self.x, self.y))
 
     def __str__(self):
         return "("+str(self.x)+", "+str(self.y)+")"
@@ -89,13 +269,31 @@ class CCCoordinate:
         return {"x":self.x, "y":self.y}
 
 
+def make_coordinate_table():
+    """Returns the table of every possible coordinate, indexed by y * 32 + x"""
+    table = []
+    for y in range(32):
+        for x in range(32):
+            coordinate = object.__new__(CCCoordinate)
+            object.__setattr__(coordinate, "x", x)
+            object.__setattr__(coordinate, "y", y)
+            table.append(coordinate)
+    return tuple(table)
+
+
+COORDINATE_TABLE = make_coordinate_table()
+
+
 class CCTrapControl:
     """A class defining a single trap control
     Member vars:
         button_coord (CCCoordinate): the location of the brown button
         trap_coord (CCCoordinate): the location of the trap
+    Trap controls are immutable
     """
 
+    __slots__ = ("button_coord", "trap_coord")
+
     def __init__(self, bx, by, tx, ty):
         """Traps are defined by a pairs of coordinates (bx, by, tx, ty)
         Note that all coordinates must be from 0 to 31
@@ -103,8 +301,17 @@ class CCTrapControl:
             bx, by (int, int): the position of the button
             tx, ty (int, int): the position of the trap
         """
-        self.button_coord = CCCoordinate(bx, by)
-        self.trap_coord = CCCoordinate(tx, ty)
+        object.__setattr__(self, "button_coord", CCCoordinate(bx, by))
+        object.__setattr__(self, "trap_coord", CCCoordinate(tx, ty))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CCTrapControl objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("CCTrapControl objects are immutable")
+
+    def __reduce__(self):
+        return (CCTrapControl, (self.button_coord.x, self.button_coord.y, self.trap_coord.x, self.trap_coord.y))
 
     def __str__(self):
         return "button"+str(self.button_coord)+", trap"+str(self.trap_coord)
@@ -124,6 +331,7 @@ class CCTrapControlsField(CCField):
         traps (list of CCTrapControl): a list of traps for the map
     """
     TYPE = 4
+    __slots__ = ("traps",)
 
     def __init__(self, traps):
         """A Trap Control Field is defined by a list of traps
@@ -155,16 +363,15 @@ class CCTrapControlsField(CCField):
         json_field["traps"] = traps_data
         return json_field
 
-    @property
-    def byte_data(self):
-        byte_value = b""
+    def make_byte_data(self):
+        byte_value = bytearray(len(self.traps) * TRAP_CONTROL_STRUCT.size)
+        offset = 0
         for trap in self.traps:
-            byte_value += trap.button_coord.x.to_bytes(2, BYTE_ORDER)
-            byte_value += trap.button_coord.y.to_bytes(2, BYTE_ORDER)
-            byte_value += trap.trap_coord.x.to_bytes(2, BYTE_ORDER)
-            byte_value += trap.trap_coord.y.to_bytes(2, BYTE_ORDER)
-            byte_value += b'\x00\x00' #DAT format says to append 0 to the end of the coordinates
-        return byte_value
+            # DAT format says to append 0 to the end of the coordinates, the struct pads with 2 zero bytes
+            TRAP_CONTROL_STRUCT.pack_into(byte_value, offset, trap.button_coord.x, trap.button_coord.y,
+                                          trap.trap_coord.x, trap.trap_coord.y)
+            offset += TRAP_CONTROL_STRUCT.size
+        return bytes(byte_value)
 
 
 class CCCloningMachineControl:
@@ -172,8 +379,11 @@ class CCCloningMachineControl:
     Member vars:
         button_coord (CCCoordinate): the location of the red button
         machine_coord (CCCoordinate): the location of the cloning machine
+    Cloning machine controls are immutable
     """
 
+    __slots__ = ("button_coord", "machine_coord")
+
     def __init__(self, bx, by, tx, ty):
         """Cloning Machines are defined by a pairs of coordinates (bx, by, tx, ty)
         Note that all coordinates must be from 0 to 31
@@ -181,8 +391,17 @@ class CCCloningMachineControl:
             bx, by (int, int): the position of the button
             tx, ty (int, int): the position of the machine
         """
-        self.button_coord = CCCoordinate(bx, by)
-        self.machine_coord = CCCoordinate(tx, ty)
+        object.__setattr__(self, "button_coord", CCCoordinate(bx, by))
+        object.__setattr__(self, "machine_coord", CCCoordinate(tx, ty))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CCCloningMachineControl objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("CCCloningMachineControl objects are immutable")
+
+    def __reduce__(self):
+        return (CCCloningMachineControl, (self.button_coord.x, self.button_coord.y, self.machine_coord.x, self.machine_coord.y))
 
     def __str__(self):
         return "button"+str(self.button_coord)+", machine"+str(self.machine_coord)
@@ -202,6 +421,7 @@ class CCCloningMachineControlsField(CCField):
         machine (list of CCCloningMachineControl): a list of cloning machines for the map
     """
     TYPE = 5
+    __slots__ = ("machines",)
 
     def __init__(self, machines):
         """A cloning machine control field is defined by a list of machines
@@ -233,15 +453,14 @@ class CCCloningMachineControlsField(CCField):
         json_field["machines"] = machine_data
         return json_field
 
-    @property
-    def byte_data(self):
-        byte_value = b""
+    def make_byte_data(self):
+        byte_value = bytearray(len(self.machines) * CLONING_MACHINE_CONTROL_STRUCT.size)
+        offset = 0
         for machine in self.machines:
-            byte_value += machine.button_coord.x.to_bytes(2, BYTE_ORDER)
-            byte_value += machine.button_coord.y.to_bytes(2, BYTE_ORDER)
-            byte_value += machine.machine_coord.x.to_bytes(2, BYTE_ORDER)
-            byte_value += machine.machine_coord.y.to_bytes(2, BYTE_ORDER)
-        return byte_value
+            CLONING_MACHINE_CONTROL_STRUCT.pack_into(byte_value, offset, machine.button_coord.x, machine.button_coord.y,
+                                                     machine.machine_coord.x, machine.machine_coord.y)
+            offset += CLONING_MACHINE_CONTROL_STRUCT.size
+        return bytes(byte_value)
 
 
 class CCEncodedPasswordField(CCField):
@@ -251,6 +470,7 @@ class CCEncodedPasswordField(CCField):
         password (list of ints): a password encoded as a list of ints from 4 to 9 ints in length
     """
     TYPE = 6
+    __slots__ = ("password",)
 
     def __init__(self, password):
         """Initializes an encoded password
@@ -275,13 +495,8 @@ class CCEncodedPasswordField(CCField):
         json_field["password"] = self.password
         return json_field
 
-    @property
-    def byte_data(self):
-        password_bytes = b""
-        for i in self.password:
-            password_bytes += i.to_bytes(1, BYTE_ORDER)
-        password_bytes += b'\x00'
-        return password_bytes
+    def make_byte_data(self):
+        return bytes(self.password) + b'\x00'  # the password ints are single bytes followed by a terminating 0
 
 
 class CCMapHintField(CCField):
@@ -291,6 +506,7 @@ class CCMapHintField(CCField):
         hint (string): the hint for the level max length 127 characters
     """
     TYPE = 7
+    __slots__ = ("hint",)
 
     def __init__(self, hint):
         if __debug__:
@@ -311,8 +527,7 @@ class CCMapHintField(CCField):
         json_field["hint"] = self.hint
         return json_field
 
-    @property
-    def byte_data(self):
+    def make_byte_data(self):
         hint_bytes = b""
         hint_bytes += self.hint.encode("ascii")
         hint_bytes += b'\x00'
@@ -328,7 +543,7 @@ class CCPasswordField(CCField):
         password (string): the password string, length from 4 to 9 characters
     """
     TYPE = 8
-    password = ""
+    __slots__ = ("password",)
 
     def __init__(self, password):
         if __debug__:
@@ -349,11 +564,10 @@ class CCPasswordField(CCField):
         json_field["password"] = self.password
         return json_field
 
-    @property
-    def byte_data(self):
+    def make_byte_data(self):
         password_bytes = b""
         password_bytes += self.password.encode("ascii")
-        password_bytes + b'\x00'
+        password_bytes += b'\x00'
         return password_bytes
 
 
@@ -364,6 +578,7 @@ class CCMonsterMovementField(CCField):
         monsters (list of CCCoordinate): the coordinates of each monster
     """
     TYPE = 10
+    __slots__ = ("monsters",)
 
     def __init__(self, monsters):
         if __debug__:
@@ -390,13 +605,96 @@ class CCMonsterMovementField(CCField):
         json_field["monsters"] = monster_data
         return json_field
 
-    @property
-    def byte_data(self):
-        byte_value = b""
+    def make_byte_data(self):
+        byte_value = bytearray(len(self.monsters) * MONSTER_COORDINATE_STRUCT.size)
+        offset = 0
         for monster in self.monsters:
-            byte_value += monster.x.to_bytes(1, BYTE_ORDER)
-            byte_value += monster.y.to_bytes(1, BYTE_ORDER)
-        return byte_value
+            MONSTER_COORDINATE_STRUCT.pack_into(byte_value, offset, monster.x, monster.y)
+            offset += MONSTER_COORDINATE_STRUCT.size
+        return bytes(byte_value)
+
+
+class CCLayer(bytearray):
+    """A class defining a single map layer, stored compactly as one byte per tile
+    A layer behaves like the list of 1024 ints it replaces (indexing, slicing, iteration, len, append
+    and comparison with lists) and can also be indexed by position with layer[x, y]
+    Member vars:
+        dirty (bool): True if the layer was changed since it was last marked clean. New layers are dirty
+    """
+    WIDTH = 32
+    HEIGHT = 32
+    dirty = True
+
+    def __getitem__(self, key):
+        if type(key) is tuple:
+            x, y = key
+            return bytearray.__getitem__(self, y * CCLayer.WIDTH + x)
+        return bytearray.__getitem__(self, key)
+
+    def __setitem__(self, key, value):
+        if type(key) is tuple:
+            x, y = key
+            key = y * CCLayer.WIDTH + x
+        bytearray.__setitem__(self, key, value)
+        self.dirty = True
+
+    def __delitem__(self, key):
+        bytearray.__delitem__(self, key)
+        self.dirty = True
+
+    def __iadd__(self, other):
+        bytearray.extend(self, other)
+        self.dirty = True
+        return self
+
+    def __imul__(self, count):
+        bytearray.__imul__(self, count)
+        self.dirty = True
+        return self
+
+    def append(self, value):
+        bytearray.append(self, value)
+        self.dirty = True
+
+    def extend(self, values):
+        bytearray.extend(self, values)
+        self.dirty = True
+
+    def insert(self, index, value):
+        bytearray.insert(self, index, value)
+        self.dirty = True
+
+    def pop(self, index=-1):
+        value = bytearray.pop(self, index)
+        self.dirty = True
+        return value
+
+    def remove(self, value):
+        bytearray.remove(self, value)
+        self.dirty = True
+
+    def clear(self):
+        bytearray.clear(self)
+        self.dirty = True
+
+    def reverse(self):
+        bytearray.reverse(self)
+        self.dirty = True
+
+    def __eq__(self, other):
+        if isinstance(other, list):
+            return len(self) == len(other) and list(self) == other
+        return bytearray.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __reduce_ex__(self, protocol):
+        # With pickle protocol 5 the tiles are handed to the pickler as a PickleBuffer, so they can be passed out-of-band
+        tiles = pickle.PickleBuffer(self) if protocol >= 5 else bytes(self)
+        return (CCLayer, (tiles,), self.__dict__ or None)
 
 
 class CCLevel:
@@ -406,17 +704,28 @@ class CCLevel:
         time (int): the time limit in seconds for the level. 0 means no time limit
         num_chips (int): the number of computer chips to be collected in the level
             Layers: Chip's Challenge maps are 32x32 grids in 2 layers: upper and lower
-            A single map layer is stored as an array of 1024 ints
-        upper_layer (int list): the layer data for the upper (main) layer
-        lower_layer (int list): the lower layer data. this allows for objects to be placed under other objects
+            A single map layer is stored as a CCLayer of 1024 tiles. Plain lists of ints are also accepted
+        upper_layer (CCLayer): the layer data for the upper (main) layer
+        lower_layer (CCLayer): the lower layer data. this allows for objects to be placed under other objects
         optional_fields (list of CCField types): the fields that augment the data of this level. all levels have a title and a password
+        raw_record (bytes or memoryview): the DAT level record this level was decoded from, or None.
+            While the level is not dirty, saving copies this record instead of encoding the level again
+    Setting level_number, time, num_chips, a layer or the optional_fields marks the level dirty, as do changes made
+    to its CCLayers, its CCTrackedList of optional fields or the fields in it. Plain list layers and optional field
+    lists can not be tracked and always count as dirty
+    A level that is not dirty is pickled without its optional fields, which are decoded from raw_record when they
+    are first used after unpickling
     """
+    TRACKED_ATTRIBUTES = frozenset(("level_number", "time", "num_chips", "upper_layer", "lower_layer", "optional_fields"))
+
     def __init__(self):
+        self.raw_record = None
+        self.header_dirty = True
         self.level_number = -1
         self.time = -1
         self.num_chips = -1
-        self.upper_layer = []
-        self.lower_layer = []
+        self.upper_layer = CCLayer()
+        self.lower_layer = CCLayer()
         self.optional_fields = []
 
     def __str__(self):
@@ -442,9 +751,103 @@ class CCLevel:
             return_str += "\n"
         return return_str
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in CCLevel.TRACKED_ATTRIBUTES:
+            object.__setattr__(self, "header_dirty", True)
+
+    def __getattr__(self, name):
+        # Only called for missing attributes: the optional fields of an unpickled clean level, see __reduce_ex__
+        if name != "optional_fields" or self.__dict__.get("raw_record") is None:
+            raise AttributeError("'CCLevel' object has no attribute '" + name + "'")
+        import cc_dat_utils  # imported here since cc_dat_utils itself depends on this module
+        fields = CCTrackedList(cc_dat_utils.make_optional_fields_from_record(self.raw_record))
+        fields.dirty = False
+        for field in fields:
+            field.mark_clean()
+        object.__setattr__(self, "optional_fields", fields)
+        return fields
+
+    def __reduce_ex__(self, protocol):
+        # With pickle protocol 5 the raw record can be passed out-of-band, a memoryview can only be pickled as bytes.
+        # The fields of a clean level are all in its raw record, so they are left out and decoded again when used
+        state = dict(self.__dict__)
+        if "optional_fields" in state and not self.dirty:
+            del state["optional_fields"]
+        if protocol >= 5 and self.raw_record is not None:
+            state["raw_record"] = pickle.PickleBuffer(self.raw_record)
+        elif isinstance(self.raw_record, memoryview):
+            state["raw_record"] = bytes(self.raw_record)
+        return (copyreg.__newobj__, (CCLevel,), state)
+
     def add_field(self, field):
         self.optional_fields.append(field)
 
+    @property
+    def dirty(self):
+        """True if the level has no raw_record or was changed since it was decoded from it"""
+        if self.header_dirty or self.raw_record is None:
+            return True
+        if getattr(self.upper_layer, "dirty", True) or getattr(self.lower_layer, "dirty", True):
+            return True
+        # Fields not decoded yet are unchanged from raw_record
+        if "optional_fields" not in self.__dict__:
+            return False
+        if getattr(self.optional_fields, "dirty", True):
+            return True
+        for field in self.optional_fields:
+            if field.dirty:
+                return True
+        return False
+
+    def mark_clean(self, raw_record):
+        """Marks the level and its layers and fields as unchanged from the given DAT level record
+        Args:
+            raw_record (bytes or memoryview): the complete DAT level record of this level, including its size word
+        """
+        for layer in (self.upper_layer, self.lower_layer):
+            if isinstance(layer, CCLayer):
+                layer.dirty = False
+        if "optional_fields" in self.__dict__:
+            if not isinstance(self.optional_fields, CCTrackedList):
+                object.__setattr__(self, "optional_fields", CCTrackedList(self.optional_fields))
+            self.optional_fields.dirty = False
+            for field in self.optional_fields:
+                field.mark_clean()
+        object.__setattr__(self, "raw_record", raw_record)
+        object.__setattr__(self, "header_dirty", False)
+
+    @property
+    def json_data(self):
+        json_level = {}
+        json_level["number"] = self.level_number
+        json_level["time"] = self.time
+        json_level["chip number"] = self.num_chips
+        json_level["optional fields"] = [field.json_data for field in self.optional_fields]
+        json_level["upper layer"] = list(self.upper_layer)
+        json_level["lower layer"] = list(self.lower_layer)
+        return json_level
+
+    def serialize_into(self, buffer, use_rle=True):
+        """Appends the DAT binary form of this level to the given bytearray
+        Args:
+            buffer (bytearray): the buffer to append to
+            use_rle (bool): optional, set to False to skip Run Length Encoding of the layers
+        Returns:
+            The number of bytes appended to the buffer
+        """
+        import cc_dat_utils  # imported here since cc_dat_utils itself depends on this module
+        return cc_dat_utils.serialize_level_into(self, buffer, use_rle)
+
+    def to_bytes(self, use_rle=True):
+        """Returns the DAT binary form of this level as bytes
+        Args:
+            use_rle (bool): optional, set to False to skip Run Length Encoding of the layers
+        """
+        buffer = bytearray()
+        self.serialize_into(buffer, use_rle)
+        return bytes(buffer)
+
 
 class CCDataFile:
     """A class defining the data of dat file
@@ -467,6 +870,30 @@ class CCDataFile:
     def level_count(self):
         return len(self.levels)
 
+    @property
+    def json_data(self):
+        return {"levels": [level.json_data for level in self.levels]}
+
     def add_level(self, level):
         self.levels.append(level)
 
+    def serialize_into(self, buffer, use_rle=True):
+        """Appends the complete DAT binary form of this level pack to the given bytearray
+        Args:
+            buffer (bytearray): the buffer to append to
+            use_rle (bool): optional, set to False to skip Run Length Encoding of the layers
+        Returns:
+            The number of bytes appended to the buffer
+        """
+        import cc_dat_utils  # imported here since cc_dat_utils itself depends on this module
+        return cc_dat_utils.serialize_cc_data_into(self, buffer, use_rle)
+
+    def to_bytes(self, use_rle=True):
+        """Returns the complete DAT binary form of this level pack as bytes
+        Args:
+            use_rle (bool): optional, set to False to skip Run Length Encoding of the layers
+        """
+        buffer = bytearray()
+        self.serialize_into(buffer, use_rle)
+        return bytes(buffer)
+
@@ -0,0 +1,345 @@
+"""
+Finds duplicate and near-duplicate levels across Chip's Challenge (CC) level packs
+Created for the class Programming for Game Designers
+
+Each level gets two hashes:
+    a record hash, a BLAKE2 hash of its DAT record without the size and level number, so copies of a level
+    renumbered into another pack still match
+    a MinHash signature of the set of 2x2 tile windows (shingles) of its upper and lower layers, so levels that
+    share most of their tile patterns get signatures that agree in most positions
+Signatures use one permutation hashing: every shingle is hashed once and the hash picks the signature slot it
+competes for, so a level is signed in one pass over its distinct shingles instead of one pass per slot.
+Near-duplicates are found with locality sensitive hashing: signatures are cut into bands, levels sharing a band
+are compared, and pairs above the similarity threshold are joined with a union-find. Every step is linear in the
+number of levels, and DAT files are hashed in parallel worker processes
+Usage:
+    python cc_dedupe.py [-j WORKERS] [--threshold 0.8] [--exact-only] [-o report.json] INPUT [INPUT ...]
+    INPUT can be a filename or a glob pattern such as "packs/*.dat"
+"""
+import argparse
+import array
+import concurrent.futures
+import hashlib
+import json
+import os
+import sys
+import time
+import cc_data
+import cc_dat_utils
+import convert
+
+MIN_HASH_SLOTS = 64
+MIN_HASH_SLOT_BITS = 6  # log2 of MIN_HASH_SLOTS, the top bits of a shingle hash pick its slot
+MIN_HASH_EMPTY = 1 << 32  # above every 32 bit slot value
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15  # 2**64 / golden ratio, spreads the bits of the shingle hashes
+HASH_MASK = (1 << 64) - 1
+RECORD_HASH_SIZE = 16
+DEFAULT_BAND_ROWS = 4
+DEFAULT_THRESHOLD = 0.8
+
+
+class CCLevelHash:
+    """The hashes of a single level
+    Member vars:
+        dat_file (string): the DAT file holding the level, or None
+        level_index (int): the index of the level in its pack
+        level_number (int): the level number stored in the level
+        record_hash (bytes): hash of the DAT record without its size and level number, equal for exact duplicates
+        signature (bytes): MIN_HASH_SLOTS 32 bit MinHash values, see make_min_hash_signature
+    """
+    __slots__ = ("dat_file", "level_index", "level_number", "record_hash", "signature")
+
+    def __init__(self, dat_file, level_index, level_number, record_hash, signature):
+        self.dat_file = dat_file
+        self.level_index = level_index
+        self.level_number = level_number
+        self.record_hash = record_hash
+        self.signature = signature
+
+    def __reduce__(self):
+        return CCLevelHash, (self.dat_file, self.level_index, self.level_number, self.record_hash, self.signature)
+
+    def __str__(self):
+        return str(self.dat_file) + " level " + str(self.level_number)
+
+    @property
+    def json_data(self):
+        return {"dat_file": self.dat_file, "level_index": self.level_index, "level_number": self.level_number}
+
+
+def make_record_hash(record):
+    """Returns the hash of a DAT level record, leaving out its size word and level number
+    Args:
+        record (bytes-like object) : the complete level record, starting with its 2 byte size
+    """
+    return hashlib.blake2b(memoryview(record)[4:], digest_size=RECORD_HASH_SIZE).digest()
+
+
+def make_shingles(upper_layer, lower_layer):
+    """Returns the set of shingles of both layers: every 2x2 window of tiles, as an int
+    The 4 tiles of a window are the low 32 bits of its shingle and the layer is the bit above them.
+    Each row is interleaved with the row below it, so a window is 4 consecutive bytes that are read by casting the
+    interleaved bytes to 32 bit values and the loops run in C. Windows in the last column wrap around to the next
+    rows, which is the same for every level.
+    Layers shorter than WIDTH * HEIGHT tiles, such as the empty layers of some JSON levels, are padded with floor
+    tiles (0) and longer ones to a whole number of rows
+    """
+    shingles = set()
+    width = cc_data.CCLayer.WIDTH
+    for layer_id, layer in enumerate((upper_layer, lower_layer)):
+        layer_bytes = bytes(cc_dat_utils.get_layer_bytes(layer))
+        tile_count = max(width * cc_data.CCLayer.HEIGHT, -(-len(layer_bytes) // width) * width)
+        if len(layer_bytes) != tile_count:
+            layer_bytes = layer_bytes.ljust(tile_count, b"\x00")
+        row_pairs = bytearray(2 * (len(layer_bytes) - width))
+        row_pairs[0::2] = layer_bytes[:-width]
+        row_pairs[1::2] = layer_bytes[width:]
+        with memoryview(row_pairs) as view:
+            # Windows starting in even columns, then in odd columns
+            windows = set(view.cast("I"))
+            windows.update(view[2:-2].cast("I"))
+        tag = layer_id << 32
+        shingles.update(map(tag.__add__, windows))
+    return shingles
+
+
+def make_min_hash_signature(shingles):
+    """Returns the one permutation MinHash signature of a set of shingles as bytes of MIN_HASH_SLOTS 32 bit values
+    Each shingle is hashed once with a multiplicative hash, the top bits of the hash pick a slot and the next 32 bits
+    compete for its minimum. The hashes are sorted from largest to smallest and zipped into a dictionary keyed by
+    slot, which keeps the last (smallest) hash of each slot without a Python loop over the shingles.
+    Empty slots take the value of the next filled slot so sparse sets still compare slot by slot
+    Args:
+        shingles (set of ints) : the shingles of a level, see make_shingles
+    """
+    hashes = sorted(map(HASH_MASK.__and__, map(HASH_MULTIPLIER.__mul__, shingles)), reverse=True)
+    slot_hashes = dict(zip(map((64 - MIN_HASH_SLOT_BITS).__rrshift__, hashes), hashes))
+    if not slot_hashes:
+        return bytes(MIN_HASH_SLOTS * 4)
+    value_shift = 64 - MIN_HASH_SLOT_BITS - 32
+    slots = [MIN_HASH_EMPTY] * MIN_HASH_SLOTS
+    for slot, slot_hash in slot_hashes.items():
+        slots[slot] = (slot_hash >> value_shift) & 0xFFFFFFFF
+    if len(slot_hashes) < MIN_HASH_SLOTS:
+        next_value = slots[min(slot_hashes)]
+        for slot in reversed(range(MIN_HASH_SLOTS)):
+            if slots[slot] == MIN_HASH_EMPTY:
+                slots[slot] = next_value
+            else:
+                next_value = slots[slot]
+    return array.array("I", slots).tobytes()
+
+
+def estimate_similarity(signature, other_signature):
+    """Returns the estimated Jaccard similarity of the shingle sets of two signatures, from 0.0 to 1.0"""
+    values = memoryview(signature).cast("I")
+    other_values = memoryview(other_signature).cast("I")
+    return sum(map(int.__eq__, values, other_values)) / len(values)
+
+
+def make_level_hash(level, level_index=0, dat_file=None):
+    """Returns the CCLevelHash of a CCLevel
+    Clean levels are hashed from their raw_record, changed levels are encoded first
+    """
+    record = level.raw_record if not level.dirty else cc_dat_utils.make_bytes_from_level(level)
+    signature = make_min_hash_signature(make_shingles(level.upper_layer, level.lower_layer))
+    return CCLevelHash(dat_file, level_index, level.level_number, make_record_hash(record), signature)
+
+
+def make_level_hashes_from_buffer(buffer, dat_file=None):
+    """Hashes every level of DAT file data held in memory
+    Only the layers are decoded, the optional fields are only hashed as part of the record
+    This code assumes valid DAT data and does not error check for invalid data
+    Args:
+        buffer (bytes-like object) : the complete contents of a DAT file
+        dat_file (string) : optional, the filename recorded in the level hashes
+    Returns:
+        A list of CCLevelHash objects, empty if the DAT header is invalid
+    """
+    level_hashes = []
+    with memoryview(buffer) as view:
+        offsets = cc_dat_utils.make_level_offsets_from_buffer(view)
+        if offsets is None:
+            return level_hashes
+        for level_index, offset in enumerate(offsets):
+            (level_byte_count, level_number, time_limit, chip_count,
+             map_detail, upper_layer_byte_count) = cc_dat_utils.LEVEL_HEADER_STRUCT.unpack_from(view, offset)
+            record = view[offset:(offset + level_byte_count + 2)]
+            layer_offset = offset + cc_dat_utils.LEVEL_HEADER_STRUCT.size
+            upper_layer = cc_dat_utils.make_layer_from_bytes(view[layer_offset:(layer_offset + upper_layer_byte_count)])
+            layer_offset += upper_layer_byte_count
+            lower_layer_byte_count = cc_dat_utils.WORD_STRUCT.unpack_from(view, layer_offset)[0]
+            layer_offset += 2
+            lower_layer = cc_dat_utils.make_layer_from_bytes(view[layer_offset:(layer_offset + lower_layer_byte_count)])
+            signature = make_min_hash_signature(make_shingles(upper_layer, lower_layer))
+            level_hashes.append(CCLevelHash(dat_file, level_index, level_number, make_record_hash(record), signature))
+    return level_hashes
+
+
+def make_level_hashes_from_dat(dat_file):
+    """Reads a DAT file and hashes every level of it, see make_level_hashes_from_buffer"""
+    with open(dat_file, 'rb') as reader:
+        return make_level_hashes_from_buffer(reader.read(), dat_file)
+
+
+def make_level_hashes_from_cc_data(cc_dat, dat_file=None):
+    """Hashes every level of a CCDataFile
+    Returns:
+        A list of CCLevelHash objects
+    """
+    return [make_level_hash(level, level_index, dat_file) for level_index, level in enumerate(cc_dat.levels)]
+
+
+def hash_dat_file(dat_file):
+    """Hashes every level of a DAT file, catching the errors of malformed files so a batch can carry on
+    Args:
+        dat_file (string) : the filename of the DAT file to hash
+    Returns:
+        A tuple of (dat_file, list of CCLevelHash objects, error message). The error message is None if the file was
+        hashed and the list is empty otherwise
+    """
+    try:
+        with open(dat_file, 'rb') as reader:
+            buffer = reader.read()
+        if buffer[:len(cc_dat_utils.CC_DAT_HEADER_CODE)] != cc_dat_utils.CC_DAT_HEADER_CODE:
+            return dat_file, [], "invalid DAT header"
+        return dat_file, make_level_hashes_from_buffer(buffer, dat_file), None
+    except Exception as e:
+        return dat_file, [], type(e).__name__ + ": " + str(e)
+
+
+def hash_dat_files(dat_files, workers=None, chunksize=None):
+    """Hashes the levels of many DAT files across a pool of worker processes
+    A file that can not be read or decoded is reported in its result and the other files are still hashed
+    Args:
+        dat_files (list of strings) : the filenames of the DAT files to hash
+        workers (int) : optional, the number of worker processes. Defaults to the CPU count, 1 hashes in this process
+        chunksize (int) : optional, the number of files handed to a worker at a time.
+            Defaults to spreading the files in about 4 chunks per worker
+    Returns:
+        A generator of hash_dat_file results, in the order of dat_files
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(dat_files) <= 1:
+        for dat_file in dat_files:
+            yield hash_dat_file(dat_file)
+        return
+    if chunksize is None:
+        chunksize = max(1, len(dat_files) // (workers * 4))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(hash_dat_file, dat_files, chunksize=chunksize):
+            yield result
+
+
+def find_root(parents, index):
+    """Returns the root of index in a union-find parent list, halving the path on the way"""
+    while parents[index] != index:
+        parents[index] = parents[parents[index]]
+        index = parents[index]
+    return index
+
+
+def make_groups(parents):
+    """Returns the lists of indices sharing a union-find root, for the roots with more than one member"""
+    groups = {}
+    for index in range(len(parents)):
+        groups.setdefault(find_root(parents, index), []).append(index)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def find_exact_duplicates(level_hashes):
+    """Groups levels with equal record hashes
+    Args:
+        level_hashes (list of CCLevelHash objects) : the levels to compare
+    Returns:
+        A list of groups of two or more indices into level_hashes, each group in index order
+    """
+    groups = {}
+    for index, level_hash in enumerate(level_hashes):
+        groups.setdefault(level_hash.record_hash, []).append(index)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def find_near_duplicates(level_hashes, threshold=DEFAULT_THRESHOLD, band_rows=DEFAULT_BAND_ROWS):
+    """Clusters levels whose layers are estimated to be at least threshold similar
+    Each band of band_rows signature values is a bucket key. A level is compared with the first level put in each of
+    its buckets, and joined to its cluster if the estimated similarity reaches the threshold, so the work is linear in
+    the number of levels. Clusters are transitive: A and C share a cluster if both are similar to B
+    Args:
+        level_hashes (list of CCLevelHash objects) : the levels to compare
+        threshold (float) : optional, the min estimated Jaccard similarity of the 2x2 tile windows, from 0.0 to 1.0
+        band_rows (int) : optional, the signature values per band. More rows find fewer, closer candidates
+    Returns:
+        A list of clusters of two or more indices into level_hashes, each cluster in index order
+    """
+    if MIN_HASH_SLOTS % band_rows:
+        raise ValueError("band_rows must divide " + str(MIN_HASH_SLOTS) + ", not " + repr(band_rows))
+    band_size = band_rows * 4
+    parents = list(range(len(level_hashes)))
+    buckets = [{} for band in range(MIN_HASH_SLOTS // band_rows)]
+    for index, level_hash in enumerate(level_hashes):
+        signature = level_hash.signature
+        for band, bucket in enumerate(buckets):
+            band_start = band * band_size
+            first_index = bucket.setdefault(signature[band_start:(band_start + band_size)], index)
+            if first_index == index:
+                continue
+            root = find_root(parents, index)
+            first_root = find_root(parents, first_index)
+            if root != first_root and estimate_similarity(signature,
+                                                          level_hashes[first_index].signature) >= threshold:
+                parents[root] = first_root
+    return make_groups(parents)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find duplicate and near-duplicate Chip's Challenge levels")
+    parser.add_argument("inputs", nargs="+", help="DAT files or glob patterns to search")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=None, help="number of files handed to a worker at a time")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="min estimated similarity of near-duplicates, from 0.0 to 1.0")
+    parser.add_argument("--band-rows", type=int, default=DEFAULT_BAND_ROWS, help="signature values per LSH band")
+    parser.add_argument("--exact-only", action="store_true", help="only report levels with identical records")
+    parser.add_argument("-o", "--output", help="file to write the duplicate groups to as JSON")
+    args = parser.parse_args(argv)
+
+    dat_files = convert.expand_inputs(args.inputs)
+    if not dat_files:
+        print("ERROR: No input files found")
+        return 1
+
+    start_time = time.perf_counter()
+    level_hashes = []
+    failures = 0
+    for dat_file, file_hashes, error in hash_dat_files(dat_files, args.workers, args.chunksize):
+        if error is not None:
+            failures += 1
+            print("ERROR: " + dat_file + ": " + error)
+        level_hashes.extend(file_hashes)
+    hash_time = time.perf_counter() - start_time
+    exact_groups = find_exact_duplicates(level_hashes)
+    near_groups = [] if args.exact_only else find_near_duplicates(level_hashes, args.threshold, args.band_rows)
+
+    for title, groups in (("Exact duplicates", exact_groups), ("Near duplicates", near_groups)):
+        if not groups:
+            continue
+        print(title + ":")
+        for group in groups:
+            print("  " + ", ".join(str(level_hashes[index]) for index in group))
+    print("Hashed " + str(len(level_hashes)) + " levels in " + str(len(dat_files) - failures) + "/" +
+          str(len(dat_files)) + " files in {0:.2f}s, ".format(hash_time) + "{0:.2f}s total".format(time.perf_counter() - start_time))
+    print("  " + str(len(exact_groups)) + " groups of exact duplicates, " + str(len(near_groups)) +
+          " clusters of near duplicates")
+    if args.output:
+        with open(args.output, "w") as writer:
+            json.dump({
+                "exact": [[level_hashes[index].json_data for index in group] for group in exact_groups],
+                "near": [[level_hashes[index].json_data for index in group] for group in near_groups],
+            }, writer, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,124 +1,362 @@
+"""
+Methods for converting Chip's Challenge (CC) data to and from JSON files
+Created for the class Programming for Game Designers
 
+Levels use the schema of level.json:
+    {"levels": [{"number": 1, "time": 0, "chip number": 3, "upper layer": [...], "lower layer": [...],
+                 "optional fields": ...}, ...]}
+"optional fields" is either a dictionary keyed by field name, as in level.json, or a list of the json_data of each field
+JSON lines files (.jsonl) hold the json data of one level per line instead
+In compact JSON each layer is a string holding the base64 encoded, run length encoded DAT layer data
+"""
+import base64
 import json
+import os
+import re
+import cc_data
+import cc_dat_utils
 
-CC_DAT_HEADER_CODE = b'\xAC\xAA\x02\x00'
-RLE_CODE_INT = 255
-BYTE_ORDER = "little"
-READ_ADDRESS = 0
+JSON_READ_CHUNK_SIZE = 1 << 16
+JSON_LINES_EXTENSION = ".jsonl"
+JSON_WHITESPACE = re.compile(r'\s*')
 
-class CCDataFile:
-    """A class defining the data of dat file
-    Member vars:
-        levels (list of CCLevels): the levels of this dat file
+
+def make_coordinate_from_json(json_coord):
+    """Constructs a CCCoordinate from either an {"x": x, "y": y} dictionary or an [x, y] list"""
+    if isinstance(json_coord, dict):
+        return cc_data.CCCoordinate(json_coord["x"], json_coord["y"])
+    return cc_data.CCCoordinate(json_coord[0], json_coord[1])
+
+
+def make_field_from_json_data(json_field):
+    """Constructs a field from the json_data form of a field ({"type": 3, "title": "..."}, etc.)
+    Args:
+        json_field (dict) : the json data of a single field
+    """
+    field_type = json_field["type"]
+    if field_type == cc_data.CCMapTitleField.TYPE:
+        return cc_data.CCMapTitleField(json_field["title"])
+    elif field_type == cc_data.CCTrapControlsField.TYPE:
+        traps = []
+        for trap in json_field["traps"]:
+            button = make_coordinate_from_json(trap["button_coord"])
+            trap_coord = make_coordinate_from_json(trap["trap_coord"])
+            traps.append(cc_data.CCTrapControl(button.x, button.y, trap_coord.x, trap_coord.y))
+        return cc_data.CCTrapControlsField(traps)
+    elif field_type == cc_data.CCCloningMachineControlsField.TYPE:
+        machines = []
+        for machine in json_field["machines"]:
+            button = make_coordinate_from_json(machine["button_coord"])
+            machine_coord = make_coordinate_from_json(machine["machine_coord"])
+            machines.append(cc_data.CCCloningMachineControl(button.x, button.y, machine_coord.x, machine_coord.y))
+        return cc_data.CCCloningMachineControlsField(machines)
+    elif field_type == cc_data.CCEncodedPasswordField.TYPE:
+        return cc_data.CCEncodedPasswordField(list(json_field["password"]))
+    elif field_type == cc_data.CCMapHintField.TYPE:
+        return cc_data.CCMapHintField(json_field["hint"])
+    elif field_type == cc_data.CCPasswordField.TYPE:
+        return cc_data.CCPasswordField(json_field["password"])
+    elif field_type == cc_data.CCMonsterMovementField.TYPE:
+        return cc_data.CCMonsterMovementField([make_coordinate_from_json(m) for m in json_field["monsters"]])
+    else:
+        if __debug__:
+            raise AssertionError("Unsupported field type: " + str(field_type))
+
+
+def make_fields_from_json_dict(json_fields):
+    """Constructs the optional fields from the named dictionary form used by level.json
+    Note: trap, cloning machine and monster entries with empty lists do not produce a field
+    Args:
+        json_fields (dict) : the "optional fields" dictionary of a level
+    Returns:
+        A list of the constructed fields
+    """
+    fields = []
+    if "map title" in json_fields:
+        fields.append(cc_data.CCMapTitleField(json_fields["map title"]))
+    if "map hint" in json_fields:
+        fields.append(cc_data.CCMapHintField(json_fields["map hint"]))
+    if "encoded password" in json_fields:
+        fields.append(cc_data.CCEncodedPasswordField(list(json_fields["encoded password"])))
+    if "password" in json_fields:
+        fields.append(cc_data.CCPasswordField(json_fields["password"]))
+    json_traps = json_fields.get("traps")
+    if json_traps and json_traps["traps"]:
+        traps = []
+        for json_button, json_trap in zip(json_traps["buttons"], json_traps["traps"]):
+            button = make_coordinate_from_json(json_button)
+            trap = make_coordinate_from_json(json_trap)
+            traps.append(cc_data.CCTrapControl(button.x, button.y, trap.x, trap.y))
+        fields.append(cc_data.CCTrapControlsField(traps))
+    json_machines = json_fields.get("cloning machines")
+    if json_machines and json_machines["machines"]:
+        machines = []
+        for json_button, json_machine in zip(json_machines["buttons"], json_machines["machines"]):
+            button = make_coordinate_from_json(json_button)
+            machine = make_coordinate_from_json(json_machine)
+            machines.append(cc_data.CCCloningMachineControl(button.x, button.y, machine.x, machine.y))
+        fields.append(cc_data.CCCloningMachineControlsField(machines))
+    if json_fields.get("monsters"):
+        fields.append(cc_data.CCMonsterMovementField([make_coordinate_from_json(m) for m in json_fields["monsters"]]))
+    return fields
+
+
+def make_layer_from_json(json_layer):
+    """Constructs a CCLayer from either a list of ints or a compact base64 encoded DAT layer string"""
+    if isinstance(json_layer, str):
+        return cc_dat_utils.make_layer_from_bytes(base64.b64decode(json_layer))
+    return cc_data.CCLayer(json_layer)
+
+
+def make_level_from_json(json_level):
+    """Constructs a CCLevel from the json data of a single level
+    Args:
+        json_level (dict) : the json data of the level
+    Returns:
+        A CCLevel object constructed with the json data
+    """
+    level = cc_data.CCLevel()
+    level.level_number = json_level["number"]
+    level.time = json_level["time"]
+    level.num_chips = json_level["chip number"]
+    level.upper_layer = make_layer_from_json(json_level["upper layer"])
+    level.lower_layer = make_layer_from_json(json_level["lower layer"])
+    json_fields = json_level.get("optional fields", [])
+    if isinstance(json_fields, dict):
+        level.optional_fields = make_fields_from_json_dict(json_fields)
+    else:
+        level.optional_fields = [make_field_from_json_data(json_field) for json_field in json_fields]
+    return level
+
+
+def skip_json_pattern(reader, buffer, pos, pattern, chunk_size):
+    """Skips the characters matched by pattern in a partially read JSON document, reading more as needed
+    Args:
+        reader (TextIOWrapper) : active reader reading a JSON file
+        buffer (string) : the part of the document read so far
+        pos (int) : the position in buffer to skip from
+        pattern (Pattern) : the compiled pattern of the characters to skip
+        chunk_size (int) : the number of characters to read at a time
+    Returns:
+        A (buffer, pos) tuple where pos is the first character not matched, or len(buffer) at the end of the document
+    """
+    while True:
+        pos = pattern.match(buffer, pos).end()
+        if pos < len(buffer):
+            return buffer, pos
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            return buffer, pos
+        buffer = chunk
+        pos = 0
+
+
+def decode_json_value(reader, decoder, buffer, pos, chunk_size):
+    """Decodes the JSON value starting at pos in a partially read JSON document, reading more as needed
+    Each failed attempt doubles the amount read before the next one, so a value much larger than chunk_size is
+    only decoded a logarithmic number of times and the total work stays linear in its size
+    Args:
+        reader (TextIOWrapper) : active reader reading a JSON file
+        decoder (JSONDecoder) : the decoder to use
+        buffer (string) : the part of the document read so far
+        pos (int) : the position in buffer where the value starts
+        chunk_size (int) : the number of characters to read first
+    Returns:
+        A (value, buffer, pos) tuple where pos is the position in buffer just past the value
     """
+    read_size = chunk_size
+    while True:
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+            error = None
+        except json.JSONDecodeError as decode_error:
+            error = decode_error
+        # A number cut off at the end of the buffer decodes successfully, so a value must be followed by something
+        if error is None and end < len(buffer):
+            return value, buffer, end
+        chunk = reader.read(read_size)
+        if not chunk:
+            if error is not None:
+                raise error
+            return value, buffer, end
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        read_size *= 2
 
-    def __init__(self):
-        self.levels = []
 
-    def __str__(self):
-        return_str = ""
-        return_str += "Level Pack:\n"
-        for level in self.levels:
-            return_str += str(level)
+def read_json_delimiter(reader, buffer, pos, closing, chunk_size):
+    """Reads the "," between two items of a JSON array or object, or the character closing it
+    Args:
+        reader (TextIOWrapper) : active reader reading a JSON file
+        buffer (string) : the part of the document read so far
+        pos (int) : the position in buffer just past the last item
+        closing (string) : "]" for an array, "}" for an object
+        chunk_size (int) : the number of characters to read at a time
+    Returns:
+        A (buffer, pos, closed) tuple where pos is just past the delimiter and closed is True if it was closing
+    """
+    buffer, pos = skip_json_pattern(reader, buffer, pos, JSON_WHITESPACE, chunk_size)
+    delimiter = buffer[pos:pos + 1]
+    if delimiter == ",":
+        buffer, pos = skip_json_pattern(reader, buffer, pos + 1, JSON_WHITESPACE, chunk_size)
+        return buffer, pos, False
+    if delimiter == closing:
+        return buffer, pos + 1, True
+    raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
 
-        return return_str
 
-    @property
-    def level_count(self):
-        return len(self.levels)
+def iter_json_levels(reader, chunk_size=JSON_READ_CHUNK_SIZE):
+    """Incrementally parses a {"levels": [...]} JSON document, yielding the json data of one level at a time
+    Only the level being decoded and one read chunk are held in memory, whatever the size of the document
+    The other keys of the top level object are decoded and skipped, wherever they are. The whole document is checked
+    as json.load would, raising json.JSONDecodeError for invalid JSON, but only after the levels before the error
+    were yielded
+    Args:
+        reader (TextIOWrapper) : active reader reading a JSON file
+        chunk_size (int) : optional, the number of characters to read at a time
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos = skip_json_pattern(reader, "", 0, JSON_WHITESPACE, chunk_size)
+    if buffer[pos:pos + 1] != "{":
+        raise ValueError("The JSON data is not an object")
+    buffer, pos = skip_json_pattern(reader, buffer, pos + 1, JSON_WHITESPACE, chunk_size)
+    levels_found = False
+    closed = buffer[pos:pos + 1] == "}"
+    if closed:
+        pos += 1
+    while not closed:
+        if buffer[pos:pos + 1] != '"':
+            raise json.JSONDecodeError("Expecting property name enclosed in double quotes", buffer, pos)
+        key, buffer, pos = decode_json_value(reader, decoder, buffer, pos, chunk_size)
+        buffer, pos = skip_json_pattern(reader, buffer, pos, JSON_WHITESPACE, chunk_size)
+        if buffer[pos:pos + 1] != ":":
+            raise json.JSONDecodeError("Expecting ':' delimiter", buffer, pos)
+        buffer, pos = skip_json_pattern(reader, buffer, pos + 1, JSON_WHITESPACE, chunk_size)
+        if key == "levels" and not levels_found:
+            if buffer[pos:pos + 1] != "[":
+                raise ValueError("\"levels\" is not an array in the JSON data")
+            levels_found = True
+            buffer, pos = skip_json_pattern(reader, buffer, pos + 1, JSON_WHITESPACE, chunk_size)
+            levels_closed = buffer[pos:pos + 1] == "]"
+            if levels_closed:
+                pos += 1
+            while not levels_closed:
+                json_level, buffer, pos = decode_json_value(reader, decoder, buffer, pos, chunk_size)
+                yield json_level
+                if pos >= chunk_size:
+                    buffer = buffer[pos:]
+                    pos = 0
+                buffer, pos, levels_closed = read_json_delimiter(reader, buffer, pos, "]", chunk_size)
+        else:
+            value, buffer, pos = decode_json_value(reader, decoder, buffer, pos, chunk_size)
+        buffer, pos, closed = read_json_delimiter(reader, buffer, pos, "}", chunk_size)
+    buffer, pos = skip_json_pattern(reader, buffer, pos, JSON_WHITESPACE, chunk_size)
+    if pos < len(buffer):
+        raise json.JSONDecodeError("Extra data", buffer, pos)
+    if not levels_found:
+        raise ValueError("No \"levels\" array found in the JSON data")
 
-    def add_level(self, level):
-        self.levels.append(level)
 
-def calculate_option_field_byte_size(field):
-    """Returns the size of a given field if converted to binary form
-    Note: The total byte count of field entry is the type (1 byte) + size (1 byte) and size of the data in byte form
+def iter_json_lines_levels(reader):
+    """Yields the json data of each level of a JSON lines file, where every non-empty line holds one level
     Args:
-        field (CCField)
+        reader (TextIOWrapper) : active reader reading a JSON lines file
     """
-    byte_data = field.byte_data
-    return len(byte_data) + 2
+    for line in reader:
+        if line.strip():
+            yield json.loads(line)
 
-def write_layer_to_dat(layer, writer):
-    """Writes the given layer in binary form to the given writer
-    Note: while the DAT file format supports run length encoding, this function does not implement it
+
+def iter_levels_from_json(json_file):
+    """Reads the levels of a JSON or JSON lines (.jsonl) file one at a time
     Args:
-        layer (list of ints): the layer to write
-        writer (BufferedWriter): the active writer in binary write mode
+        json_file (string) : the filename of the JSON file to read in
+    Returns:
+        A generator of CCLevel objects
     """
-    byte_size = len(layer)
-    writer.write(byte_size.to_bytes(2, BYTE_ORDER))
-    for val in layer:
-        if type(val) is int:
-            byte_val = val.to_bytes(1, BYTE_ORDER)
+    with open(json_file, "r") as reader:
+        if os.path.splitext(json_file)[1].lower() == JSON_LINES_EXTENSION:
+            json_levels = iter_json_lines_levels(reader)
         else:
-            byte_val = val
-        writer.write(byte_val)
+            json_levels = iter_json_levels(reader)
+        for json_level in json_levels:
+            yield make_level_from_json(json_level)
+
 
-def calculate_total_optional_field_byte_size(optional_fields):
-    """Returns the total size of all the given optional fields if converted to binary form
-    Note: The total byte count of field entry is the type (1 byte) + size (1 byte) and size of the data in byte form
+def make_cc_data_from_json(json_file):
+    """Reads a JSON or JSON lines (.jsonl) file and constructs a CCDataFile object out of it
+    The file is parsed incrementally so only the decoded levels are kept in memory
     Args:
-        optional_fields (list of CCFields)
+        json_file (string) : the filename of the JSON file to read in
+    Returns:
+        A CCDataFile object constructed with the data from the given file
     """
-    optional_fields_size = 0
-    for field in optional_fields:
-        optional_fields_size += calculate_option_field_byte_size(field)
-    return optional_fields_size
-
-def calculate_level_byte_size(level):
-    """Returns the total size of the given level if converted to binary form
-    The total byte count of level entry is:
-    size (2) + level number (2) + time (2) + chip count (2) +
-    map detail (2) + layer1 size (2) + number of bytes in layer1 + layer2 size (2) + number of bytes in layer2 +
-    size of optional fields
+    data = cc_data.CCDataFile()
+    for level in iter_levels_from_json(json_file):
+        data.levels.append(level)
+    return data
+
+
+def make_compact_json_layer(layer):
+    """Returns the compact JSON form of a layer: its run length encoded DAT bytes as a base64 string"""
+    return base64.b64encode(cc_dat_utils.make_bytes_from_layer(layer)).decode("ascii")
+
+
+def make_compact_json_data_from_level(level):
+    """Returns the json data of a single level with each layer stored as a compact base64 string
     Args:
         level (CCLevel)
     """
-    optional_fields_size = calculate_total_optional_field_byte_size(level.optional_fields)
-    upper_layer_size = len(level.upper_layer)
-    lower_layer_size = len(level.lower_layer)
-    return 14 + upper_layer_size + lower_layer_size + optional_fields_size
+    json_level = {}
+    json_level["number"] = level.level_number
+    json_level["time"] = level.time
+    json_level["chip number"] = level.num_chips
+    json_level["optional fields"] = [field.json_data for field in level.optional_fields]
+    json_level["upper layer"] = make_compact_json_layer(level.upper_layer)
+    json_level["lower layer"] = make_compact_json_layer(level.lower_layer)
+    return json_level
+
 
-def write_field_to_dat(field, writer):
-    """Writes the given field in binary form to the given writer
+def write_levels_to_json(levels, writer, compact=False, json_lines=False):
+    """Writes levels to a JSON document one at a time, without building the whole document in memory
     Args:
-        field (CCField): the field to write
-        writer (BufferedWriter): the active writer in binary write mode
+        levels (iterable of CCLevels): the levels to write
+        writer (TextIOWrapper): the active writer in text write mode
+        compact (bool): optional, write layers as base64 strings of their run length encoded DAT data
+            instead of lists of 1024 ints
+        json_lines (bool): optional, write one level per line instead of a {"levels": [...]} document
+    Returns:
+        The number of levels written
     """
-    byte_data = field.byte_data
-    writer.write(field.type_val.to_bytes(1, BYTE_ORDER))
-    writer.write(len(byte_data).to_bytes(1, BYTE_ORDER))
-    writer.write(byte_data)
+    separators = (",", ":") if compact else None
+    level_count = 0
+    if not json_lines:
+        writer.write('{"levels": [')
+    for level in levels:
+        if compact:
+            json_level = make_compact_json_data_from_level(level)
+        else:
+            json_level = level.json_data
+        if json_lines:
+            writer.write(json.dumps(json_level, separators=separators))
+            writer.write("\n")
+        else:
+            writer.write(",\n" if level_count else "\n")
+            writer.write(json.dumps(json_level, separators=separators))
+        level_count += 1
+    if not json_lines:
+        writer.write("\n]}\n")
+    return level_count
 
-def write_level_to_dat(level, writer):
-    """Writes the given level in binary form to the given writer
+
+def write_cc_data_to_json(cc_dat, json_file, compact=False):
+    """Writes the given CC dat to a JSON file, streaming it one level at a time
+    Files with a .jsonl extension are written as JSON lines, one level per line
     Args:
-        level (CCLevel): the level to write
-        writer (BufferedWriter): the active writer in binary write mode
+        cc_dat (CCDataFile): the cc data to write
+        json_file (string): the filename of the output file
+        compact (bool): optional, write layers as base64 strings of their run length encoded DAT data
     """
-    level_bytes = calculate_level_byte_size(level)
-    writer.write(level_bytes.to_bytes(2, BYTE_ORDER))
-    writer.write(level.level_number.to_bytes(2, BYTE_ORDER))
-    writer.write(level.time.to_bytes(2, BYTE_ORDER))
-    writer.write(level.num_chips.to_bytes(2, BYTE_ORDER))
-    writer.write(b'\x01\x00')  # Write the "map detail" which is always a 2 byte number set to 1
-    write_layer_to_dat(level.upper_layer, writer)
-    write_layer_to_dat(level.lower_layer, writer)
-    total_field_byte_size = calculate_total_optional_field_byte_size(level.optional_fields)
-    writer.write(total_field_byte_size.to_bytes(2, BYTE_ORDER))
-    for field in level.optional_fields:
-        write_field_to_dat(field, writer)
-
-def make_cc_data_from_json(input_json):
-    with open(input_json, "rt") as jsonFile:
-        d = dict()
-        d = json.dumps(jsonFile)
-    jsonFile.write(CC_DAT_HEADER_CODE)
-    jsonFile.write(len(d["levels"]).to_bytes(2, BYTE_ORDER))
-    for level in d["levels"]:
-        write_level_to_dat(level, d)
-
-
-make_cc_data_from_json("level.json")
-
+    json_lines = os.path.splitext(json_file)[1].lower() == JSON_LINES_EXTENSION
+    with open(json_file, "w") as writer:
+        write_levels_to_json(cc_dat.levels, writer, compact, json_lines)
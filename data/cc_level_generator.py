@@ -0,0 +1,230 @@
+"""
+Generates synthetic Chip's Challenge (CC) level packs for load and scale testing
+Created for the class Programming for Game Designers
+
+Levels are seeded-random or laid out from a pattern, with a tunable tile entropy and optional field counts up to the
+limits of the cc_data constructors. A pool of distinct levels is generated and then repeated with new level numbers,
+so very large packs are assembled at the speed of copying bytes. Packs over 65535 levels, more than the 2 byte level
+count of a DAT file can hold, are written as several DAT files
+Usage:
+    python cc_level_generator.py OUTPUT.dat [--levels N] [--seed S] [--entropy E] [--pattern P] [--unique N]
+                                 [--traps N] [--machines N] [--monsters N]
+"""
+import argparse
+import os
+import random
+import sys
+import cc_data
+import cc_dat_utils
+
+MAX_LEVELS_PER_DAT = cc_dat_utils.MAX_LEVEL_COUNT
+MAX_TRAPS = 25
+MAX_MACHINES = 31
+# CCMonsterMovementField accepts 128 monsters, but a field holds at most 255 bytes of data in a DAT file
+MAX_DAT_MONSTERS = 127
+
+FLOOR = 0
+WALL = 1
+# Valid CC tile codes are 0 to 111
+DEFAULT_PALETTE = bytes(range(1, 112))
+PATTERNS = ("random", "border", "checkerboard", "stripes")
+
+
+def make_pattern_layer(pattern):
+    """Returns the base layer of a pattern
+    Args:
+        pattern (string) : one of PATTERNS. "random" is an empty floor
+    """
+    layer = cc_data.CCLayer(32 * 32)
+    for y in range(32):
+        for x in range(32):
+            if pattern == "border":
+                wall = x == 0 or y == 0 or x == 31 or y == 31
+            elif pattern == "checkerboard":
+                wall = (x // 4 + y // 4) % 2 == 1
+            elif pattern == "stripes":
+                wall = y % 4 == 0 and x % 16 != 8
+            else:
+                wall = False
+            if wall:
+                layer[x, y] = WALL
+    return layer
+
+
+def make_random_layer(rng, tile_entropy, pattern="random", palette=DEFAULT_PALETTE):
+    """Returns a layer where about tile_entropy of the tiles are random tiles from the palette
+    Args:
+        rng (random.Random) : the random number generator to use
+        tile_entropy (float) : the fraction of tiles to randomize, from 0 (only the pattern) to 1 (all random)
+        pattern (string) : optional, the base layout, one of PATTERNS
+        palette (bytes) : optional, the tile codes random tiles are picked from
+    """
+    if pattern == "random":
+        # Map random bytes to tiles in one pass: values below the threshold pick a palette tile, the rest are floor
+        threshold = round(tile_entropy * 256)
+        table = bytes(palette[i % len(palette)] if i < threshold else FLOOR for i in range(256))
+        return cc_data.CCLayer(rng.randbytes(32 * 32).translate(table))
+    layer = make_pattern_layer(pattern)
+    for i in rng.sample(range(len(layer)), round(tile_entropy * len(layer))):
+        layer[i] = palette[rng.randrange(len(palette))]
+    return layer
+
+
+def make_random_coords(rng):
+    """Returns a random (x1, y1, x2, y2) coordinate pair"""
+    return rng.randrange(32), rng.randrange(32), rng.randrange(32), rng.randrange(32)
+
+
+def make_random_level(rng, level_number, tile_entropy=0.1, pattern="random", trap_count=MAX_TRAPS,
+                      machine_count=MAX_MACHINES, monster_count=MAX_DAT_MONSTERS):
+    """Returns a random level
+    Args:
+        rng (random.Random) : the random number generator to use
+        level_number (int) : the number of the level
+        tile_entropy (float) : optional, the fraction of random tiles in the upper layer. The lower layer gets a tenth of it
+        pattern (string) : optional, the base layout of the upper layer, one of PATTERNS
+        trap_count (int) : optional, the number of traps, up to 25
+        machine_count (int) : optional, the number of cloning machines, up to 31
+        monster_count (int) : optional, the number of monsters, up to 127 to fit in a DAT file
+    """
+    level = cc_data.CCLevel()
+    level.level_number = level_number
+    level.time = rng.randrange(0, 1000)
+    level.num_chips = rng.randrange(0, 100)
+    level.upper_layer = make_random_layer(rng, tile_entropy, pattern)
+    level.lower_layer = make_random_layer(rng, tile_entropy / 10)
+    level.add_field(cc_data.CCMapTitleField("Generated Level " + str(level_number)))
+    level.add_field(cc_data.CCMapHintField("Seeded " + pattern + " level with tile entropy " + str(tile_entropy)))
+    level.add_field(cc_data.CCEncodedPasswordField([rng.randrange(1, 256) for i in range(rng.randrange(4, 10))]))
+    if trap_count:
+        level.add_field(cc_data.CCTrapControlsField(
+            [cc_data.CCTrapControl(*make_random_coords(rng)) for i in range(trap_count)]))
+    if machine_count:
+        level.add_field(cc_data.CCCloningMachineControlsField(
+            [cc_data.CCCloningMachineControl(*make_random_coords(rng)) for i in range(machine_count)]))
+    if monster_count:
+        level.add_field(cc_data.CCMonsterMovementField(
+            [cc_data.CCCoordinate(rng.randrange(32), rng.randrange(32)) for i in range(monster_count)]))
+    return level
+
+
+def make_template_records(seed=0, unique_levels=1024, **level_options):
+    """Returns the DAT level records of a pool of distinct random levels
+    Args:
+        seed (int) : optional, the random seed. The same arguments always produce the same records
+        unique_levels (int) : optional, the number of distinct levels to generate
+        level_options : optional, keyword arguments passed on to make_random_level
+    """
+    rng = random.Random(seed)
+    return [make_random_level(rng, i + 1, **level_options).to_bytes() for i in range(unique_levels)]
+
+
+def iter_level_records(level_count, templates, first_level_number=1):
+    """Yields level_count DAT level records cycling through the templates, each numbered in sequence
+    Records are yielded as lists of byte pieces which share the template data instead of copying it
+    Args:
+        level_count (int) : the number of records to yield
+        templates (list of bytes) : the template level records, see make_template_records
+        first_level_number (int) : optional, the level number of the first record
+    """
+    views = [memoryview(template) for template in templates]
+    for i in range(level_count):
+        view = views[i % len(views)]
+        # The level number is the 2 byte word after the level size
+        yield [view[0:2], ((first_level_number + i) & 0xFFFF).to_bytes(2, cc_data.BYTE_ORDER), view[4:]]
+
+
+def make_random_cc_data(level_count, seed=0, unique_levels=1024, **level_options):
+    """Returns a CCDataFile of random levels. Any number of levels is allowed
+    Args:
+        level_count (int) : the number of levels
+        seed (int) : optional, the random seed
+        unique_levels (int) : optional, the number of distinct levels to generate and repeat
+        level_options : optional, keyword arguments passed on to make_random_level
+    """
+    templates = make_template_records(seed, min(level_count, unique_levels), **level_options)
+    data = cc_data.CCDataFile()
+    for i in range(level_count):
+        level = cc_dat_utils.make_level_from_buffer(memoryview(templates[i % len(templates)]), 0)[0]
+        level.level_number = (i + 1) & 0xFFFF
+        data.add_level(level)
+    return data
+
+
+def write_records_to_dat(dat_file, level_count, templates, first_level_number=1):
+    """Writes a DAT file of level_count records cycling through the template records"""
+    with open(dat_file, "wb") as writer:
+        writer.write(cc_dat_utils.CC_DAT_HEADER_CODE)
+        writer.write(level_count.to_bytes(2, cc_data.BYTE_ORDER))
+        for pieces in iter_level_records(level_count, templates, first_level_number):
+            writer.writelines(pieces)
+
+
+def write_random_dat(dat_file, level_count, seed=0, unique_levels=1024, **level_options):
+    """Writes a DAT file of random levels
+    Args:
+        dat_file (string) : the filename of the output file
+        level_count (int) : the number of levels, up to 65535
+        seed (int) : optional, the random seed
+        unique_levels (int) : optional, the number of distinct levels to generate and repeat
+        level_options : optional, keyword arguments passed on to make_random_level
+    """
+    if level_count > MAX_LEVELS_PER_DAT:
+        raise ValueError("A DAT file holds at most " + str(MAX_LEVELS_PER_DAT) + " levels, use write_random_dat_files")
+    templates = make_template_records(seed, min(level_count, unique_levels), **level_options)
+    write_records_to_dat(dat_file, level_count, templates)
+
+
+def write_random_dat_files(base_filename, level_count, levels_per_file=MAX_LEVELS_PER_DAT, seed=0,
+                           unique_levels=1024, **level_options):
+    """Writes a pack of any size as numbered DAT files of at most levels_per_file levels each
+    Args:
+        base_filename (string) : the output filename, "pack.dat" is written as "pack_0000.dat", "pack_0001.dat", ...
+        level_count (int) : the total number of levels
+        levels_per_file (int) : optional, the max number of levels in each file, up to 65535
+        seed (int) : optional, the random seed
+        unique_levels (int) : optional, the number of distinct levels to generate and repeat
+        level_options : optional, keyword arguments passed on to make_random_level
+    Returns:
+        The list of filenames written
+    """
+    levels_per_file = min(levels_per_file, MAX_LEVELS_PER_DAT)
+    templates = make_template_records(seed, min(level_count, unique_levels), **level_options)
+    base, extension = os.path.splitext(base_filename)
+    filenames = []
+    for start in range(0, level_count, levels_per_file):
+        dat_file = base + "_{0:04d}".format(len(filenames)) + (extension or ".dat")
+        # Each file continues through the templates where the previous one stopped, numbered from 1
+        rotated = templates[start % len(templates):] + templates[:start % len(templates)]
+        write_records_to_dat(dat_file, min(levels_per_file, level_count - start), rotated)
+        filenames.append(dat_file)
+    return filenames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic Chip's Challenge level packs")
+    parser.add_argument("output", help="DAT file to write. Packs over 65535 levels are split into numbered files")
+    parser.add_argument("--levels", type=int, default=149, help="number of levels")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--entropy", type=float, default=0.1, help="fraction of random tiles, from 0 to 1")
+    parser.add_argument("--pattern", choices=PATTERNS, default="random", help="base layout of each level")
+    parser.add_argument("--unique", type=int, default=1024, help="number of distinct levels to repeat")
+    parser.add_argument("--traps", type=int, default=MAX_TRAPS, help="traps per level (max 25)")
+    parser.add_argument("--machines", type=int, default=MAX_MACHINES, help="cloning machines per level (max 31)")
+    parser.add_argument("--monsters", type=int, default=MAX_DAT_MONSTERS, help="monsters per level (max 127)")
+    args = parser.parse_args(argv)
+
+    level_options = {"tile_entropy": args.entropy, "pattern": args.pattern, "trap_count": args.traps,
+                     "machine_count": args.machines, "monster_count": args.monsters}
+    if args.levels > MAX_LEVELS_PER_DAT:
+        filenames = write_random_dat_files(args.output, args.levels, seed=args.seed, unique_levels=args.unique,
+                                           **level_options)
+        print("Wrote " + str(args.levels) + " levels to " + str(len(filenames)) + " files")
+    else:
+        write_random_dat(args.output, args.levels, args.seed, args.unique, **level_options)
+        print("Wrote " + str(args.levels) + " levels to " + args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""
+A columnar, NumPy-backed store of Chip's Challenge (CC) levels for analytics across whole packs
+Created for the class Programming for Game Designers
+
+The layers of every level are held as (N, 32, 32) uint8 arrays indexed [level, y, x], next to arrays of the level
+numbers, time limits and chip counts. The optional fields of each level are kept as their DAT binary data,
+concatenated into one array with an offsets array, and are only decoded when a level is turned back into a CCLevel.
+A store is filled straight from DAT data and can be saved as a .npz file, or as a .npy file of the layers
+that is memory-mapped when loaded next to a small .npz of the columns
+Usage:
+    store = cc_level_store.make_level_store_from_dat("pack.dat")
+    walls_per_level = (store.upper_layers == 1).sum(axis=(1, 2))
+    store.save_npy("pack")
+    store = cc_level_store.make_level_store_from_npy("pack")
+"""
+import numpy
+import cc_data
+import cc_dat_utils
+
+LAYERS_NPY_EXTENSION = ".layers.npy"
+COLUMNS_NPZ_EXTENSION = ".columns.npz"
+LAYER_TILE_COUNT = cc_data.CCLayer.WIDTH * cc_data.CCLayer.HEIGHT
+COLUMN_NAMES = ("level_numbers", "times", "chip_counts", "field_data", "field_offsets")
+
+
+class CCLevelStore:
+    """The levels of a pack as NumPy arrays
+    Member vars:
+        layers (numpy array): all the layers as a (2, N, 32, 32) uint8 array, upper layers first
+        upper_layers (numpy array): the (N, 32, 32) upper layers, a view of layers
+        lower_layers (numpy array): the (N, 32, 32) lower layers, a view of layers
+        level_numbers, times, chip_counts (numpy array): the (N,) uint16 level numbers, time limits and chip counts
+        field_data (numpy array): the uint8 optional fields sections of every level in DAT form, one after another.
+            Each section starts with its 2 byte size, see cc_dat_utils.make_optional_fields_from_buffer
+        field_offsets (numpy array): the (N + 1,) int64 offsets of each level's section in field_data
+    """
+
+    def __init__(self, layers, level_numbers, times, chip_counts, field_data, field_offsets):
+        self.layers = layers
+        self.upper_layers = layers[0]
+        self.lower_layers = layers[1]
+        self.level_numbers = level_numbers
+        self.times = times
+        self.chip_counts = chip_counts
+        self.field_data = field_data
+        self.field_offsets = field_offsets
+
+    def __len__(self):
+        return len(self.level_numbers)
+
+    @property
+    def level_count(self):
+        return len(self.level_numbers)
+
+    def __getitem__(self, index):
+        return self.make_level(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.make_level(i)
+
+    def make_optional_fields(self, index):
+        """Decodes the optional fields of the level at the given index
+        Returns:
+            A list of CCFields
+        """
+        field_view = memoryview(self.field_data)
+        return cc_dat_utils.make_optional_fields_from_buffer(field_view, int(self.field_offsets[index]))[0]
+
+    def make_level(self, index):
+        """Constructs a CCLevel from the level at the given index
+        Note: the level holds copies of the store data, changing it does not change the store
+        """
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("level index out of range")
+        level = cc_data.CCLevel()
+        level.level_number = int(self.level_numbers[index])
+        level.time = int(self.times[index])
+        level.num_chips = int(self.chip_counts[index])
+        level.upper_layer = cc_data.CCLayer(self.upper_layers[index].tobytes())
+        level.lower_layer = cc_data.CCLayer(self.lower_layers[index].tobytes())
+        level.optional_fields = self.make_optional_fields(index)
+        return level
+
+    def to_cc_data(self):
+        """Returns a CCDataFile holding a CCLevel for every level in the store"""
+        data = cc_data.CCDataFile()
+        for level in self:
+            data.add_level(level)
+        return data
+
+    def save_npz(self, npz_file, compressed=True):
+        """Saves the store as a single .npz file
+        Args:
+            npz_file (string) : the filename of the output file
+            compressed (bool) : optional, set to False to store the arrays without zip compression
+        """
+        save = numpy.savez_compressed if compressed else numpy.savez
+        save(npz_file, layers=self.layers, **{name: getattr(self, name) for name in COLUMN_NAMES})
+
+    def save_npy(self, base_filename):
+        """Saves the store as a .npy file of the layers and a .npz file of the other columns
+        The layers file can be memory-mapped by make_level_store_from_npy
+        Args:
+            base_filename (string) : the filename without extension, "pack" is saved as "pack.layers.npy"
+                and "pack.columns.npz"
+        """
+        numpy.save(base_filename + LAYERS_NPY_EXTENSION, self.layers)
+        numpy.savez(base_filename + COLUMNS_NPZ_EXTENSION, **{name: getattr(self, name) for name in COLUMN_NAMES})
+
+
+def make_empty_level_store(level_count, field_byte_count=0):
+    """Returns a CCLevelStore of zeroed arrays for level_count levels and field_byte_count bytes of field data"""
+    return CCLevelStore(numpy.zeros((2, level_count, cc_data.CCLayer.HEIGHT, cc_data.CCLayer.WIDTH), numpy.uint8),
+                        numpy.zeros(level_count, numpy.uint16), numpy.zeros(level_count, numpy.uint16),
+                        numpy.zeros(level_count, numpy.uint16), numpy.zeros(field_byte_count, numpy.uint8),
+                        numpy.zeros(level_count + 1, numpy.int64))
+
+
+def make_layer_tiles(layer_bytes, level_number):
+    """Returns the tiles of a layer as a uint8 array of WIDTH * HEIGHT tiles, ready to copy into a store
+    Args:
+        layer_bytes (bytes-like object) : the decoded layer data, one byte per tile
+        level_number (int) : the number of the level the layer belongs to, for the error message
+    """
+    tiles = numpy.frombuffer(layer_bytes, numpy.uint8)
+    if len(tiles) != LAYER_TILE_COUNT:
+        raise ValueError("Level " + str(level_number) + " has a layer of " + str(len(tiles)) + " tiles instead of "
+                         + str(LAYER_TILE_COUNT))
+    return tiles
+
+
+def make_level_store_from_buffer(buffer, stats=None):
+    """Constructs a CCLevelStore from DAT file data held in memory
+    Layers are decoded straight into the store arrays and the optional fields sections are copied without decoding them
+    This code assumes valid DAT data and only checks that every layer decodes to WIDTH * HEIGHT tiles
+    Args:
+        buffer (bytes-like object) : the complete contents of a DAT file
+        stats (CCParseStats) : optional, collects layer decoding instrumentation
+    Returns:
+        A CCLevelStore of the levels in the buffer, or None if the DAT header is invalid
+    """
+    with memoryview(buffer) as view:
+        offsets = cc_dat_utils.make_level_offsets_from_buffer(view)
+        if offsets is None:
+            return
+        store = make_empty_level_store(len(offsets))
+        upper_tiles = store.upper_layers.reshape(len(offsets), LAYER_TILE_COUNT)
+        lower_tiles = store.lower_layers.reshape(len(offsets), LAYER_TILE_COUNT)
+        field_sections = []
+        field_offset = 0
+        for i, offset in enumerate(offsets):
+            (level_byte_count, store.level_numbers[i], store.times[i], store.chip_counts[i],
+             map_detail, upper_layer_byte_count) = cc_dat_utils.LEVEL_HEADER_STRUCT.unpack_from(view, offset)
+            offset += cc_dat_utils.LEVEL_HEADER_STRUCT.size
+            upper_layer = cc_dat_utils.make_layer_from_bytes(view[offset:(offset + upper_layer_byte_count)], stats)
+            upper_tiles[i] = make_layer_tiles(upper_layer, store.level_numbers[i])
+            offset += upper_layer_byte_count
+            lower_layer_byte_count = cc_dat_utils.WORD_STRUCT.unpack_from(view, offset)[0]
+            offset += 2
+            lower_layer = cc_dat_utils.make_layer_from_bytes(view[offset:(offset + lower_layer_byte_count)], stats)
+            lower_tiles[i] = make_layer_tiles(lower_layer, store.level_numbers[i])
+            offset += lower_layer_byte_count
+            field_section_end = offset + 2 + cc_dat_utils.WORD_STRUCT.unpack_from(view, offset)[0]
+            field_sections.append(view[offset:field_section_end])
+            store.field_offsets[i] = field_offset
+            field_offset += field_section_end - offset
+        store.field_offsets[len(offsets)] = field_offset
+        store.field_data = numpy.frombuffer(b"".join(field_sections), numpy.uint8)
+    return store
+
+
+def make_level_store_from_dat(dat_file, stats=None):
+    """Reads a DAT file into a CCLevelStore, see make_level_store_from_buffer
+    Args:
+        dat_file (string) : the filename of the DAT file to read in
+        stats (CCParseStats) : optional, collects layer decoding instrumentation
+    """
+    with open(dat_file, 'rb') as reader:
+        return make_level_store_from_buffer(reader.read(), stats)
+
+
+def make_level_store_from_cc_data(cc_dat):
+    """Constructs a CCLevelStore holding the levels of a CCDataFile
+    Raises ValueError for a layer that is not WIDTH * HEIGHT tiles, such as the small layers of level.json
+    Args:
+        cc_dat (CCDataFile) : the cc data to store
+    """
+    store = make_empty_level_store(cc_dat.level_count)
+    upper_tiles = store.upper_layers.reshape(cc_dat.level_count, LAYER_TILE_COUNT)
+    lower_tiles = store.lower_layers.reshape(cc_dat.level_count, LAYER_TILE_COUNT)
+    field_sections = bytearray()
+    for i, level in enumerate(cc_dat.levels):
+        store.level_numbers[i] = level.level_number
+        store.times[i] = level.time
+        store.chip_counts[i] = level.num_chips
+        upper_tiles[i] = make_layer_tiles(cc_dat_utils.get_layer_bytes(level.upper_layer), level.level_number)
+        lower_tiles[i] = make_layer_tiles(cc_dat_utils.get_layer_bytes(level.lower_layer), level.level_number)
+        store.field_offsets[i] = len(field_sections)
+        field_sections += cc_dat_utils.calculate_total_optional_field_byte_size(level.optional_fields).to_bytes(
+            2, cc_data.BYTE_ORDER)
+        for field in level.optional_fields:
+            byte_data = field.byte_data
+            field_sections += cc_dat_utils.FIELD_HEADER_STRUCT.pack(field.type_val, len(byte_data))
+            field_sections += byte_data
+    store.field_offsets[cc_dat.level_count] = len(field_sections)
+    store.field_data = numpy.frombuffer(bytes(field_sections), numpy.uint8)
+    return store
+
+
+def make_level_store_from_npz(npz_file):
+    """Loads a CCLevelStore saved with CCLevelStore.save_npz
+    Args:
+        npz_file (string) : the filename of the .npz file
+    """
+    with numpy.load(npz_file) as arrays:
+        return CCLevelStore(arrays["layers"], *[arrays[name] for name in COLUMN_NAMES])
+
+
+def make_level_store_from_npy(base_filename, use_mmap=True):
+    """Loads a CCLevelStore saved with CCLevelStore.save_npy
+    Args:
+        base_filename (string) : the filename without extension passed to save_npy
+        use_mmap (bool) : optional, memory-map the layers read-only instead of reading them into memory.
+            Only the layers that are accessed are then read from disk
+    """
+    layers = numpy.load(base_filename + LAYERS_NPY_EXTENSION, mmap_mode="r" if use_mmap else None)
+    with numpy.load(base_filename + COLUMNS_NPZ_EXTENSION) as arrays:
+        return CCLevelStore(layers, *[arrays[name] for name in COLUMN_NAMES])
@@ -0,0 +1,205 @@
+"""
+An inverted index of the tiles of a Chip's Challenge (CC) level pack
+Created for the class Programming for Game Designers
+
+For each layer and tile code the index keeps an int used as a bitset of the 1024 positions (y * 32 + x) the tile is at
+in each level holding it, and an int bitset of those levels. Queries such as "every level with a
+teleport" or "every fire tile" are then a few big int operations instead of a scan over every tile of every level.
+Bitsets are built by translating a layer to a string of "0" and "1" characters and parsing it with int(..., 2)
+Usage:
+    index = cc_tile_index.make_tile_index_from_dat("pack.dat")
+    teleport_levels = index.find_levels(TELEPORT)
+    for level_index, layer, x, y in index.iter_tiles(FIRE): ...
+"""
+import cc_data
+import cc_dat_utils
+
+UPPER_LAYER = 0
+LOWER_LAYER = 1
+LAYERS = (UPPER_LAYER, LOWER_LAYER)
+TILE_COUNT = 256  # tiles are single bytes, valid CC tile codes are 0 to 111
+# TILE_BIT_TABLES[tile] translates a layer to b"1" where it holds tile and b"0" everywhere else
+TILE_BIT_TABLES = [bytes(ord("1") if code == tile else ord("0") for code in range(256)) for tile in range(TILE_COUNT)]
+
+
+def make_tile_bitsets(layer):
+    """Returns a dictionary of tile code to the int bitset of the positions the tile is at in the layer
+    Bit y * 32 + x of a bitset is set if the tile is at (x, y)
+    Args:
+        layer (CCLayer or bytes-like object) : the 1024 tiles of a layer
+    """
+    # int(..., 2) reads the first character as the highest bit, so the layer is reversed to put position 0 at bit 0
+    reversed_layer = bytes(layer)[::-1]
+    return {tile: int(reversed_layer.translate(TILE_BIT_TABLES[tile]), 2) for tile in set(reversed_layer)}
+
+
+def iter_bits(bits):
+    """Yields the index of every set bit of an int, lowest first"""
+    while bits:
+        low_bit = bits & -bits
+        yield low_bit.bit_length() - 1
+        bits ^= low_bit
+
+
+class CCTileIndex:
+    """An inverted index from tile codes to the levels and positions holding them
+    Levels are identified by their index in the pack, in the order they were added
+    Member vars:
+        level_numbers (list of ints): the level_number of each indexed level, None for a cleared level
+        level_tiles (list of 2 lists of sets): level_tiles[level_index][layer] is the set of tile codes in that layer
+        tile_positions (list of 2 lists of dicts): tile_positions[layer][tile][level_index] is the bitset of the
+            positions of tile in that layer of the level
+        tile_levels (list of 2 lists of ints): tile_levels[layer][tile] is the bitset of the levels holding tile in
+            layer, or None until it is next queried. It is rebuilt from tile_positions after the tile is edited
+    """
+
+    def __init__(self):
+        self.level_numbers = []
+        self.level_tiles = []
+        self.tile_positions = [[{} for tile in range(TILE_COUNT)] for layer in LAYERS]
+        self.tile_levels = [[None] * TILE_COUNT for layer in LAYERS]
+
+    @property
+    def level_count(self):
+        return len(self.level_numbers)
+
+    def add_level(self, level):
+        """Indexes a level as the next level of the pack
+        Returns:
+            The index of the level
+        """
+        self.level_numbers.append(None)
+        self.level_tiles.append([set(), set()])
+        level_index = len(self.level_numbers) - 1
+        self.update_level(level_index, level)
+        return level_index
+
+    def clear_level(self, level_index):
+        """Removes every tile of a level from the index, the level keeps its index"""
+        for layer in LAYERS:
+            tile_positions = self.tile_positions[layer]
+            tile_levels = self.tile_levels[layer]
+            for tile in self.level_tiles[level_index][layer]:
+                del tile_positions[tile][level_index]
+                tile_levels[tile] = None
+            self.level_tiles[level_index][layer] = set()
+        self.level_numbers[level_index] = None
+
+    def update_level(self, level_index, level):
+        """Re-indexes a level after it was edited, or indexes a level in place of a cleared one
+        Args:
+            level_index (int) : the index of the level in the pack
+            level (CCLevel) : the level data
+        """
+        self.clear_level(level_index)
+        for layer, layer_data in ((UPPER_LAYER, level.upper_layer), (LOWER_LAYER, level.lower_layer)):
+            tile_positions = self.tile_positions[layer]
+            tile_levels = self.tile_levels[layer]
+            tile_bitsets = make_tile_bitsets(cc_dat_utils.get_layer_bytes(layer_data))
+            for tile, bits in tile_bitsets.items():
+                tile_positions[tile][level_index] = bits
+                tile_levels[tile] = None
+            self.level_tiles[level_index][layer] = set(tile_bitsets)
+        self.level_numbers[level_index] = level.level_number
+
+    def update_tile(self, level_index, layer, x, y, old_tile, new_tile):
+        """Updates the index for a single tile edit, without re-indexing the level
+        Args:
+            level_index (int) : the index of the edited level
+            layer (int) : UPPER_LAYER or LOWER_LAYER
+            x, y (int, int) : the position of the tile
+            old_tile, new_tile (int, int) : the tile code before and after the edit
+        """
+        if old_tile == new_tile:
+            return
+        position_bit = 1 << (y * cc_data.CCLayer.WIDTH + x)
+        tile_positions = self.tile_positions[layer]
+        layer_tiles = self.level_tiles[level_index][layer]
+        bits = tile_positions[old_tile].get(level_index, 0) & ~position_bit
+        if bits:
+            tile_positions[old_tile][level_index] = bits
+        elif old_tile in layer_tiles:
+            del tile_positions[old_tile][level_index]
+            layer_tiles.discard(old_tile)
+            self.tile_levels[layer][old_tile] = None
+        if new_tile not in layer_tiles:
+            layer_tiles.add(new_tile)
+            self.tile_levels[layer][new_tile] = None
+        tile_positions[new_tile][level_index] = tile_positions[new_tile].get(level_index, 0) | position_bit
+
+    def get_layer_level_bits(self, tile, layer):
+        """Returns the bitset of the levels holding tile in a layer, rebuilding it if the tile was edited"""
+        bits = self.tile_levels[layer][tile]
+        if bits is None:
+            # Set the bits in a bytearray and convert it once, setting them one at a time in an int would copy it each time
+            bitmap = bytearray((len(self.level_numbers) + 7) // 8)
+            for level_index in self.tile_positions[layer][tile]:
+                bitmap[level_index >> 3] |= 1 << (level_index & 7)
+            bits = int.from_bytes(bitmap, "little")
+            self.tile_levels[layer][tile] = bits
+        return bits
+
+    def get_level_bits(self, tile, layer=None):
+        """Returns the bitset of the levels holding tile, in the given layer or in either layer"""
+        if layer is None:
+            return self.get_layer_level_bits(tile, UPPER_LAYER) | self.get_layer_level_bits(tile, LOWER_LAYER)
+        return self.get_layer_level_bits(tile, layer)
+
+    def find_levels(self, tile, layer=None):
+        """Returns the sorted list of the indices of the levels holding tile
+        Args:
+            tile (int) : the tile code to look for
+            layer (int) : optional, UPPER_LAYER or LOWER_LAYER. Defaults to both layers
+        """
+        return list(iter_bits(self.get_level_bits(tile, layer)))
+
+    def find_levels_with_all(self, tiles, layer=None):
+        """Returns the sorted list of the indices of the levels holding every one of the given tiles"""
+        bits = (1 << len(self.level_numbers)) - 1
+        for tile in tiles:
+            bits &= self.get_level_bits(tile, layer)
+        return list(iter_bits(bits))
+
+    def find_levels_with_any(self, tiles, layer=None):
+        """Returns the sorted list of the indices of the levels holding at least one of the given tiles"""
+        bits = 0
+        for tile in tiles:
+            bits |= self.get_level_bits(tile, layer)
+        return list(iter_bits(bits))
+
+    def find_positions(self, tile, level_index, layer=UPPER_LAYER):
+        """Returns the list of (x, y) positions of tile in a layer of a level"""
+        bits = self.tile_positions[layer][tile].get(level_index, 0)
+        return [(position % cc_data.CCLayer.WIDTH, position // cc_data.CCLayer.WIDTH) for position in iter_bits(bits)]
+
+    def iter_tiles(self, tile, layer=None):
+        """Yields a (level index, layer, x, y) tuple for every occurrence of tile in the pack, in level order"""
+        layers = LAYERS if layer is None else (layer,)
+        for level_index in iter_bits(self.get_level_bits(tile, layer)):
+            for tile_layer in layers:
+                for x, y in self.find_positions(tile, level_index, tile_layer):
+                    yield level_index, tile_layer, x, y
+
+    def count_tile(self, tile, layer=None):
+        """Returns the number of times tile occurs across the whole pack"""
+        layers = LAYERS if layer is None else (layer,)
+        return sum(bits.bit_count() for tile_layer in layers for bits in self.tile_positions[tile_layer][tile].values())
+
+
+def make_tile_index(levels):
+    """Returns a CCTileIndex of the given levels
+    Args:
+        levels (iterable of CCLevels) : the levels of the pack, in order
+    """
+    index = CCTileIndex()
+    for level in levels:
+        index.add_level(level)
+    return index
+
+
+def make_tile_index_from_dat(source):
+    """Returns a CCTileIndex of a DAT file, built while the file is parsed without keeping its levels
+    Args:
+        source (string, binary file object or bytes-like object) : the DAT file to index, see cc_dat_utils.iter_levels
+    """
+    return make_tile_index(cc_dat_utils.iter_levels(source))
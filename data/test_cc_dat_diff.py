@@ -0,0 +1,100 @@
+"""
+Tests for the level by level DAT diffs and patches of cc_dat_diff
+Run with: python -m pytest data (or python -m unittest from the data directory)
+"""
+import random
+import unittest
+import cc_data
+import cc_dat_diff
+import cc_dat_utils
+import cc_level_generator
+
+
+def make_test_pack_bytes(level_count=40, seed=0):
+    cc_dat = cc_level_generator.make_random_cc_data(level_count, seed, unique_levels=level_count, tile_entropy=0.2,
+                                                    trap_count=3, machine_count=3, monster_count=8)
+    return bytes(cc_dat_utils.make_bytes_from_cc_data(cc_dat))
+
+
+class TestDatDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.old_bytes = make_test_pack_bytes()
+        self.new_cc_dat = cc_dat_utils.make_cc_data_from_buffer(self.old_bytes)
+        self.rng = random.Random(1)
+
+    def check_patch(self):
+        """Diffs the old pack against new_cc_dat and checks that the patch rebuilds the new DAT data exactly"""
+        new_bytes = bytes(cc_dat_utils.make_bytes_from_cc_data(self.new_cc_dat))
+        for dat_diff in (cc_dat_diff.make_dat_diff_from_buffer(self.old_bytes, new_bytes),
+                         cc_dat_diff.make_dat_diff(cc_dat_utils.make_cc_data_from_buffer(self.old_bytes),
+                                                   self.new_cc_dat)):
+            patch_bytes = dat_diff.make_patch_bytes()
+            self.assertEqual(bytes(cc_dat_diff.apply_patch_to_buffer(self.old_bytes, patch_bytes)), new_bytes)
+        return dat_diff
+
+    def edit_level(self, level):
+        level.time = (level.time + 7) % 1000
+        for i in range(20):
+            level.upper_layer[self.rng.randrange(32), self.rng.randrange(32)] = self.rng.randrange(100)
+        level.lower_layer[3, 4] = 1
+        level.optional_fields[0].title = "Edited " + str(level.level_number)
+
+    def test_unchanged_pack(self):
+        dat_diff = self.check_patch()
+        self.assertEqual(dat_diff.op_count(cc_dat_diff.OP_PATCH), 0)
+        self.assertEqual(dat_diff.op_count(cc_dat_diff.OP_RECORD), 0)
+
+    def test_edits(self):
+        for index in (0, 5, 39):
+            self.edit_level(self.new_cc_dat.levels[index])
+        dat_diff = self.check_patch()
+        self.assertEqual(dat_diff.op_count(cc_dat_diff.OP_PATCH), 3)
+
+    def test_inserts(self):
+        extra = cc_dat_utils.make_cc_data_from_buffer(make_test_pack_bytes(3, seed=9))
+        self.new_cc_dat.levels[10:10] = extra.levels[:2]
+        self.new_cc_dat.levels.insert(0, extra.levels[2])
+        self.check_patch()
+
+    def test_deletes(self):
+        del self.new_cc_dat.levels[30:35]
+        del self.new_cc_dat.levels[0]
+        self.check_patch()
+
+    def test_moves(self):
+        levels = self.new_cc_dat.levels
+        levels[5], levels[20] = levels[20], levels[5]
+        levels.append(levels.pop(0))
+        dat_diff = self.check_patch()
+        self.assertEqual(dat_diff.op_count(cc_dat_diff.OP_RECORD), 0)
+
+    def test_field_changes(self):
+        levels = self.new_cc_dat.levels
+        levels[2].optional_fields.reverse()
+        levels[3].optional_fields.pop()
+        levels[4].optional_fields.append(cc_data.CCMapHintField("A new hint"))
+        levels[6].optional_fields[0].title = "Renamed"
+        dat_diff = self.check_patch()
+        self.assertIn("field order", str(dat_diff))
+
+    def test_mixed_changes(self):
+        extra = cc_dat_utils.make_cc_data_from_buffer(make_test_pack_bytes(4, seed=5))
+        levels = self.new_cc_dat.levels
+        for index in range(0, 40, 3):
+            self.edit_level(levels[index])
+        del levels[7:9]
+        levels[20:20] = extra.levels
+        levels.append(levels.pop(11))
+        self.check_patch()
+
+    def test_wrong_old_data(self):
+        self.edit_level(self.new_cc_dat.levels[1])
+        new_bytes = bytes(cc_dat_utils.make_bytes_from_cc_data(self.new_cc_dat))
+        patch_bytes = cc_dat_diff.make_dat_diff_from_buffer(self.old_bytes, new_bytes).make_patch_bytes()
+        with self.assertRaises(ValueError):
+            cc_dat_diff.apply_patch_to_buffer(new_bytes, patch_bytes)
+
+
+if __name__ == "__main__":
+    unittest.main()
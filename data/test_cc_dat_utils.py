@@ -0,0 +1,86 @@
+"""
+Tests for the Run Length Encoding of layers in cc_dat_utils
+Run with: python -m pytest data (or python -m unittest from the data directory)
+"""
+import random
+import unittest
+import cc_dat_utils
+
+
+def make_optimal_encoded_size(layer_bytes):
+    """Returns the smallest possible RLE size of the layer, found by dynamic programming over every encoding
+    Each tile is either written as itself, unless it is RLE_CODE_INT, or is part of a run chunk of 1 to
+    RLE_MAX_COPIES equal tiles written in 3 bytes
+    """
+    sizes = [0] * (len(layer_bytes) + 1)
+    for end in range(1, len(layer_bytes) + 1):
+        best = sizes[end - 1] + 1 if layer_bytes[end - 1] != cc_dat_utils.RLE_CODE_INT else len(layer_bytes) * 3
+        start = end - 1
+        while start >= 0 and end - start <= cc_dat_utils.RLE_MAX_COPIES and layer_bytes[start] == layer_bytes[end - 1]:
+            best = min(best, sizes[start] + 3)
+            start -= 1
+        sizes[end] = best
+    return sizes[-1]
+
+
+def make_random_layer(rng, tile_count=1024):
+    """Returns random layer bytes with runs of every length, including runs of RLE_CODE_INT"""
+    tiles = bytearray()
+    values = rng.choice(([0, 255], [0, 1, 255], list(range(256))))
+    while len(tiles) < tile_count:
+        run_length = rng.choice((1, 1, 2, 3, 4, 5, rng.randrange(1, 600)))
+        tiles += bytes((rng.choice(values),)) * run_length
+    return bytes(tiles[:tile_count])
+
+
+class TestLayerRLE(unittest.TestCase):
+
+    def check_layer(self, layer_bytes):
+        encoded = cc_dat_utils.make_bytes_from_layer(layer_bytes)
+        self.assertEqual(bytes(cc_dat_utils.make_layer_from_bytes(encoded)), layer_bytes)
+        self.assertEqual(len(encoded), make_optimal_encoded_size(layer_bytes))
+
+    def test_uniform_layers(self):
+        for value in (0, 1, 255):
+            self.check_layer(bytes((value,)) * 1024)
+
+    def test_run_lengths(self):
+        # Runs on either side of the 4 tile break-even point and of the RLE_MAX_COPIES chunk size
+        for value in (0, 7, 255):
+            for run_length in (1, 2, 3, 4, 5, 254, 255, 256, 258, 259, 510, 511):
+                self.check_layer(b"\x01" + bytes((value,)) * run_length + b"\x02")
+
+    def test_random_layers(self):
+        rng = random.Random(3)
+        for i in range(200):
+            self.check_layer(make_random_layer(rng, rng.choice((1, 5, 300, 1024))))
+
+    def test_layer_types(self):
+        layer_bytes = make_random_layer(random.Random(5))
+        encoded = cc_dat_utils.make_bytes_from_layer(layer_bytes)
+        self.assertEqual(cc_dat_utils.make_bytes_from_layer(list(layer_bytes)), encoded)
+        self.assertEqual(cc_dat_utils.make_bytes_from_layer(cc_dat_utils.make_layer_from_bytes(encoded)), encoded)
+
+    def test_empty_layer(self):
+        self.assertEqual(cc_dat_utils.make_bytes_from_layer(b""), b"")
+
+    def test_without_rle(self):
+        layer_bytes = make_random_layer(random.Random(7))
+        self.assertEqual(bytes(cc_dat_utils.make_bytes_from_layer(layer_bytes, use_rle=False)), layer_bytes)
+
+
+class TestLayerBatchDecode(unittest.TestCase):
+
+    def test_matches_single_layer_decode(self):
+        rng = random.Random(11)
+        encoded = [cc_dat_utils.make_bytes_from_layer(make_random_layer(rng, rng.choice((0, 1, 5, 300, 1024))))
+                   for i in range(100)]
+        layers = cc_dat_utils.make_layers_from_bytes(memoryview(layer_bytes) for layer_bytes in encoded)
+        self.assertEqual(layers, [cc_dat_utils.make_layer_from_bytes(layer_bytes) for layer_bytes in encoded])
+
+    def test_no_layers(self):
+        self.assertEqual(cc_dat_utils.make_layers_from_bytes([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Tests for the Chip's Challenge (CC) data structures in cc_data
+Run with: python -m pytest data (or python -m unittest from the data directory)
+"""
+import os
+import unittest
+import cc_data
+import cc_dat_utils
+
+TEST_DAT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pfgd_test.dat")
+
+
+def load_test_dat_bytes():
+    with open(TEST_DAT_FILE, "rb") as reader:
+        return reader.read()
+
+
+class TestCCFieldLists(unittest.TestCase):
+
+    def test_assigned_list_is_copied(self):
+        monsters = [cc_data.CCCoordinate(1, 2)]
+        field = cc_data.CCMonsterMovementField(monsters)
+        monsters.append(cc_data.CCCoordinate(3, 4))
+        self.assertEqual(len(field.monsters), 1)
+        self.assertIsInstance(field.monsters, cc_data.CCTrackedList)
+
+    def test_own_list_is_kept(self):
+        field = cc_data.CCMonsterMovementField([cc_data.CCCoordinate(1, 2)])
+        monsters = field.monsters
+        field.mark_clean()
+        field.monsters += [cc_data.CCCoordinate(3, 4)]
+        self.assertIs(field.monsters, monsters)
+        self.assertEqual(len(field.monsters), 2)
+        self.assertTrue(field.dirty)
+
+    def test_list_of_another_field_is_copied(self):
+        first = cc_data.CCMonsterMovementField([cc_data.CCCoordinate(1, 2)])
+        second = cc_data.CCMonsterMovementField(first.monsters)
+        self.assertIsNot(second.monsters, first.monsters)
+        first.mark_clean()
+        second.mark_clean()
+        first.monsters.append(cc_data.CCCoordinate(3, 4))
+        self.assertTrue(first.dirty)
+        self.assertFalse(second.dirty)
+
+
+class TestCCLevelDirtyTracking(unittest.TestCase):
+
+    def setUp(self):
+        self.dat_bytes = load_test_dat_bytes()
+        self.cc_dat = cc_dat_utils.make_cc_data_from_buffer(self.dat_bytes)
+        self.level = self.cc_dat.levels[0]
+
+    def test_decoded_level_is_clean(self):
+        self.assertFalse(self.level.dirty)
+        self.assertFalse(self.level.upper_layer.dirty)
+        for field in self.level.optional_fields:
+            self.assertFalse(field.dirty)
+
+    def test_new_level_is_dirty(self):
+        self.assertTrue(cc_data.CCLevel().dirty)
+
+    def test_clean_level_copies_raw_record(self):
+        self.assertEqual(cc_dat_utils.make_bytes_from_level(self.level), bytes(self.level.raw_record))
+        self.assertEqual(bytes(cc_dat_utils.make_bytes_from_cc_data(self.cc_dat)), self.dat_bytes)
+
+    def test_clean_level_saves_its_record_not_its_objects(self):
+        # Changing a layer without the tracked methods is not seen, so the raw record is what gets saved
+        bytearray.__setitem__(self.level.upper_layer, 0, 1)
+        self.assertFalse(self.level.dirty)
+        self.assertEqual(cc_dat_utils.make_bytes_from_level(self.level), bytes(self.level.raw_record))
+
+    def test_header_change_marks_dirty(self):
+        self.level.time = self.level.time + 1
+        self.assertTrue(self.level.dirty)
+
+    def test_layer_change_marks_dirty(self):
+        self.level.upper_layer[0, 0] = 1
+        self.assertTrue(self.level.upper_layer.dirty)
+        self.assertTrue(self.level.dirty)
+
+    def test_field_attribute_change_marks_dirty(self):
+        field = self.level.optional_fields[0]
+        field.title = "Changed"
+        self.assertTrue(field.dirty)
+        self.assertIsNone(field.byte_cache)
+        self.assertTrue(self.level.dirty)
+
+    def test_tracked_list_changes_mark_dirty(self):
+        self.level.optional_fields.append(cc_data.CCMapHintField("Hint"))
+        self.assertTrue(self.level.dirty)
+
+    def test_field_list_change_marks_dirty(self):
+        field = cc_data.CCMonsterMovementField([cc_data.CCCoordinate(1, 2)])
+        self.level.optional_fields.append(field)
+        record = cc_dat_utils.make_bytes_from_level(self.level)
+        self.level.mark_clean(record)
+        self.assertFalse(self.level.dirty)
+        field.monsters.append(cc_data.CCCoordinate(3, 4))
+        self.assertTrue(field.dirty)
+        self.assertTrue(self.level.dirty)
+        self.assertEqual(len(field.byte_data), 4)
+
+    def test_mark_clean_clears_every_flag(self):
+        self.level.time = 10
+        self.level.lower_layer[5] = 2
+        self.level.optional_fields[0].title = "Changed"
+        record = cc_dat_utils.make_bytes_from_level(self.level)
+        self.level.mark_clean(record)
+        self.assertFalse(self.level.dirty)
+        self.assertFalse(self.level.lower_layer.dirty)
+        self.assertFalse(self.level.optional_fields[0].dirty)
+        self.assertEqual(cc_dat_utils.make_bytes_from_level(self.level), record)
+
+    def test_changed_level_is_encoded(self):
+        self.level.time = 10
+        encoded = cc_dat_utils.make_bytes_from_level(self.level)
+        self.assertNotEqual(encoded, bytes(self.level.raw_record))
+        decoded = cc_dat_utils.make_level_from_buffer(memoryview(encoded), 0)[0]
+        self.assertEqual(decoded.time, 10)
+        self.assertEqual(decoded.upper_layer, self.level.upper_layer)
+
+
+if __name__ == "__main__":
+    unittest.main()